@@ -1,21 +1,28 @@
-from prometheus_client import start_http_server, Gauge, Counter
+from prometheus_client import start_http_server, Gauge, Counter, Histogram
 import pandas as pd
 import argparse
 import time
 import glob
 import os
 import shutil
+from s3_specs.docs.tools.report_stats import read_stats_sidecar, list_stats_sidecars
+from s3_specs.docs.tools.replication_lag import LAG_BUCKETS
 
 parser = argparse.ArgumentParser()
 parser.add_argument('--parquet_path',
                     default='./output/tests.parquet',
                     required=False,
                     help='Path of folder containing the execution_time and test parquet artifacts')
+parser.add_argument('--stats_path',
+                    default='./reports_html/',
+                    required=False,
+                    help='Path of folder containing the *_stats.json sidecars emitted by each run')
 
 args = parser.parse_args()
 
 exported_keys = set()
 exported_benchmark_keys = set()
+exported_replication_keys = set()
 
 paths = {
     'report_folder': './output/',
@@ -24,7 +31,8 @@ paths = {
     'benchmark_file': './output/benchmark_results.csv',
     'rotativo_metrics_file': './output/rotativo_metrics.csv',
     'replicator_file': './output/replicator_results.csv',
-    'new_benchmark_results_file': './output/new_benchmark_results.csv'
+    'new_benchmark_results_file': './output/new_benchmark_results.csv',
+    'replication_lag_file': './output/replication_lag.csv'
 }
 
 replicator_gauge = Gauge(
@@ -33,6 +41,19 @@ replicator_gauge = Gauge(
     ['timestamp', 'bucket', 'prefix', 'total_missing', 'found_after_wait']
 )
 
+replication_lag_histogram = Histogram(
+    'replication_lag_seconds',
+    'Atraso entre a escrita de um objeto por um endpoint e sua primeira leitura por outro',
+    ['source', 'target'],
+    buckets=LAG_BUCKETS
+)
+
+replication_lag_timeouts = Counter(
+    'replication_lag_timeouts',
+    'Objetos não vistos por um endpoint antes do timeout',
+    ['source', 'target']
+)
+
 objs_consistency_time = Gauge(
     'objs_consistency_time',
     'Tempo de execução para diferentes operações de consistência',
@@ -75,6 +96,36 @@ tps_list_duration_gauge = Gauge(
     ['region', 'bucket']
 )
 
+run_outcomes_gauge = Gauge(
+    's3_specs_run_outcomes',
+    'Quantidade de testes por status na última execução de cada categoria',
+    ['run', 'outcome']
+)
+
+run_durations_gauge = Gauge(
+    's3_specs_run_durations_seconds',
+    'Duração da última execução de cada categoria e estatísticas do tempo por teste',
+    ['run', 'metric']
+)
+
+run_failure_signatures_gauge = Gauge(
+    's3_specs_run_failure_signatures',
+    'Ocorrências de cada assinatura de falha na última execução de cada categoria',
+    ['run', 'signature']
+)
+
+run_http_operations_gauge = Gauge(
+    's3_specs_run_http_operations',
+    'Chamadas http por operação S3 na última execução de cada categoria (contagens, bytes e tempos em segundos)',
+    ['run', 'operation', 'metric']
+)
+
+run_propagation_gauge = Gauge(
+    's3_specs_run_propagation',
+    'Tempo até buckets e objetos aparecerem ou sumirem após create/put/delete na última execução de cada categoria',
+    ['run', 'waiter', 'metric']
+)
+
 def read_csv_and_update_metrics():
     # Limpe as métricas existentes
     objs_consistency_time.clear()
@@ -208,6 +259,49 @@ def test_metrics_exporter():
 
     print("Test metrics exported...")
 
+def export_stats_sidecar_metrics():
+    sidecars = list_stats_sidecars(args.stats_path)
+    if not sidecars:
+        print(f"Nenhum sidecar de estatísticas encontrado em {args.stats_path}.")
+        return
+
+    run_outcomes_gauge.clear()
+    run_durations_gauge.clear()
+    run_failure_signatures_gauge.clear()
+    run_http_operations_gauge.clear()
+    run_propagation_gauge.clear()
+
+    for stats_file in sidecars:
+        stats = read_stats_sidecar(stats_file)
+        if not stats:
+            print(f"Erro ao ler {stats_file}")
+            continue
+
+        run = stats.get('name') or os.path.basename(stats_file)
+        for outcome, count in stats.get('counts', {}).items():
+            run_outcomes_gauge.labels(run=run, outcome=outcome).set(count)
+
+        run_durations_gauge.labels(run=run, metric='run').set(stats.get('duration') or 0)
+        for metric, value in stats.get('test_durations', {}).items():
+            run_durations_gauge.labels(run=run, metric=f"test_{metric}").set(value)
+
+        for failure in stats.get('failures', []):
+            run_failure_signatures_gauge.labels(run=run, signature=failure['signature']).set(failure['count'])
+
+        for operation, timings in stats.get('http', {}).items():
+            for metric, value in timings.items():
+                if metric == 'status':
+                    for status, count in value.items():
+                        run_http_operations_gauge.labels(run=run, operation=operation, metric=f"status_{status}").set(count)
+                else:
+                    run_http_operations_gauge.labels(run=run, operation=operation, metric=metric).set(value)
+
+        for waiter_name, waits in stats.get('propagation', {}).items():
+            for metric, value in waits.items():
+                run_propagation_gauge.labels(run=run, waiter=waiter_name, metric=metric).set(value)
+
+    print(f"Stats metrics exported ({len(sidecars)} sidecars).")
+
 def delete_temp_parquets():
     # deleting temporary parquets
     parquets_paths = 'output'
@@ -338,6 +432,42 @@ def export_new_benchmark_metrics():
 
     print(f"Exportadas {novas_metricas} métricas do arquivo {csv_path}")
 
+def export_replication_lag_metrics():
+    csv_path = paths.get('replication_lag_file')
+
+    if not os.path.exists(csv_path):
+        print(f"Arquivo {csv_path} não encontrado.")
+        return
+
+    try:
+        df = pd.read_csv(csv_path)
+    except Exception as e:
+        print(f"Erro ao ler {csv_path}: {e}")
+        return
+
+    if df.empty:
+        print(f"CSV {csv_path}. Nenhuma métrica exportada.")
+        return
+
+    novas_metricas = 0
+
+    # Uma linha por objeto e endpoint, o histograma acumula apenas as linhas ainda não exportadas
+    for _, row in df.iterrows():
+        key = f"{row['bucket']}:{row['key']}:{row['target']}"
+        if key in exported_replication_keys:
+            continue
+        exported_replication_keys.add(key)
+
+        lag = float(row['lag_seconds'])
+        if lag < 0:
+            replication_lag_timeouts.labels(source=row['source'], target=row['target']).inc()
+        else:
+            replication_lag_histogram.labels(source=row['source'], target=row['target']).observe(lag)
+
+        novas_metricas += 1
+
+    print(f"Replication lag metrics exported ({novas_metricas} novas).")
+
 
 if __name__ == '__main__':
     start_http_server(8000)
@@ -350,5 +480,7 @@ if __name__ == '__main__':
         delete_temp_parquets()
         export_replicator_metrics()
         export_new_benchmark_metrics()
+        export_stats_sidecar_metrics()
+        export_replication_lag_metrics()
 
         time.sleep(3600)  # Atualiza a cada 1 hora
@@ -6,6 +6,7 @@ import datetime
 import sys
 from botocore.exceptions import BotoCoreError, ClientError
 from botocore.config import Config
+from s3_specs.docs.tools.listing import iter_objects_parallel, iter_batches
 
 def list_old_test_buckets(profile_name, connect_timeout_sec=60, read_timeout_sec=600):
     """List 'test-' prefixed buckets older than 6 hours."""
@@ -55,12 +56,12 @@ def delete_bucket_policy(s3, bucket_name):
 
 def delete_all_objects(s3, bucket_name):
     """Delete all objects first, then delete versions if needed."""
-    paginator = s3.get_paginator('list_objects_v2')
     print(f"Deleting all object in bucket `{bucket_name}`")
 
     try:
-        for page in paginator.paginate(Bucket=bucket_name):
-            objects = [{'Key': obj['Key']} for obj in page.get('Contents', [])] 
+        # Keys are deleted in batches of 1000 while the keyspace is still being listed in parallel
+        for batch in iter_batches(iter_objects_parallel(s3, bucket_name, raw=True)):
+            objects = [{'Key': obj.key} for obj in batch]
             if objects:
                 response = s3.delete_objects(Bucket=bucket_name, Delete={'Objects': objects})
                 if "Errors" in response:
@@ -73,16 +74,12 @@ def delete_all_objects(s3, bucket_name):
 
 def delete_all_object_versions(s3, bucket_name):
     """Delete all object versions and delete markers, suppressing unnecessary output."""
-    paginator = s3.get_paginator('list_object_versions')
     locked_objects = []
     print(f"Deleting all object versions of `{bucket_name}`")
 
     try:
-        for page in paginator.paginate(Bucket=bucket_name):
-            objects = [
-                {'Key': obj['Key'], 'VersionId': obj['VersionId']}
-                for obj in page.get('Versions', []) + page.get('DeleteMarkers', [])
-            ]
+        for batch in iter_batches(iter_objects_parallel(s3, bucket_name, versions=True, raw=True)):
+            objects = [{'Key': obj.key, 'VersionId': obj.version_id} for obj in batch]
             if objects:
                 print(f"Deleting {objects=}")
                 response = s3.delete_objects(Bucket=bucket_name, Delete={'Objects': objects})
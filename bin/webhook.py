@@ -3,6 +3,7 @@ import requests
 import sys
 import os
 import glob
+from s3_specs.docs.tools.report_stats import read_stats_sidecar, list_stats_sidecars
 
 def send_notification(webhook_url, failed_string, failed_string_see_more, git_run_url, num_falhas, filename, object_path, profile):
     app_message = {
@@ -68,6 +69,16 @@ def process_file(file_path):
 
     return failed_string, failed_string_see_more
 
+def process_stats_file(file_path):
+    stats = read_stats_sidecar(file_path) or {}
+    counts = stats.get("counts", {})
+    failures = stats.get("failures", [])
+
+    failed_string = "\n".join(f"FAILED {test}" for failure in failures for test in failure["tests"])
+    failed_string_see_more = "\n".join(f"{failure['count']}x {failure['signature']}" for failure in failures)
+
+    return counts.get("failed", 0) + counts.get("error", 0), failed_string, failed_string_see_more
+
 def count_fails(file_path):
     with open(file_path, "r") as f:
         return f.read().count("\nFAILED ")
@@ -88,7 +99,10 @@ def main():
     if os.path.isfile(log_path):
         files_to_process = [log_path]
     elif os.path.isdir(log_path):
-        files_to_process = glob.glob(os.path.join(log_path, "*.log")) + glob.glob(os.path.join(log_path, "*.tap"))
+        # Stats sidecars are preferred, logs are only scanned when the run didn't emit any
+        files_to_process = list_stats_sidecars(log_path) or (
+            glob.glob(os.path.join(log_path, "*.log")) + glob.glob(os.path.join(log_path, "*.tap"))
+        )
     else:
         print(f"Error: Path {log_path} does not exist")
         return
@@ -103,8 +117,11 @@ def main():
     for file_path in files_to_process:
         print(f"\nProcessing file: {file_path}")
         try:
-            num_falhas = count_fails(file_path)
-            failed_string, failed_string_see_more = process_file(file_path)
+            if file_path.endswith("_stats.json"):
+                num_falhas, failed_string, failed_string_see_more = process_stats_file(file_path)
+            else:
+                num_falhas = count_fails(file_path)
+                failed_string, failed_string_see_more = process_file(file_path)
 
             print(f"Found {num_falhas} failures")
             print("Failed tests:", failed_string or "None")
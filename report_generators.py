@@ -1,7 +1,152 @@
 from datetime import datetime
 from pathlib import Path
+import glob
 import json
+import tempfile
 from fpdf import FPDF, XPos, YPos
+from s3_specs.docs.tools.report_stats import read_stats_sidecar, sidecar_path
+from s3_specs.docs.tools.live_report import iter_live_tests
+
+JSON_WHITESPACE = " \t\n\r"
+# Files the runner writes per run, all named {category}_{mark}_{profile} plus one of these
+RUN_FILE_SUFFIXES = ("_report.json", "_stats.json", "_live.ndjson", "_live.html", ".html", ".log")
+
+
+class JsonReportStream:
+    """
+    Incremental reader for pytest-json-report files.
+
+    Walks the top level object reading the file in chunks and decodes one value at a time,
+    so arrays like "tests" are yielded element by element and never fully loaded in memory.
+    """
+    chunk_size = 1 << 16
+
+    def __init__(self, json_file):
+        self.json_file = Path(json_file)
+        self.decoder = json.JSONDecoder()
+
+    def __iter__(self):
+        """
+        Yields (key, value) for every top level entry of the report.
+        Arrays yield one (key, element) pair per element.
+        """
+        with self.json_file.open("r", encoding="utf-8") as f:
+            self._file = f
+            self._buffer = ""
+            self._pos = 0
+            self._eof = False
+
+            self._expect("{")
+            if self._peek() == "}":
+                return
+            while True:
+                key = self._decode()
+                self._expect(":")
+                if self._peek() == "[":
+                    self._expect("[")
+                    if self._peek() == "]":
+                        self._expect("]")
+                    else:
+                        while True:
+                            yield key, self._decode()
+                            if self._next_separator("]"):
+                                break
+                else:
+                    yield key, self._decode()
+                if self._next_separator("}"):
+                    return
+
+    def _fill(self):
+        chunk = self._file.read(self.chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self):
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in JSON_WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise json.JSONDecodeError("Unexpected end of report", self._buffer, self._pos)
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise json.JSONDecodeError(f"Expected '{char}'", self._buffer, self._pos)
+        self._pos += 1
+
+    def _next_separator(self, closing):
+        # Consumes a "," or the closing char, returning True when the container ends
+        char = self._peek()
+        self._pos += 1
+        if char == closing:
+            return True
+        if char != ",":
+            raise json.JSONDecodeError(f"Expected ',' or '{closing}'", self._buffer, self._pos - 1)
+        return False
+
+    def _decode(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self._buffer, self._pos)
+                # A value is only complete when followed by a separator, numbers may continue in the next chunk
+                if self._eof or (end < len(self._buffer) and self._buffer[end] in JSON_WHITESPACE + ",:]}"):
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill()
+
+
+def iter_report_tests(json_file):
+    """
+    Yields the tests of a pytest-json-report file one at a time, with bounded memory.
+    """
+    for key, value in JsonReportStream(json_file):
+        if key == "tests":
+            yield value
+
+
+def read_report_summary(json_file):
+    """
+    Reads only the "summary" entry of a pytest-json-report file.
+    pytest-json-report writes the summary before collectors and tests, so the rest of the file is never read.
+    """
+    for key, value in JsonReportStream(json_file):
+        if key == "summary":
+            return value
+    return {}
+
+
+def summarize_test(test):
+    """
+    Reduces a pytest-json-report test entry to the fields shown in the PDF.
+
+    :return: Tuple (status, name, duration, message), status being passed, failed, skipped or error
+    """
+    name = test.get("nodeid", "N/A")
+    outcome = test.get("outcome", "N/A")
+    duration = test.get("call", {}).get("duration", 0.0) or test.get("setup", {}).get("duration", 0.0)
+
+    if outcome == "passed":
+        return "passed", name, duration, None
+    if outcome == "failed":
+        return "failed", name, duration, test.get("call", {}).get("longrepr", "").strip()
+    if outcome == "skipped":
+        skip_reason = test.get("setup", {}).get("longrepr", "").strip()
+        if "Skipped: " in skip_reason:
+            skip_reason = skip_reason.split("Skipped: ", 1)[1].strip()
+        return "skipped", name, duration, skip_reason
+    for phase in ["setup", "call", "teardown"]:
+        if phase in test and "longrepr" in test[phase]:
+            return "error", name, duration, test[phase]["longrepr"].strip()
+    return "error", name, duration, "Erro não especificado"
 
 class PDFReport(FPDF):
     def __init__(self):
@@ -49,14 +194,11 @@ class PDFReport(FPDF):
         if message:
             self.set_font("Helvetica", '', 9)
             max_chars_per_line = 100
-            formatted_message = ""
-            lines = message.split('\n')
-            for line in lines:
-                if len(line) > max_chars_per_line:
-                    for i in range(0, len(line), max_chars_per_line):
-                        formatted_message += line[i:i+max_chars_per_line] + "\n"
-                else:
-                    formatted_message += line + "\n"
+            formatted_message = "\n".join(
+                line[i:i + max_chars_per_line]
+                for line in message.split('\n')
+                for i in range(0, max(len(line), 1), max_chars_per_line)
+            )
             
             self.multi_cell(self.content_width, 5, formatted_message, 1, 'L')
         
@@ -81,61 +223,51 @@ def generate_pdf_report(json_data, output_dir, category=None):
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     pdf_file = output_dir / f"test_report_{category}_{timestamp}.pdf" if category else output_dir / f"test_report_{timestamp}.pdf"
 
-    passed_tests = []
-    failed_tests = []
-    skipped_tests = []
-    error_tests = []
+    # json_data may be an already loaded report or the path of one, which is streamed test by test.
+    # The live .ndjson stream is accepted too, so runs interrupted before the json report still get a PDF
+    if isinstance(json_data, dict):
+        tests = json_data.get("tests", [])
+    elif str(json_data).endswith(".ndjson"):
+        tests = iter_live_tests(json_data)
+    else:
+        tests = iter_report_tests(json_data)
 
-    for test in json_data.get("tests", []):
-        name = test.get("nodeid", "N/A")
-        outcome = test.get("outcome", "N/A")
-        duration = test.get("call", {}).get("duration", 0.0) or test.get("setup", {}).get("duration", 0.0)
-        
-        if outcome == "passed":
-            passed_tests.append((name, duration))
-        elif outcome == "failed":
-            error = test.get("call", {}).get("longrepr", "").strip()
-            failed_tests.append((name, duration, error))
-        elif outcome == "skipped":
-            skip_reason = test.get("setup", {}).get("longrepr", "").strip()
-            if "Skipped: " in skip_reason:
-                skip_reason = skip_reason.split("Skipped: ", 1)[1].strip()
-            skipped_tests.append((name, duration, skip_reason))
-        else: 
-            for phase in ["setup", "call", "teardown"]:
-                if phase in test and "longrepr" in test[phase]:
-                    error = test[phase]["longrepr"].strip()
-                    error_tests.append((name, duration, error))
-                    break
-            else:
-                error_tests.append((name, duration, "Erro não especificado"))
-
-    pdf = PDFReport()
-    pdf.add_page()
-    
-    total = len(passed_tests) + len(failed_tests) + len(skipped_tests) + len(error_tests)
-    pdf.add_summary(len(passed_tests), len(failed_tests) + len(error_tests), len(skipped_tests), total)
-    pdf.ln(10)
-    
-    if error_tests:
-        pdf.section_header("Erros em Testes", color=(255, 180, 180))
-        for name, duration, error in error_tests:
-            pdf.add_test_entry(name, duration, error, "error")
-    
-    if failed_tests:
-        pdf.section_header("Testes com Falha", color=(255, 200, 200))
-        for name, duration, error in failed_tests:
-            pdf.add_test_entry(name, duration, error, "failed")
-    
-    if skipped_tests:
-        pdf.section_header("Testes Pulados", color=(220, 220, 255))
-        for name, duration, reason in skipped_tests:
-            pdf.add_test_entry(name, duration, reason, "skipped")
-    
-    if passed_tests:
-        pdf.section_header("Testes que Passaram", color=(220, 255, 220))
-        for name, duration in passed_tests:
-            pdf.add_test_entry(name, duration, status="passed")
+    # Sections are written grouped by status, each status is spooled to disk instead of kept in memory
+    statuses = ["error", "failed", "skipped", "passed"]
+    spools = {status: tempfile.TemporaryFile("w+", encoding="utf-8") for status in statuses}
+    counts = dict.fromkeys(statuses, 0)
+
+    try:
+        for test in tests:
+            status, name, duration, message = summarize_test(test)
+            spools[status].write(json.dumps([name, duration, message]) + "\n")
+            counts[status] += 1
+
+        pdf = PDFReport()
+        pdf.add_page()
+
+        total = sum(counts.values())
+        pdf.add_summary(counts["passed"], counts["failed"] + counts["error"], counts["skipped"], total)
+        pdf.ln(10)
+
+        sections = {
+            "error": ("Erros em Testes", (255, 180, 180)),
+            "failed": ("Testes com Falha", (255, 200, 200)),
+            "skipped": ("Testes Pulados", (220, 220, 255)),
+            "passed": ("Testes que Passaram", (220, 255, 220)),
+        }
+        for status in statuses:
+            if not counts[status]:
+                continue
+            title, color = sections[status]
+            pdf.section_header(title, color=color)
+            spools[status].seek(0)
+            for line in spools[status]:
+                name, duration, message = json.loads(line)
+                pdf.add_test_entry(name, duration, message, status)
+    finally:
+        for spool in spools.values():
+            spool.close()
 
     try:
         pdf.output(str(pdf_file))
@@ -145,7 +277,29 @@ def generate_pdf_report(json_data, output_dir, category=None):
         print(f"Erro ao gerar o arquivo PDF: {e}")
         return None
 
-def create_index_html(reports_dir, categories, category_mapping):
+def latest_run(reports_dir, category):
+    """
+    Base path of the most recent run of a category among the files of every mark and profile
+    :param reports_dir: Path: directory the runner writes to
+    :param category: str: test category, e.g. full
+    :return: Path: e.g. reports_html/full__br-se1, reports_dir/category when it never ran
+    """
+    runs = {}
+    for path in reports_dir.glob(f"{glob.escape(category)}_*"):
+        for suffix in RUN_FILE_SUFFIXES:
+            if path.name.endswith(suffix):
+                base = path.name[: -len(suffix)]
+                try:
+                    runs[base] = max(runs.get(base, 0), path.stat().st_mtime)
+                except OSError:
+                    pass
+                break
+    if not runs:
+        return reports_dir / category
+    return reports_dir / max(runs, key=runs.get)
+
+
+def create_index_html(reports_dir, categories, category_mapping, verbose=True):
     category_descriptions = {
         'full': 'Todos os testes',
         'versioning': 'Testes de versionamento',
@@ -162,30 +316,19 @@ def create_index_html(reports_dir, categories, category_mapping):
     }
 
     def get_test_stats(json_file):
+        # Runs emit a tiny stats sidecar, the json report is only read for runs without one
+        stats = read_stats_sidecar(sidecar_path(json_file))
+        if stats:
+            counts = stats.get("counts", {})
+            return counts.get("passed", 0), counts.get("failed", 0), counts.get("skipped", 0), counts.get("error", 0)
+
         if not json_file.exists():
             return 0, 0, 0, 0
         
         try:
-            with open(json_file, 'r') as f:
-                data = json.load(f)
-            
-            passed = 0
-            failed = 0
-            skipped = 0
-            error = 0
-            
-            for test in data.get("tests", []):
-                outcome = test.get("outcome", "")
-                if outcome == "passed":
-                    passed += 1
-                elif outcome == "failed":
-                    failed += 1
-                elif outcome == "skipped":
-                    skipped += 1
-                elif outcome == "error":
-                    error += 1
-            
-            return passed, failed, skipped, error
+            # The summary already holds the outcome counts, there is no need to go through every test
+            summary = read_report_summary(json_file)
+            return summary.get("passed", 0), summary.get("failed", 0), summary.get("skipped", 0), summary.get("error", 0)
         except:
             return 0, 0, 0, 0
 
@@ -319,14 +462,15 @@ def create_index_html(reports_dir, categories, category_mapping):
 """
 
     for category in categories:
-        html_file = reports_dir / f"{category}.html"
-        json_file = reports_dir / f"{category}_report.json"
-        
+        base = latest_run(reports_dir, category)
+        html_file = base.with_name(f"{base.name}.html")
+        json_file = base.with_name(f"{base.name}_report.json")
+        live_file = base.with_name(f"{base.name}_live.html")
         exists = html_file.exists()
         modified_time = datetime.fromtimestamp(html_file.stat().st_mtime).strftime("%d/%m/%Y %H:%M") if exists else "N/A"
         description = category_descriptions.get(category, 'Testes específicos')
         
-        passed, failed, skipped, error = get_test_stats(json_file) if json_file.exists() else (0, 0, 0, 0)
+        passed, failed, skipped, error = get_test_stats(json_file)
         total = passed + failed + skipped + error
         
         html_content += f"""
@@ -341,7 +485,8 @@ def create_index_html(reports_dir, categories, category_mapping):
                 <div class="stat-item error">{error} ⚠</div>
             </div>
             
-            <a href="{category}.html" class="report-link">{"Ver relatório" if exists else "Não disponível"}</a>
+            <a href="{html_file.name}" class="report-link">{"Ver relatório" if exists else "Não disponível"}</a>
+            {f'<a href="{live_file.name}" class="report-link" style="background-color: #e67e22;">Acompanhar execução</a>' if live_file.exists() else ""}
             <p class="updated-time">{"Atualizado em: " + modified_time if exists else "Ainda não gerado"}</p>
         </div>
 """
@@ -356,9 +501,13 @@ def create_index_html(reports_dir, categories, category_mapping):
 </html>
 """
 
+    # The index is rewritten while tests run, write aside and move so it's never served half written
     index_path = reports_dir / "index.html"
-    with open(index_path, 'w', encoding='utf-8') as f:
+    tmp_path = reports_dir / "index.html.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
         f.write(html_content)
+    tmp_path.replace(index_path)
     
-    print(f"Arquivo index.html criado em {index_path}")
+    if verbose:
+        print(f"Arquivo index.html criado em {index_path}")
     return index_path
\ No newline at end of file
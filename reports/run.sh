@@ -92,7 +92,7 @@ fi
 # Download data
 if [ -n "$BUCKET" ] && [ -n "$ENDPOINT" ]; then
     echo "Downloading data..."
-    uv run ./src/generatedDataDownloader.py --config "$PROFILE" --endpoint "$ENDPOINT" --bucket "$BUCKET"
+    uv run ./src/generatedDataDownloader.py --profile "$PROFILE" --endpoint "$ENDPOINT" --bucket "$BUCKET"
 else
     echo "Skipping data download: Bucket or Endpoint not provided."
 fi
@@ -1,10 +1,37 @@
 import pandas as pd
 import plotly.express as px
+import plotly.io as pio
 
-import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import os
+
+# Rendered charts are kept here and reused while their input data does not change
+CHARTS_CACHE_DIR = "./output/charts_cache/"
+
+
+def render_figure(fig_json: str, output_path: str, width: int = 800, height: int = 400) -> str:
+    """
+    Renders a serialized plotly figure into a png file, runs inside the worker processes.
+
+    :param fig_json: Figure serialized with fig.to_json().
+    :param output_path: Path of the png to be written.
+    :return: Path of the written png.
+    """
+    fig = pio.from_json(fig_json)
+
+    # Write aside and then move, so an interrupted render never leaves a broken chart in the cache
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    fig.write_image(tmp_path, format="png", width=width, height=height)
+    os.replace(tmp_path, output_path)
+    return output_path
 
 
 class DataPlotter:
+    # Columns the category errors chart is built from, the same ones its cache key hashes
+    CATEGORY_ERRORS_FAILURE_COLUMNS = ['test_name', 'execution_datetime', 'error']
+    CATEGORY_ERRORS_TEST_COLUMNS = ['name', 'execution_datetime', 'category']
+
     def __init__(self, test_data_base: type):
         self.execution_entity = test_data_base.execution_entity
         #self.artifact_info = test_data_base.artifact_info
@@ -19,7 +46,90 @@ class DataPlotter:
         assert isinstance(self.execution_time, pd.DataFrame), "Execution Time must be a df"
         assert isinstance(self.failures, pd.DataFrame), "Failures must be a df"
 
+        # Each chart with its figure builder and the data slices it depends on
+        self.charts = {
+            'error_distribution_pie': (
+                self.__error_distribution_pie_figure__,
+                [self.__select_columns__(self.failures, ['test_name'])],
+            ),
+            'category_errors_bar': (
+                self.__category_errors_bar_figure__,
+                [
+                    self.__select_columns__(self.failures, self.CATEGORY_ERRORS_FAILURE_COLUMNS),
+                    self.__select_columns__(self.tests, self.CATEGORY_ERRORS_TEST_COLUMNS),
+                ],
+            ),
+            'failures_passed_rate': (
+                self.__failures_passed_rate_figure__,
+                [self.__select_columns__(self.tests, ['category', 'status'])],
+            ),
+        }
+
+    @staticmethod
+    def __select_columns__(df: pd.DataFrame, columns: list[str]) -> pd.DataFrame:
+        """
+        Selects the columns a chart uses, ignoring the ones missing on empty frames.
+        """
+        return df[[column for column in columns if column in df.columns]]
+
+    @staticmethod
+    def __content_hash__(name: str, frames: list[pd.DataFrame]) -> str:
+        """
+        Hashes the content of the data slices a chart is built from.
+
+        :param name: Chart name, so equal slices of different charts don't collide.
+        :param frames: DataFrames the chart depends on.
+        :return: Hex digest identifying the rendered chart.
+        """
+        digest = hashlib.sha256(name.encode())
+        for df in frames:
+            digest.update(",".join(map(str, df.columns)).encode())
+            digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+        return digest.hexdigest()
+
+    def render_charts(self, names: list[str] = None, max_workers: int = None) -> dict[str, str]:
+        """
+        Renders the requested charts to png, reusing cached images whose input data is unchanged.
+        Charts missing from the cache are rendered in parallel by a process pool.
+
+        :param names: Charts to be rendered, all of them by default.
+        :param max_workers: Maximum number of rendering processes.
+        :return: Dict of chart name to png path.
+        """
+        names = names or list(self.charts)
+        os.makedirs(CHARTS_CACHE_DIR, exist_ok=True)
+
+        paths = {}
+        pending = {}
+        for name in names:
+            build_figure, frames = self.charts[name]
+            path = os.path.join(CHARTS_CACHE_DIR, f"{name}_{self.__content_hash__(name, frames)}.png")
+            paths[name] = path
+            if not os.path.exists(path):
+                pending[path] = build_figure().to_json()
+
+        if len(pending) == 1:
+            # Not worth spawning a pool for a single chart
+            render_figure(*next(iter(pending.items())))
+        elif pending:
+            workers = min(len(pending), max_workers or os.cpu_count() or 1)
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(render_figure, fig_json, path) for path, fig_json in pending.items()]
+                for future in futures:
+                    future.result()
+
+        return paths
+
     def test_name_error_distribution_pie_chart(self):
+        return self.render_charts(['error_distribution_pie'])['error_distribution_pie']
+
+    def plot_category_errors_bar(self):
+        return self.render_charts(['category_errors_bar'])['category_errors_bar']
+
+    def categories_failures_passed_rate(self):
+        return self.render_charts(['failures_passed_rate'])['failures_passed_rate']
+
+    def __error_distribution_pie_figure__(self):
         failures_df = self.failures
 
         # Check if failures_df is empty
@@ -72,13 +182,11 @@ class DataPlotter:
                 textinfo='percent+label'  # Show percentage and label
             )
         
-        # Save the figure to a temporary file
-        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmpfile:
-            fig.write_image(tmpfile.name, format="png", width=800, height=400)
-            return tmpfile.name
-        
-    def plot_category_errors_bar(self):
-        failures_df = self.failures.copy()
+        return fig
+
+    def __category_errors_bar_figure__(self):
+        failures_df = self.__select_columns__(self.failures, self.CATEGORY_ERRORS_FAILURE_COLUMNS)
+        tests_df = self.__select_columns__(self.tests, self.CATEGORY_ERRORS_TEST_COLUMNS)
 
         # Check if failures_df is empty
         if failures_df.empty:
@@ -97,9 +205,9 @@ class DataPlotter:
                 margin=dict(l=20, r=20, t=40, b=20)  # Adjust margins
             )
         else:
-            # Merge failures_df with self.tests
+            # Merge failures_df with tests_df, duplicates are dropped over the hashed columns only
             categories_df = failures_df.merge(
-                self.tests,
+                tests_df,
                 how='inner',
                 right_on=['name', 'execution_datetime'],
                 left_on=['test_name', 'execution_datetime']
@@ -130,13 +238,9 @@ class DataPlotter:
                 yaxis_title="Contagem Total"
             )
 
-        # Save the plot to a temporary file
-        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmpfile:
-            fig.write_image(tmpfile.name, format="png", width=800, height=400)
-            return tmpfile.name
-        
-    
-    def categories_failures_passed_rate(self):
+        return fig
+
+    def __failures_passed_rate_figure__(self):
         # Group by status and category, then calculate value counts
         total_category = self.tests.groupby(['category', 'status']).size().unstack(fill_value=0).astype(int)
 
@@ -181,7 +285,4 @@ class DataPlotter:
         fig.update_yaxes(title='Porcentagem (%)')
         fig.update_xaxes(title='Categoria')
 
-        # Display the plot
-        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmpfile:
-            fig.write_image(tmpfile.name, format="png", width=800, height=400)
-            return tmpfile.name
\ No newline at end of file
+        return fig
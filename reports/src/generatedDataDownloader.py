@@ -1,6 +1,7 @@
 import boto3 
 import argparse
-import yaml
+
+from resultSync import ResultSync
 
 def parser_arguments():
     parser = argparse.ArgumentParser()
@@ -30,17 +31,5 @@ if __name__ == '__main__':
     session = boto3.Session(profile_name=parser.profile)
     client = session.client('s3', endpoint_url=parser.endpoint)
 
-    try:
-        objs = client.list_objects_v2(Bucket=parser.bucket)
-        downloaded_objs = [o['Key'] for o in objs['Contents']]
-        parquet_list = [o for o in objs if '.parquet' in o]
-        
-        for obj in parquet_list:
-            print(f"Downloading obj: {obj}")
-            response = client.download_file(Bucket = parser.bucket, Key=obj, Filename = path + obj)
-
-    except Exception as e:
-        raise e
-
-            
-            
+    # Only the parquets missing or different from the local ones are downloaded
+    ResultSync(client, parser.bucket, path).download(["*.parquet"])
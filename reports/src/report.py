@@ -47,10 +47,14 @@ class PdfMaker:
             'margin': 0.1 * A4[0],  
         }
 
-    def __get_time__(self, merged_rows, metric):
-        # Create a dict of the total time of each category summing each test time it contains
-        time = pd.Series(dict(map(lambda t, x: (x, merged_rows.loc[merged_rows['execution_name'] == t, metric].sum()), self.tests['name'].unique(), self.tests['name'].unique())))
-    
+    def __get_time__(self, merged_rows, metrics):
+        # Sum the time metrics of each test in a single pass, keeping every test name even without time rows
+        time = (
+            merged_rows.groupby('execution_name')[metrics]
+            .sum()
+            .reindex(self.tests['name'].unique(), fill_value=0)
+        )
+
         return time
     
     def create_pdf(self):
@@ -180,11 +184,7 @@ class PdfMaker:
         )
         
         # Retrive time values out of df
-        avg_time = self.__get_time__(time_metric_df, 'avg_time').round(2)
-        min_time = self.__get_time__(time_metric_df, 'min_time').round(2)
-        total_time = self.__get_time__(time_metric_df, 'total_time').round(2)
-
-        time_df = pd.DataFrame([avg_time, min_time, total_time]).T.reset_index()
+        time_df = self.__get_time__(time_metric_df, ['avg_time', 'min_time', 'total_time']).round(2).reset_index()
         time_df.columns = ['Teste', 'Tempo médio', 'Tempo Mínimo', 'Tempo Total']
         
         # Merge time metrics with status counts
@@ -301,10 +301,8 @@ class PdfMaker:
         img_width = 500
         img_height = 250
 
-        graph_files = {'error_distribution_pie':self.plotter.test_name_error_distribution_pie_chart(), 
-                       'category_errors_bar': self.plotter.plot_category_errors_bar(),
-                       'failures_passed_rate': self.plotter.categories_failures_passed_rate(),
-                       }
+        # Charts are rendered in parallel and reused from cache when their data is unchanged
+        graph_files = self.plotter.render_charts(['error_distribution_pie', 'category_errors_bar', 'failures_passed_rate'])
         
         story = []
         story.append(Spacer(1, 12))
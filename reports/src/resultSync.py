@@ -0,0 +1,183 @@
+import fnmatch
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+class ResultSync:
+    """
+    Incremental sync of the results folder with the results bucket, in the spirit of rsync.
+
+    A manifest saved in the folder records the size, mtime and bucket ETag of every file last transferred.
+    A file whose size and mtime still match the manifest is compared with the bucket by that ETag without
+    being read, the others by their md5 (the ETag of single part uploads). Only what differs is
+    transferred, concurrently.
+    """
+
+    MANIFEST_NAME = ".sync_manifest.json"
+
+    def __init__(self, client, bucket: str, local_dir: str, workers: int = 8):
+        """
+        :param client: boto3 s3 client of the results bucket.
+        :param bucket: Name of the results bucket.
+        :param local_dir: Local results folder, e.g. ./output/.
+        :param workers: Number of concurrent transfers.
+        """
+        self.client = client
+        self.bucket = bucket
+        self.local_dir = local_dir
+        self.workers = workers
+        self.manifest_path = os.path.join(local_dir, self.MANIFEST_NAME)
+        self.manifest = self._load_manifest()
+        self._remote = None
+
+    def _load_manifest(self) -> dict:
+        try:
+            with open(self.manifest_path, "r") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def save_manifest(self):
+        """
+        Atomically saves the manifest, an interrupted sync never leaves it half written.
+        """
+        os.makedirs(self.local_dir, exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def remote_objects(self) -> dict:
+        """
+        Lists the whole bucket, page by page, once per sync.
+
+        :return: Dict of key to its ETag and size.
+        """
+        if self._remote is None:
+            self._remote = {}
+            paginator = self.client.get_paginator("list_objects_v2")
+            for page in paginator.paginate(Bucket=self.bucket):
+                for obj in page.get("Contents", []):
+                    self._remote[obj["Key"]] = {"etag": obj["ETag"].strip('"'), "size": obj["Size"]}
+        return self._remote
+
+    def local_files(self, patterns: list) -> list:
+        """
+        :param patterns: Glob patterns of the relative paths to sync, e.g. ["*.parquet"].
+        :return: Relative paths of the local files matching any pattern.
+        """
+        matches = []
+        for root, _, files in os.walk(self.local_dir):
+            for name in files:
+                relative_path = os.path.relpath(os.path.join(root, name), self.local_dir)
+                if name != self.MANIFEST_NAME and any(fnmatch.fnmatch(relative_path, p) for p in patterns):
+                    matches.append(relative_path)
+        return sorted(matches)
+
+    def md5(self, relative_path: str) -> str:
+        digest = hashlib.md5(usedforsecurity=False)
+        with open(os.path.join(self.local_dir, relative_path), "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def in_sync(self, relative_path: str, remote_obj: dict) -> bool:
+        """
+        Checks whether a local file has the same content as an object of the bucket.
+
+        :param relative_path: Path of the file relative to the results folder.
+        :param remote_obj: ETag and size of the object, as listed by remote_objects.
+        :return: True if the file doesn't need to be transferred.
+        """
+        stat = os.stat(os.path.join(self.local_dir, relative_path))
+        if stat.st_size != remote_obj["size"]:
+            return False
+        entry = self.manifest.get(relative_path)
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            return entry["etag"] == remote_obj["etag"]
+        return self.md5(relative_path) == remote_obj["etag"]
+
+    def _record(self, relative_path: str, etag: str):
+        stat = os.stat(os.path.join(self.local_dir, relative_path))
+        self.manifest[relative_path] = {"size": stat.st_size, "mtime": stat.st_mtime, "etag": etag}
+
+    def upload(self, patterns: list, flatten: bool = False, static: bool = False) -> dict:
+        """
+        Uploads the local files matching the patterns that are missing or different in the bucket.
+
+        :param patterns: Glob patterns of the relative paths to upload.
+        :param flatten: Use the file name as key instead of the relative path.
+        :param static: Files never change once created, an existing key is enough to skip them.
+        :return: Counts of uploaded and skipped files and the uploaded bytes.
+        """
+        remote = self.remote_objects()
+        pending = []
+        skipped = 0
+        for relative_path in self.local_files(patterns):
+            key = os.path.basename(relative_path) if flatten else relative_path.replace(os.sep, "/")
+            remote_obj = remote.get(key)
+            if remote_obj and (static or self.in_sync(relative_path, remote_obj)):
+                if not static:
+                    self._record(relative_path, remote_obj["etag"])
+                skipped += 1
+                continue
+            pending.append((relative_path, key))
+
+        def upload_file(item):
+            relative_path, key = item
+            print(f"Uploading {key}")
+            self.client.upload_file(Filename=os.path.join(self.local_dir, relative_path), Bucket=self.bucket, Key=key)
+            # Big files are uploaded in parts, their ETag is not the md5 and must be asked to the bucket
+            etag = self.client.head_object(Bucket=self.bucket, Key=key)["ETag"].strip('"')
+            return relative_path, key, etag
+
+        uploaded_bytes = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for relative_path, key, etag in executor.map(upload_file, pending):
+                self._record(relative_path, etag)
+                remote[key] = {"etag": etag, "size": self.manifest[relative_path]["size"]}
+                uploaded_bytes += self.manifest[relative_path]["size"]
+
+        self.save_manifest()
+        summary = {"transferred": len(pending), "skipped": skipped, "bytes": uploaded_bytes}
+        print(f"Upload of {patterns}: {summary}")
+        return summary
+
+    def download(self, patterns: list) -> dict:
+        """
+        Downloads the bucket keys matching the patterns that are missing or different locally.
+
+        :param patterns: Glob patterns of the keys to download.
+        :return: Counts of downloaded and skipped files and the downloaded bytes.
+        """
+        pending = []
+        skipped = 0
+        for key, remote_obj in self.remote_objects().items():
+            if not any(fnmatch.fnmatch(key, p) for p in patterns):
+                continue
+            relative_path = key.replace("/", os.sep)
+            if os.path.exists(os.path.join(self.local_dir, relative_path)) and self.in_sync(relative_path, remote_obj):
+                self._record(relative_path, remote_obj["etag"])
+                skipped += 1
+                continue
+            pending.append((key, relative_path, remote_obj))
+
+        def download_file(item):
+            key, relative_path, _ = item
+            path = os.path.join(self.local_dir, relative_path)
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            print(f"Downloading {key}")
+            self.client.download_file(Bucket=self.bucket, Key=key, Filename=path)
+            return item
+
+        downloaded_bytes = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for key, relative_path, remote_obj in executor.map(download_file, pending):
+                self._record(relative_path, remote_obj["etag"])
+                downloaded_bytes += remote_obj["size"]
+
+        self.save_manifest()
+        summary = {"transferred": len(pending), "skipped": skipped, "bytes": downloaded_bytes}
+        print(f"Download of {patterns}: {summary}")
+        return summary
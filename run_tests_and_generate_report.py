@@ -1,6 +1,7 @@
 import subprocess
 import argparse
 import sys
+import threading
 from datetime import datetime
 from pathlib import Path
 import json
@@ -28,6 +29,9 @@ HTML_REPORTS_DIR = Path("reports_html")
 REPORTS_DIR.mkdir(exist_ok=True)
 HTML_REPORTS_DIR.mkdir(exist_ok=True)
 
+# Seconds between refreshes of the index while the tests are running
+INDEX_REFRESH_INTERVAL = 30
+
 def parse_args():
     parser = argparse.ArgumentParser(description="Executar testes e gerar relatório PDF e HTML.")
     parser.add_argument("category", choices=CATEGORY_MAPPING.keys(), help="Categoria de testes a executar")
@@ -42,6 +46,7 @@ def run_tests(args):
 
     html_output = HTML_REPORTS_DIR / f"{category_name}_{args.mark}_{args.profile}.html"
     json_output = HTML_REPORTS_DIR / f"{category_name}_{args.mark}_{args.profile}_report.json"
+    live_output = HTML_REPORTS_DIR / f"{category_name}_{args.mark}_{args.profile}_live.ndjson"
     
     command = [
         "pytest",
@@ -50,6 +55,7 @@ def run_tests(args):
         "--tb=line",
         "--json-report",
         f"--json-report-file={json_output}",
+        f"--live-report={live_output}",
         f"--html={html_output}",
         "--self-contained-html",
         "-s",
@@ -78,24 +84,51 @@ def run_tests(args):
                 text=True,
                 bufsize=0
             )
-            for line in process.stdout:
-                print(line, end="", flush=True)
-                log_file.write(line)        
-            return process.wait()
+            # The live plugin keeps the stats sidecars up to date, so the index follows the run,
+            # refreshed on a timer as a test may run for long without printing anything
+            stop_refresh = threading.Event()
+            refresher = threading.Thread(target=refresh_index_periodically, args=(stop_refresh,), daemon=True)
+            refresher.start()
+            try:
+                for line in process.stdout:
+                    print(line, end="", flush=True)
+                    log_file.write(line)
+                return process.wait()
+            finally:
+                stop_refresh.set()
+                refresher.join()
     except KeyboardInterrupt:
         print("\nTestes interrompidos. Gerando relatório parcial...")
         return 1
 
 
+def refresh_index(verbose=False):
+    try:
+        return create_index_html(HTML_REPORTS_DIR, list(CATEGORY_MAPPING.keys()), CATEGORY_MAPPING, verbose=verbose)
+    except OSError as e:
+        print(f"Erro ao atualizar o index.html: {e}")
+        return None
+
+
+def refresh_index_periodically(stop, interval=INDEX_REFRESH_INTERVAL):
+    while not stop.wait(interval):
+        refresh_index()
+
+
 def generate_pdf(category=None):
     json_output = HTML_REPORTS_DIR / f"{category}_report.json" if category else Path("report.json")
     if not json_output.exists():
-        print(f"Arquivo de relatório JSON não encontrado: {json_output}")
-        return None
+        # Interrupted runs have no json report, the tests finished so far are in the live stream
+        live_output = HTML_REPORTS_DIR / f"{category}_live.ndjson"
+        if not category or not live_output.exists():
+            print(f"Arquivo de relatório JSON não encontrado: {json_output}")
+            return None
+        print(f"Arquivo de relatório JSON não encontrado, gerando relatório parcial de {live_output}")
+        json_output = live_output
 
+    # The report is streamed test by test, big runs (e.g. --repeat) never get fully loaded in memory
     try:
-        with json_output.open() as f:
-            data = json.load(f)
+        return generate_pdf_report(json_output, REPORTS_DIR, category)
     except json.JSONDecodeError:
         print(f"Erro ao decodificar JSON do arquivo: {json_output}")
         return None
@@ -103,8 +136,6 @@ def generate_pdf(category=None):
         print(f"Erro ao ler o arquivo JSON: {json_output}, {e}")
         return None
 
-    return generate_pdf_report(data, REPORTS_DIR, category)
-
 ## If seems necessary to clean old reports, uncomment the following function
 # def clean_old_reports(max_files=100):
 #     reports = sorted(REPORTS_DIR.glob("test_report_*.pdf"))
@@ -122,6 +153,6 @@ if __name__ == "__main__":
     test_result = run_tests(args)
     generate_pdf(f"{args.category}_{args.mark}_{args.profile}")
     # clean_old_reports()
-    create_index_html(HTML_REPORTS_DIR, list(CATEGORY_MAPPING.keys()), CATEGORY_MAPPING)
+    refresh_index(verbose=True)
 
     sys.exit(test_result)
\ No newline at end of file
@@ -9,8 +9,7 @@
 import pytest
 from itertools import product
 from botocore.exceptions import ClientError
-from s3_specs.docs.s3_helpers import update_existing_keys
-import logging
+from s3_specs.docs.tools.acl_matrix import AclMatrix, fixture_bucket_with_acl_objects
 
 pytestmark = [pytest.mark.acl, pytest.mark.skip_if_dev, pytest.mark.homologacao]
 
@@ -18,10 +17,11 @@ pytestmark = [pytest.mark.acl, pytest.mark.skip_if_dev, pytest.mark.homologacao]
 
 ## Try to set object acl with invalid permissions
 @pytest.mark.parametrize("acl_name", ['batata','""',]) 
-def test_invalid_put_object_acl(s3_client, bucket_with_one_object, acl_name):
-    bucket_name, object_key, _ = bucket_with_one_object
+def test_invalid_put_object_acl(session_s3_client, fixture_bucket_with_acl_objects, acl_name):
+    bucket_name, object_keys = fixture_bucket_with_acl_objects
+    object_key = object_keys['private']
     try:
-        s3_client.put_object_acl(Bucket = bucket_name, ACL = acl_name, Key = object_key)
+        session_s3_client.put_object_acl(Bucket = bucket_name, ACL = acl_name, Key = object_key)
         pytest.fail("Valid acl argument inputed, test failed")
     except ClientError as e:
         assert e.response['Error']['Code'] == 'InvalidArgument'
@@ -34,30 +34,32 @@ def test_invalid_put_object_acl(s3_client, bucket_with_one_object, acl_name):
     'public-read-write',
     'authenticated-read',
 ]) 
-def test_put_object_acl(s3_client, bucket_with_one_object, acl_name):
-    bucket_name, object_key, _ = bucket_with_one_object
-    response =  s3_client.put_object_acl(Bucket = bucket_name, ACL = acl_name, Key = object_key)
+def test_put_object_acl(session_s3_client, fixture_bucket_with_acl_objects, acl_name):
+    # Each ACL is set on its own object of the module bucket
+    bucket_name, object_keys = fixture_bucket_with_acl_objects
+    object_key = object_keys[acl_name]
+    response =  session_s3_client.put_object_acl(Bucket = bucket_name, ACL = acl_name, Key = object_key)
 
     assert response['ResponseMetadata']['HTTPStatusCode'] == 200
 
 
 ## Test the creater profile always has FULL CONTROL of the objects with acl
-@pytest.mark.parametrize("multiple_s3_clients, acl", [
-    ({"number_clients": 1},'private'),
-    ({"number_clients": 1},'public-read'),
-    ({"number_clients": 1},'public-read-write'),
-    ({"number_clients": 1},'authenticated-read')
-], indirect=["multiple_s3_clients"]) 
-def test_owner_get_object_acl(multiple_s3_clients, bucket_with_one_object, acl):
+@pytest.mark.parametrize("acl", [
+    'private',
+    'public-read',
+    'public-read-write',
+    'authenticated-read'
+]) 
+def test_owner_get_object_acl(session_s3_client, fixture_bucket_with_acl_objects, acl):
 
-    s3_owner = multiple_s3_clients[0]
-    bucket_name, obj_key, _ = bucket_with_one_object
+    # The module bucket and its objects are created by the session client, the owner
+    s3_owner = session_s3_client
+    bucket_name, object_keys = fixture_bucket_with_acl_objects
+    obj_key = object_keys[acl]
 
     s3_owner.put_object_acl(Bucket = bucket_name, ACL = acl, Key=obj_key)
 
-
-    bucket, key, _ = bucket_with_one_object
-    response = s3_owner.get_object_acl(Bucket=bucket, Key=key)
+    response = s3_owner.get_object_acl(Bucket=bucket_name, Key=obj_key)
 
     assert any([g['Permission'] == "FULL_CONTROL" for g in response['Grants']])
 
@@ -68,9 +70,10 @@ def test_owner_get_object_acl(multiple_s3_clients, bucket_with_one_object, acl):
 
 # test invalid arguments for acl
 @pytest.mark.parametrize("acl_name", ["non-existing-acl-name", ""]) 
-def test_invalid_put_bucket_acl(s3_client,existing_bucket_name, acl_name):
+def test_invalid_put_bucket_acl(session_s3_client, fixture_bucket_with_acl_objects, acl_name):
+    bucket_name, _ = fixture_bucket_with_acl_objects
     try:
-        s3_client.put_bucket_acl(Bucket = existing_bucket_name, ACL = acl_name)
+        session_s3_client.put_bucket_acl(Bucket = bucket_name, ACL = acl_name)
         pytest.fail("Valid acl argument inputed, test failed")
     except ClientError as e:
         assert e.response['ResponseMetadata']['HTTPStatusCode'] == 400
@@ -81,8 +84,9 @@ def test_invalid_put_bucket_acl(s3_client,existing_bucket_name, acl_name):
     'public-read-write',
     'authenticated-read'
 ])
-def test_valid_put_bucket_acl(s3_client, existing_bucket_name, acl_name):
-    response = s3_client.put_bucket_acl(Bucket = existing_bucket_name, ACL = acl_name)
+def test_valid_put_bucket_acl(session_s3_client, fixture_bucket_with_acl_objects, acl_name):
+    bucket_name, _ = fixture_bucket_with_acl_objects
+    response = session_s3_client.put_bucket_acl(Bucket = bucket_name, ACL = acl_name)
     assert response['ResponseMetadata']['HTTPStatusCode'] == 200
 
 
@@ -149,6 +153,15 @@ test_ids = [
     for acl_name, method_name, expected_status_code in test_cases
 ]
 
+# All the (acl, method) checks run together on one bucket per ACL (see tools.acl_matrix),
+# each test reports the result of its own pair
+@pytest.fixture(scope="module")
+def acl_matrix():
+    matrix = AclMatrix(test_cases, non_owner_allowed_operations, methods_input)
+    yield matrix
+    matrix.teardown()
+
+
 # Test ACL permissions with 2 authenticated clients. This covers both bucket-level
 # and object-level ACLs, verifying that the second client can only perform operations
 # they are explicitly allowed to.
@@ -158,36 +171,9 @@ test_ids = [
     indirect=['multiple_s3_clients'],  # Indicate 'multiple_s3_clients' is a fixture
     ids=test_ids,  # Provide descriptive IDs for the test cases
 )
-def test_acl_operations(multiple_s3_clients, versioned_bucket_with_one_object, acl_name, method_name, expected_status_code):
-    bucket_name, obj_key, obj_version = versioned_bucket_with_one_object
-
-    # Set the bucket-level ACL
-    s3_owner = multiple_s3_clients[0]
-    s3_owner.put_bucket_acl(Bucket=bucket_name, ACL=acl_name)
-
-    # Set the object-level ACL if required
-    if method_name in non_owner_allowed_operations[acl_name]["object"]:
-        s3_owner.put_object_acl(Bucket=bucket_name, Key=obj_key, ACL=acl_name)
-
-    # Prepare arguments
-    method_kwargs = update_existing_keys(
-        methods_input[method_name],
-        { "Bucket": bucket_name, "Key": obj_key, "ACL": acl_name, "VersionId": obj_version }
-    )
-
-    # Log prepared arguments and method name
-    logging.info(f"method_args: {method_kwargs} method_name: {method_name}")
-
-    # Execute the method
-    s3_other = multiple_s3_clients[1]
-    method = getattr(s3_other, method_name)
-
-    try:
-        response = method(**method_kwargs)
-        actual_status_code = response['ResponseMetadata']['HTTPStatusCode']
-    except Exception as e:
-        logging.info(f"error {e}")
-        actual_status_code = e.response['ResponseMetadata']['HTTPStatusCode'] if hasattr(e, 'response') else 500
+def test_acl_operations(multiple_s3_clients, acl_matrix, acl_name, method_name, expected_status_code):
+    # The first test runs the whole matrix with its clients, the owner and another user
+    actual_status_code = acl_matrix.status(multiple_s3_clients, acl_name, method_name)
 
     # Assert the result
     assert actual_status_code in expected_status_code, (
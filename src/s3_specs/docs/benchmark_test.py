@@ -1,8 +1,12 @@
 from datetime import datetime
+import logging
 import os
 import subprocess
 import pytest
 import tempfile
+from s3_specs.docs.tools.crud import fixture_bucket_with_name
+from s3_specs.docs.tools.presigned import authenticated_load, presigned_load, signing_throughput
+from s3_specs.docs.tools.transfer_tuning import MB, GB, load_transfer_config, size_class, tune_transfer_config
 
 pytestmark = [pytest.mark.skip_if_dev]
 
@@ -110,3 +114,41 @@ def test_benchmark(
                                 "unknown"
                             )
                             f.write(f"{profile_name},{tool},{size},{times},{workers},{quantity},{operation},{time_taken}\n")
+
+
+# Tamanhos representativos de cada classe de tamanho de objeto ajustada (ver tools.transfer_tuning)
+tuning_sizes = [32 * MB, 256 * MB, 1 * GB]
+
+@pytest.mark.parametrize("object_size", tuning_sizes, ids=[size_class(size) for size in tuning_sizes])
+@pytest.mark.slow
+@pytest.mark.benchmark
+def test_transfer_tuning(s3_client, fixture_bucket_with_name, object_size):
+    """Varre tamanho de parte x concorrência x threshold e salva a melhor configuração para o endpoint do perfil"""
+    tuning = tune_transfer_config(s3_client, fixture_bucket_with_name, object_size)
+
+    # Os testes de objetos grandes passam a usar a configuração encontrada
+    config = load_transfer_config(s3_client, object_size)
+    assert tuning["mb_per_second"] > 0
+    assert config.multipart_chunksize == tuning["multipart_chunksize"]
+    assert config.max_concurrency == tuning["max_concurrency"]
+
+
+@pytest.mark.parametrize("objects, object_size", [(500, 4 * 1024), (100, 1 * MB)], ids=["4KB", "1MB"])
+@pytest.mark.slow
+@pytest.mark.benchmark
+def test_presigned_load(s3_client, fixture_bucket_with_name, objects, object_size):
+    """Compara latência e vazão do acesso por URLs pré-assinadas com o acesso autenticado pelo boto3"""
+    keys = [f"presigned-{i}" for i in range(objects)]
+    body = os.urandom(object_size)
+
+    signing = signing_throughput(s3_client, fixture_bucket_with_name, keys)
+    results = {"signing": signing}
+    for method in ["PUT", "GET"]:
+        results[f"authenticated_{method}"] = authenticated_load(s3_client, fixture_bucket_with_name, keys, method, body)
+        results[f"presigned_{method}"] = presigned_load(s3_client, fixture_bucket_with_name, keys, method, body)
+    logging.info(f"Presigned vs authenticated load: {results}")
+
+    for name, load in results.items():
+        if name != "signing":
+            assert load["errors"] == 0, f"{name}: {load}"
+            assert load["requests"] == objects
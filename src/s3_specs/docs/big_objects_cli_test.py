@@ -4,7 +4,8 @@ import logging
 from itertools import product
 from s3_specs.docs.s3_helpers import run_example
 from s3_specs.docs.tools.utils import fixture_create_big_file, fixture_create_small_file, execute_subprocess
-from s3_specs.docs.tools.crud import fixture_bucket_with_name ,list_all_objects
+from s3_specs.docs.tools.crud import fixture_bucket_with_name
+from s3_specs.docs.tools.listing import count_objects
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import os
 
@@ -162,7 +163,7 @@ def test_upload_multiple_object_cli(profile_name, s3_client, fixture_bucket_with
                 f"Error: {result.stderr}"
             )
 
-    objects_in_bucket = len(list_all_objects(s3_client, bucket_name))
+    objects_in_bucket, _ = count_objects(s3_client, bucket_name, parallel=True)
 
     # Verify the expected output in the command result
     assert quantity == objects_in_bucket, (
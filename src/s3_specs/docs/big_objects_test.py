@@ -2,7 +2,8 @@ import pytest
 import logging
 from s3_specs.docs.tools.utils import fixture_create_big_file
 from s3_specs.docs.tools.crud import fixture_bucket_with_name, upload_multipart_file
-from boto3.s3.transfer import TransferConfig
+from s3_specs.docs.tools.ranged_download import download_ranged, download_single
+from s3_specs.docs.tools.transfer_tuning import load_transfer_config
 import uuid
 from tqdm import tqdm
 import os
@@ -39,13 +40,8 @@ def test_multipart_download(s3_client, fixture_bucket_with_name, fixture_create_
     object_key = os.path.split(file_path)[-1] # The object key is the file name
     download_path = os.path.join(os.path.dirname(file_path), f"downloaded_{object_key}")
 
-    # Config for multhreading of boto3 building multipart upload/download
-    config = TransferConfig(
-        multipart_threshold=40 * 1024 * 1024,
-        max_concurrency=10,
-        multipart_chunksize=8 * 1024 * 1024,
-        use_threads=True
-    )
+    # Config for multhreading of multipart upload/download, tuned for the endpoint by test_transfer_tuning
+    config = load_transfer_config(s3_client, total_size)
 
     # Uploading the big file upload_multipart_file
     try:
@@ -63,7 +59,14 @@ def test_multipart_download(s3_client, fixture_bucket_with_name, fixture_create_
                   unit='B', 
                   unit_scale=True, unit_divisor=1024) as pbar:
 
-            s3_client.download_file(Bucket=bucket_name, Key=object_key, Filename = download_path, Config=config, Callback=pbar.update)  
+            # Under the tuned threshold a single GET, otherwise parallel ranged GETs written straight into the memory mapped destination
+            if total_size < config.multipart_threshold:
+                download_single(s3_client, bucket_name, object_key, download_path, callback=pbar.update)
+            else:
+                download_ranged(
+                    s3_client, bucket_name, object_key, download_path,
+                    range_size=config.multipart_chunksize, max_workers=config.max_concurrency, callback=pbar.update
+                )
 
             # Retrieving sizes
             downloaded_file_size = os.path.getsize(download_path)
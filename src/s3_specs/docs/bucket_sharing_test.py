@@ -42,6 +42,7 @@ import boto3
 import yaml
 from pathlib import Path
 from s3_specs.docs.s3_helpers import run_example
+from s3_specs.docs.tools.presigned import Presigner, pooled_session
 
 pytestmark = [pytest.mark.bucket_sharing, pytest.mark.presign, pytest.mark.quick, pytest.mark.homologacao, pytest.mark.skip_if_dev]
 config = os.getenv("CONFIG", config)
@@ -263,6 +264,41 @@ run_example(__name__, "test_presigned_url_scenarios", config=config)
 # -
 
 
+# ### Teste 4: URLs Pré-assinadas em Lote
+#
+# Links de compartilhamento costumam ser gerados em lote. As URLs são assinadas reaproveitando a
+# chave de assinatura derivada (ver tools.presigned) e usadas por uma sessão HTTP com conexões reaproveitadas.
+
+# +
+def test_presigned_url_batch(s3_client, profile_name):
+    timestamp = int(time.time())
+    test_bucket_name = f"test-batch-{timestamp}-{profile_name}"
+    keys = [f"shared-{i}" for i in range(20)]
+
+    try:
+        s3_client.create_bucket(Bucket=test_bucket_name)
+        for key in keys:
+            s3_client.put_object(Bucket=test_bucket_name, Key=key, Body=key.encode())
+
+        urls, signing = Presigner(s3_client).presign_batch("GET", test_bucket_name, keys)
+        assert signing["urls"] == len(keys)
+        assert all("X-Amz-Signature" in url for url in urls), "URL não contém assinatura válida"
+
+        session = pooled_session()
+        try:
+            for key, url in zip(keys, urls):
+                response = session.get(url)
+                assert response.status_code == 200, f"Falha ao acessar URL pré-assinada de {key}: Status {response.status_code}"
+                assert response.content == key.encode(), f"Conteúdo de {key} incorreto"
+        finally:
+            session.close()
+
+    finally:
+        cleanup_bucket(s3_client, test_bucket_name)
+
+run_example(__name__, "test_presigned_url_batch", config=config)
+# -
+
 # ## Referências
 #
 # - [Boto3 S3 generate_presigned_url](https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3.html#S3.Client.generate_presigned_url)
@@ -2,7 +2,6 @@ import os
 import boto3
 import pytest
 import time
-import yaml
 import logging
 import subprocess
 import shutil
@@ -24,6 +23,7 @@ from s3_specs.docs.s3_helpers import (
     probe_versioning_status,
     delete_all_objects_and_wait,
     delete_all_objects_with_version_and_wait,
+    propagation_timings,
 )
 from s3_specs.docs.utils.consistency import (
     setup_standard_bucket,
@@ -31,6 +31,11 @@ from s3_specs.docs.utils.consistency import (
     resolve_bucket,
     available_buckets
 )
+from s3_specs.docs.tools.report_stats import write_stats_sidecar
+from s3_specs.docs.tools.live_report import LiveReport
+from s3_specs.docs.tools.http_timing import http_timings, instrument_client
+from s3_specs.docs.tools.concurrency import take_concurrency_summaries
+from s3_specs.docs.tools.params import DEFAULT_CONFIG_PATH, SpecsConfig, load_specs_config, profile_session
 from datetime import datetime, timedelta
 from botocore.exceptions import ClientError
 
@@ -41,10 +46,132 @@ def pytest_addoption(parser):
     parser.addoption("--run-dev", action="store_true", help="Rodar testes no modo dev")
     parser.addoption("--manual-standard", action="store", default=None, help="Bucket padrão (não versionado) manual")
     parser.addoption("--manual-versioned", action="store", default=None, help="Bucket versionado manual")
+    parser.addoption("--live-report", action="store", default=None, help="Arquivo .ndjson onde cada teste finalizado é registrado durante a execução")
+
+
+def get_specs_config(config):
+    """
+    Test parameters of the run, parsed once per process. The xdist controller relays them to the
+    workers already parsed (see pytest_configure_node), so workers never read the config file.
+    :param config: pytest.Config: pytest config holding the command line options
+    :return: SpecsConfig: parsed test parameters
+    """
+    specs_config = getattr(config, "_s3_specs_config", None)
+    if specs_config is not None:
+        return specs_config
+
+    workerinput = getattr(config, "workerinput", {})
+    if "s3_specs_params" in workerinput:
+        specs_config = SpecsConfig.from_json(workerinput["s3_specs_params"])
+    else:
+        config_path = config.getoption("--config") or os.environ.get("CONFIG_PATH", DEFAULT_CONFIG_PATH)
+        profile = config.getoption("--profile") or os.environ.get("PROFILE", None)
+        logging.info(f"Profile: {profile}")
+        specs_config = load_specs_config(config_path, profile)
+
+    config._s3_specs_config = specs_config
+    return specs_config
+
+
+def resolve_profile_region(profile):
+    """
+    Region of a profile without building a client, from its region_name or the aws config of its profile_name
+    :param profile: dict: profile of the test parameters
+    :return: str: region or None if it can't be resolved
+    """
+    if "profile_name" not in profile:
+        return profile.get("region_name")
+    try:
+        return boto3.Session(profile_name=profile["profile_name"]).region_name
+    except Exception as e:
+        logging.info(f"Could not resolve the region of profile {profile['profile_name']}: {e}")
+        return None
+
+
+def pytest_collection_modifyitems(config, items):
+    # Tests that would be skipped by the region, dev and profile checks are marked to skip here,
+    # the skip marks are evaluated before any fixture so they never load the config nor build clients
+    try:
+        specs_config = get_specs_config(config)
+        default_profile = specs_config.default_profile
+    except OSError as e:
+        logging.warning(f"Could not load the test parameters at collection, checks are left to the fixtures: {e}")
+        return
+
+    is_dev_run = config.getoption("--run-dev")
+    region = resolve_profile_region(default_profile)
+    # Read by skip_based_on_region_marker, which only builds a client when the region is unknown here
+    config._s3_specs_region = region
+
+    for item in items:
+        if is_dev_run and item.get_closest_marker("skip_if_dev"):
+            item.add_marker(pytest.mark.skip(reason="This test doesn't working with dev mode"))
+            continue
+
+        marker = item.get_closest_marker("only_run_in_region")
+        if region and marker and marker.args and region not in marker.args:
+            regions_to_run = list(marker.args)
+            item.add_marker(pytest.mark.skip(
+                reason=f"Teste pulado porque a região do cliente não está na lista de skip do marcador {regions_to_run}"
+            ))
+            continue
+
+        if "profile_name" in getattr(item, "fixturenames", []) and "profile_name" not in specs_config.capabilities():
+            item.add_marker(pytest.mark.skip(reason="This test requires a profile name"))
+
+
+def pytest_configure(config):
+    # Config errors stop the run here, before any client is built or request is sent
+    try:
+        get_specs_config(config)
+    except OSError as e:
+        logging.warning(f"Could not load the test parameters: {e}")
+    except ValueError as e:
+        raise pytest.UsageError(str(e))
+
+    # Only the xdist controller sees the reports of every worker, the stream is written from there
+    live_report = config.getoption("--live-report")
+    if live_report and not hasattr(config, "workerinput"):
+        config.pluginmanager.register(LiveReport(live_report), "s3_specs_live_report")
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_configure_node(node):
+    # xdist controller: relays the parsed test parameters to each worker
+    specs_config = getattr(node.config, "_s3_specs_config", None)
+    if specs_config is not None:
+        node.workerinput["s3_specs_params"] = specs_config.to_json()
+
+
+def pytest_sessionfinish(session):
+    # pytest-json-report builds its report first (tryfirst), so it's ready here to be summarized
+    # into the stats sidecar read by the dashboard index, webhook and exporter
+    json_report = getattr(getattr(session.config, "_json_report", None), "report", None)
+    report_file = getattr(session.config.option, "json_report_file", None)
+    if json_report is None or not report_file:
+        return
+    try:
+        stats_file = write_stats_sidecar(json_report, report_file)
+        logging.info(f"Stats sidecar written to {stats_file}")
+    except Exception as e:
+        logging.warning(f"Could not write stats sidecar for {report_file}: {e}")
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_json_runtest_metadata(item, call):
+    # Taken at teardown so the calls of the fixture finalizers are attributed to the test too
+    if call.when != "teardown":
+        return {}
+    metadata = {
+        "http_timings": http_timings.take(),
+        "propagation_timings": propagation_timings.take(),
+        "concurrency": take_concurrency_summaries(),
+    }
+    return {key: value for key, value in metadata.items() if value}
 
 
 @pytest.fixture(autouse=True)
-def skip_based_on_region_marker(s3_client, request):
+def skip_based_on_region_marker(request):
     marker = request.node.get_closest_marker("only_run_in_region")
     if marker:
         regions_to_run = []
@@ -53,7 +180,10 @@ def skip_based_on_region_marker(s3_client, request):
         if not regions_to_run:
             logging.warning("Marcador 'skip_in_region' usado sem especificar regiões.")
             return 
-        current_region = s3_client.meta.region_name
+        if getattr(request.config, "_s3_specs_region", None):
+            # Already checked at collection, see pytest_collection_modifyitems
+            return
+        current_region = request.getfixturevalue("s3_client").meta.region_name
 
         logging.info(f"\n[Fixture skip_based_on_region_marker] Teste: {request.node.name}")
         logging.info(f"  Marcador 'only_run_in_region' encontrado com regiões: {regions_to_run}")
@@ -65,14 +195,6 @@ def skip_based_on_region_marker(s3_client, request):
         else:
             logging.info("Região atual está na lista de regiões onde o teste pode ser executado.")
 
-@pytest.fixture(autouse=True)
-def skip_if_is_dev_run(s3_client, request):
-    marker = request.node.get_closest_marker("skip_if_dev")
-    isDevRun = request.config.getoption("--run-dev")
-    if marker:
-        if isDevRun:
-            pytest.skip("This test doesn't working with dev mode")
-
 @pytest.fixture(scope="session", autouse=True)
 def verify_credentials(get_clients, request):
     tenants = get_tenants(get_clients)
@@ -84,33 +206,28 @@ def verify_credentials(get_clients, request):
     if not len(tenants) == len(set(tenants)) or len(tenants) < 2:
         pytest.exit("Perfis estão configurados de forma incorreta. É necessário que tenha dois perfis configurados para diferentes owners")
 
+@pytest.fixture(scope="session")
+def specs_config(request):
+    """
+    Parsed and read-only test parameters, with the profiles indexed by role.
+    """
+    return get_specs_config(request.config)
+
+
 @pytest.fixture
-def test_params(request):
+def test_params(specs_config):
     """
     Loads test parameters from a config file or environment variable.
     """
-    config_path = request.config.getoption("--config") or os.environ.get("CONFIG_PATH", "../params.example.yaml")
-    
-    profile = request.config.getoption("--profile") or os.environ.get("PROFILE", None)
-    logging.info(f"Profile: {profile}")
-    with open(config_path, "r") as f:
-        config = yaml.safe_load(f)
-        if not profile:
-            return config
-        sufix = ["", "-second", "-sa"]
-        for index, profile_index in enumerate(config["profiles"]):
-            if "profile_name" in profile_index and index < 3:
-                profile_index["profile_name"] = f"{profile}{sufix[index]}"
-        
-        return config
+    return specs_config.params
 
 
 @pytest.fixture
-def default_profile(test_params):
+def default_profile(specs_config):
     """
     Returns the default profile from test parameters.
     """
-    return test_params["profiles"][test_params.get("default_profile_index", 0)]
+    return specs_config.default_profile
 
 @pytest.fixture
 def lock_mode(default_profile):
@@ -171,18 +288,11 @@ def s3_client(default_profile):
     """
     Creates a boto3 S3 client using profile credentials or explicit config.
     """
-    if "profile_name" in default_profile:
-        session = boto3.Session(profile_name=default_profile["profile_name"])
-    else:
-        session = boto3.Session(
-            region_name=default_profile["region_name"],
-            aws_access_key_id=default_profile["aws_access_key_id"],
-            aws_secret_access_key=default_profile["aws_secret_access_key"],
-        )
-    return session.client("s3", endpoint_url=default_profile.get("endpoint_url"))
+    session = profile_session(default_profile)
+    return instrument_client(session.client("s3", endpoint_url=default_profile.get("endpoint_url")))
 
 @pytest.fixture
-def rbac_s3_client(test_params, request):
+def rbac_s3_client(specs_config, request):
     """
     Creates a boto3 S3 client using profile credentials or explicit config.
     RBAC clients only
@@ -196,12 +306,11 @@ def rbac_s3_client(test_params, request):
             aws_access_key_id=profile["aws_access_key_id"],
             aws_secret_access_key=profile["aws_secret_access_key"],
         )
-        return session.client("s3", endpoint_url=profile.get("endpoint_url"))
+        return instrument_client(session.client("s3", endpoint_url=profile.get("endpoint_url")))
 
     rbac_profiles = [
         get_client(profile)
-        for profile in test_params['profiles']
-        if 'rbac' in profile.get('profile_name', '')
+        for profile in specs_config.rbac_profiles
     ]
     return rbac_profiles[index]
 
@@ -677,15 +786,8 @@ def multiple_s3_clients(request, test_params):
     
     
     for client in clients:
-        if "profile_name" in client:
-            session = boto3.Session(profile_name=client["profile_name"])
-        else:
-            session = boto3.Session(
-                region_name=client["region_name"],
-                aws_access_key_id=client["aws_access_key_id"],
-                aws_secret_access_key=client["aws_secret_access_key"],
-            )
-        sessions.append(session.client("s3", endpoint_url=client.get("endpoint_url")))
+        session = profile_session(client)
+        sessions.append(instrument_client(session.client("s3", endpoint_url=client.get("endpoint_url"))))
         
     return sessions
     
@@ -693,31 +795,18 @@ def multiple_s3_clients(request, test_params):
 ## Fixtures for session scoped tests
 
 @pytest.fixture(scope="session")
-def session_test_params(request):
+def session_test_params(specs_config):
     """
     Loads test parameters from a config file or environment variable.
     """
-    config_path = request.config.getoption("--config") or os.environ.get("CONFIG_PATH", "../params.example.yaml")
-    
-    profile = request.config.getoption("--profile") or os.environ.get("PROFILE", None)
-    logging.info(f"Profile: {profile}")
-    with open(config_path, "r") as f:
-        config = yaml.safe_load(f)
-        if not profile:
-            return config
-        sufix = ["", "-second", "-sa"]
-        for index, profile_index in enumerate(config["profiles"]):
-            if "profile_name" in profile_index and index < 3:
-                profile_index["profile_name"] = f"{profile}{sufix[index]}"
-        
-        return config
+    return specs_config.params
 
 @pytest.fixture(scope="session")
-def session_default_profile(session_test_params):
+def session_default_profile(specs_config):
     """
     Returns the default profile from test parameters.
     """
-    return session_test_params["profiles"][session_test_params.get("default_profile_index", 0)]
+    return specs_config.default_profile
 
 @pytest.fixture(scope="session")
 def session_profile_name(session_default_profile):
@@ -758,15 +847,8 @@ def session_s3_client(session_default_profile):
     """
     Creates a boto3 S3 client using profile credentials or explicit config.
     """
-    if "profile_name" in session_default_profile:
-        session = boto3.Session(profile_name=session_default_profile["profile_name"])
-    else:
-        session = boto3.Session(
-            region_name=session_default_profile["region_name"],
-            aws_access_key_id=session_default_profile["aws_access_key_id"],
-            aws_secret_access_key=session_default_profile["aws_secret_access_key"],
-        )
-    return session.client("s3", endpoint_url=session_default_profile.get("endpoint_url"))
+    session = profile_session(session_default_profile)
+    return instrument_client(session.client("s3", endpoint_url=session_default_profile.get("endpoint_url")))
 
 @pytest.fixture(params=[{'object_key': 'test-object.txt'}], scope="session")
 def session_bucket_with_one_object(request, session_s3_client):
@@ -1,10 +1,9 @@
+import os
 import pytest
 import subprocess
 import logging
+from s3_specs.docs.tools.visibility import VisibilityTracker, profile_client, write_visibility_lag
 from s3_specs.docs.utils.consistency import (
-    create_temp_objects,
-    upload_objects,
-    validate_key_with_n_successes,
     validate_key_absent,
     bucket_type_map,
     command_map,
@@ -20,40 +19,37 @@ from s3_specs.docs.utils.consistency import (
 def test_object_validations(available_buckets, profile_name, quantity, workers):
     """
     Testa a consistência de objetos adicionais em buckets S3.
+    Todos os objetos enviados são verificados (HEAD e listagem paginada), não apenas o último.
     :param available_buckets: Lista de buckets disponíveis.
     :param profile_name: Nome do perfil AWS a ser usado.
     :param quantity: Número de arquivos a serem criados.
     :param workers: Número de threads para upload paralelo.
     """
     logging.info(f"Starting consistency tests for {quantity} additional objects with {workers} workers")
+    s3_client = profile_client(profile_name, workers)
     for bucket_type, bucket_name in available_buckets:
         prefix = "additional"
-        temp_dir_for_additional_files = f"temp-report-{quantity}-additional"
-        create_temp_objects(quantity, 1, temp_dir_for_additional_files)
-        upload_objects(bucket_name, prefix, temp_dir_for_additional_files, workers)
+        keys = [f"{prefix}/arquivo_{i}.txt" for i in range(1, quantity + 1)]
+        tracker = VisibilityTracker(s3_client, bucket_name, keys, prefix=f"{prefix}/", workers=workers, required_successes=3)
+        success = tracker.track(lambda key: os.urandom(1024), timeout=60)
+        summary = tracker.summary()
+        logging.info(f"[{bucket_type}] visibility lag of {quantity} objects: {summary}")
 
-        object_key = f"{prefix}/arquivo_{quantity}.txt"
-
-        success, attempts, timestamps, attempts_per_command = validate_key_with_n_successes(
-            profile_name,
-            bucket_name,
-            object_key,
-            required_successes=3,
-            max_attempts=10,
-            delay=1,
-            expected_count=quantity
+        assert success, (
+            f"Only {summary['head']['visible']}/{quantity} keys visible by HEAD and "
+            f"{summary['list']['visible']}/{quantity} listed after {summary['attempts']} HEADs of the slowest key."
         )
 
-        assert success, f"Validation failed for key '{object_key}' after {attempts} attempts."
-
+        bucket_id = bucket_type_map.get(bucket_type, bucket_type)
+        write_visibility_lag(summary, 'output/visibility_lag.csv', quantity, workers, profile_name, bucket_id)
         with open('output/report_inconsistencies.csv', 'a') as f:
-            for command in attempts_per_command:
-                elapsed = timestamps.get(command, -1)
-                bucket_id = bucket_type_map.get(bucket_type, bucket_type)
+            # Tempo até toda a população ficar visível, no formato das verificações de uma única chave
+            for command, probe in (("head-object", "head"), ("list-objects", "list")):
+                elapsed = summary[probe]["max_seconds"]
                 command_id = command_map.get(command, "0")
                 operation_id = operation_map["put"]
 
-                f.write(f"{quantity},{workers},{operation_id}_{command_id},{profile_name},{bucket_id},{elapsed:.2f},{attempts_per_command[command]}\n")
+                f.write(f"{quantity},{workers},{operation_id}_{command_id},{profile_name},{bucket_id},{elapsed:.2f},{summary['attempts']}\n")
 
 # Testes de consistência para objetos deletados
 @pytest.mark.slow
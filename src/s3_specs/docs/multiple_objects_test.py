@@ -3,8 +3,8 @@ import logging
 from s3_specs.docs.tools.crud import (fixture_bucket_with_name,
                         fixture_upload_multiple_objects,
                         upload_multiple_objects,
-                        download_objects_multithreaded,
-                        list_all_objects)
+                        download_objects_throughput)
+from s3_specs.docs.tools.listing import count_objects
 
 ### Fazendo o upload de grandes quantidades de objetos em paralelo
 
@@ -45,7 +45,7 @@ def test_upload_multiple_objects(s3_client, fixture_bucket_with_name, file_path:
    
     successful_uploads = upload_multiple_objects(s3_client, bucket_name, file_path, object_prefix, object_quantity)
     # Checking if all the objects were uploaded
-    objects_in_bucket = len(list_all_objects(s3_client, bucket_name))
+    objects_in_bucket, _ = count_objects(s3_client, bucket_name, parallel=True)
 
     logging.info(f"Uploaded expected: {object_quantity}, made:{successful_uploads}, bucket: {objects_in_bucket}")
     assert successful_uploads == objects_in_bucket , f"Expects uploads {successful_uploads} to be equal to objects in the bucket {objects_in_bucket} "
@@ -75,9 +75,13 @@ def test_download_multiple_objects(s3_client, fixture_bucket_with_name, fixture_
     successful_uploads = fixture_upload_multiple_objects
 
     logging.info(f"Downloading objects from {fixture_bucket_with_name}")
-    successful_downloads = download_objects_multithreaded(s3_client, fixture_bucket_with_name)
+    # Every body is read and checked against its length and ETag, so the throughput is the data plane one
+    stats = download_objects_throughput(s3_client, fixture_bucket_with_name)
+    successful_downloads = stats["objects"]
+    logging.info(f"Download throughput: {stats['mb_per_second']} MB/s, {stats['objects_per_second']} objects/s")
 
     # Checking if all the objects were downloaded
+    assert stats["failed"] == 0, f"Expects no failed downloads, {stats['failed']} failed"
     assert successful_downloads == successful_uploads, f"Expects downloads {successful_downloads} to be equal to uploads {successful_uploads} "
 
 
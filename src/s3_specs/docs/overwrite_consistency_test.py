@@ -1,23 +1,43 @@
 import pytest
 import logging
+from s3_specs.docs.tools.overwrite_race import OverwriteRace
+from s3_specs.docs.tools.visibility import profile_client
 from s3_specs.docs.utils.consistency import (
-    overwrite_and_validate_reads
+    bucket_type_map,
+    operation_map
 )
 
 
 @pytest.mark.slow
 @pytest.mark.consistency
-@pytest.mark.parametrize("quantity", [10])
-def test_overwrite_read_consistency(profile_name, available_buckets, quantity):
+@pytest.mark.parametrize("duration", [10])
+@pytest.mark.parametrize("writers, readers", [(2, 8)])
+def test_overwrite_read_consistency(profile_name, available_buckets, duration, writers, readers):
+    """
+    Sobrescritas e leituras concorrentes na mesma chave: as leituras nunca podem voltar para uma
+    versão mais antiga que uma já lida, e não podem ficar mais atrasadas que max_staleness_ms.
+    """
     object_key = "overwrite-test/arquivo_unico.txt"
+    # Mesma tolerância do teste anterior, que esperava 1 segundo entre a escrita e as leituras
+    max_staleness_ms = 1000
+    s3_client = profile_client(profile_name, writers + readers)
     for bucket_type, bucket_name in available_buckets:
         logging.info(f"Validando consistência após sobrescritas no bucket: {bucket_type}")
-        overwrite_and_validate_reads(
-            bucket_name=bucket_name,
-            object_key=object_key,
-            quantity=quantity,
-            profile_name=profile_name,
-            bucket_type=bucket_type,
-            read_repeats=3,
-            delay=1
+        result = OverwriteRace(s3_client, bucket_name, object_key, writers=writers, readers=readers).run(duration)
+        logging.info(f"[{bucket_type}] {result}")
+
+        assert result["monotonic_violations"] == 0, (
+            f"[{bucket_type}] {result['monotonic_violations']} leituras voltaram para uma versão mais antiga: "
+            f"{result['violation_examples']}"
+        )
+        assert result["staleness_ms"]["max"] <= max_staleness_ms, (
+            f"[{bucket_type}] {result['stale_reads']}/{result['reads']} leituras desatualizadas, "
+            f"até {result['staleness_ms']['max']} ms"
         )
+
+        with open("output/report_inconsistencies.csv", "a") as f:
+            # Série estável por configuração da corrida, com o maior atraso medido como tempo
+            bucket_id = bucket_type_map.get(bucket_type, bucket_type)
+            operation_id = operation_map["overwrite"]
+            elapsed = result["staleness_ms"]["max"] / 1000
+            f.write(f"{readers},{writers},{operation_id}_{writers}x{readers},{profile_name},{bucket_id},{elapsed:.2f},{result['reads']}\n")
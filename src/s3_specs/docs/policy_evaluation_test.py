@@ -27,13 +27,11 @@ import json
 import pytest
 import logging
 from datetime import datetime, timedelta, timezone
-from botocore.exceptions import ClientError
 from s3_specs.docs.s3_helpers import (
     run_example,
     change_policies_json,
-    create_policy_json,
 )
-import time
+from s3_specs.docs.tools.policy_matrix import DEFAULT_POLICY_WAIT, PolicyMatrix, scenarios_from_cases
 
 config = os.getenv("CONFIG", config)
 pytestmark = [pytest.mark.policy, pytest.mark.skip_if_dev, pytest.mark.homologacao]
@@ -196,44 +194,43 @@ test_cases_policy_eval = [
 ]
 
 
-@pytest.mark.parametrize(
-    "multiple_s3_clients, policy_template, boto3_action, expected_result",
-    test_cases_policy_eval,
-    indirect=["multiple_s3_clients"],
-    ids=[
-        "scenario_1_allow_allow_both_match",
-        "scenario_2_deny_allow_both_match",
-        "scenario_3_allow_deny_both_match",
-        "scenario_4_deny_deny_both_match",
-        "scenario_6_allow_deny_only_allow_matches",
-        "scenario_7_allow_deny_only_deny_matches",
-    ],
-)
-def test_policy_evaluation_conditions(
-    multiple_s3_clients,
-    bucket_with_one_object,
-    policy_template,
-    boto3_action,
-    expected_result,
-):
-    s3_client = multiple_s3_clients[0]
-    bucket_name, object_key, _ = bucket_with_one_object
+test_cases_policy_eval_ids = [
+    "scenario_1_allow_allow_both_match",
+    "scenario_2_deny_allow_both_match",
+    "scenario_3_allow_deny_both_match",
+    "scenario_4_deny_deny_both_match",
+    "scenario_6_allow_deny_only_allow_matches",
+    "scenario_7_allow_deny_only_deny_matches",
+]
+
+# Cenários aplicados juntos, cada um restrito ao prefixo do seu objeto (ver tools.policy_matrix),
+# pagando a espera de propagação da política uma única vez
+test_cases_policy_eval_scenarios = scenarios_from_cases(test_cases_policy_eval, test_cases_policy_eval_ids)
+
+
+@pytest.fixture(scope="module")
+def policy_eval_outcomes(session_s3_client, session_default_profile):
+    matrix = PolicyMatrix(
+        session_s3_client,
+        test_cases_policy_eval_scenarios,
+        policy_wait_time=session_default_profile.get("policy_wait_time", DEFAULT_POLICY_WAIT),
+    )
+    try:
+        matrix.setup()
+        yield matrix.run()
+    finally:
+        matrix.teardown()
 
-    policy_doc = create_policy_json(bucket_name, policy_template)
-    s3_client.put_bucket_policy(Bucket=bucket_name, Policy=policy_doc)
-    time.sleep(120)
 
-    kwargs = {"Bucket": bucket_name, "Key": object_key}
-    method = getattr(s3_client, boto3_action)
+@pytest.mark.parametrize("scenario", test_cases_policy_eval_scenarios, ids=test_cases_policy_eval_ids)
+def test_policy_evaluation_conditions(policy_eval_outcomes, scenario):
+    outcome = policy_eval_outcomes[scenario["name"]]
 
-    if expected_result == "allow":
+    if scenario["expected"] == "allow":
         # Esperamos que a operação seja bem-sucedida
-        response = method(**kwargs)
-        assert response["ResponseMetadata"]["HTTPStatusCode"] == 200
-    else:  # expected_result == "deny"
+        assert outcome["result"] == "allow", f"Expected success, got {outcome}"
+        assert outcome["status"] == 200
+    else:
         # Esperamos que a operação seja negada
-        try:
-            response = method(**kwargs)
-            pytest.fail("Expected AccessDeniedByBucketPolicy exception not raised")
-        except ClientError as e:
-            assert e.response["Error"]["Code"] == "AccessDeniedByBucketPolicy"
+        assert outcome["result"] == "deny", "Expected AccessDeniedByBucketPolicy exception not raised"
+        assert outcome["code"] == "AccessDeniedByBucketPolicy"
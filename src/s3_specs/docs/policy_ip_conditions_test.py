@@ -27,13 +27,11 @@ import json
 import pytest
 import logging
 from datetime import datetime, timedelta, timezone
-from botocore.exceptions import ClientError
 from s3_specs.docs.s3_helpers import (
     run_example,
     change_policies_json,
-    create_policy_json,
 )
-import time
+from s3_specs.docs.tools.policy_matrix import DEFAULT_POLICY_WAIT, PolicyMatrix, scenarios_from_cases
 
 config = os.getenv("CONFIG", config)
 pytestmark = [pytest.mark.policy, pytest.mark.skip_if_dev, pytest.mark.homologacao]
@@ -92,40 +90,39 @@ test_cases_policy_ip = [
 ]
 
 
-@pytest.mark.parametrize(
-    "multiple_s3_clients, policy_template, boto3_action, expected_result",
-    test_cases_policy_ip,
-    indirect=["multiple_s3_clients"],
-    ids=[
-        "ip_allow_only_specific_ip_not_matched",
-        "ip_deny_only_specific_ip_not_matched",
-    ],
-)
-def test_policy_ip_conditions(
-    multiple_s3_clients,
-    bucket_with_one_object,
-    policy_template,
-    boto3_action,
-    expected_result,
-):
-    s3_client = multiple_s3_clients[0]
-    bucket_name, object_key, _ = bucket_with_one_object
-
-    policy_doc = create_policy_json(bucket_name, policy_template)
-    s3_client.put_bucket_policy(Bucket=bucket_name, Policy=policy_doc)
-    time.sleep(120)
-
-    kwargs = {"Bucket": bucket_name, "Key": object_key}
-    method = getattr(s3_client, boto3_action)
-
-    if expected_result == "allow":
+test_cases_policy_ip_ids = [
+    "ip_allow_only_specific_ip_not_matched",
+    "ip_deny_only_specific_ip_not_matched",
+]
+
+# Cenários aplicados juntos, cada um restrito ao prefixo do seu objeto (ver tools.policy_matrix),
+# pagando a espera de propagação da política uma única vez
+test_cases_policy_ip_scenarios = scenarios_from_cases(test_cases_policy_ip, test_cases_policy_ip_ids)
+
+
+@pytest.fixture(scope="module")
+def policy_ip_outcomes(session_s3_client, session_default_profile):
+    matrix = PolicyMatrix(
+        session_s3_client,
+        test_cases_policy_ip_scenarios,
+        policy_wait_time=session_default_profile.get("policy_wait_time", DEFAULT_POLICY_WAIT),
+    )
+    try:
+        matrix.setup()
+        yield matrix.run()
+    finally:
+        matrix.teardown()
+
+
+@pytest.mark.parametrize("scenario", test_cases_policy_ip_scenarios, ids=test_cases_policy_ip_ids)
+def test_policy_ip_conditions(policy_ip_outcomes, scenario):
+    outcome = policy_ip_outcomes[scenario["name"]]
+
+    if scenario["expected"] == "allow":
         # Esperamos que a operação seja bem-sucedida
-        response = method(**kwargs)
-        assert response["ResponseMetadata"]["HTTPStatusCode"] == 200
+        assert outcome["result"] == "allow", f"Expected success, got {outcome}"
+        assert outcome["status"] == 200
     else:
         # Esperamos que a operação seja negada com erro AccessDeniedByBucketPolicy
-        try:
-            response = method(**kwargs)
-            pytest.fail("Expected AccessDeniedByBucketPolicy exception not raised")
-        except ClientError as e:
-            assert e.response["Error"]["Code"] == "AccessDeniedByBucketPolicy"
+        assert outcome["result"] == "deny", "Expected AccessDeniedByBucketPolicy exception not raised"
+        assert outcome["code"] == "AccessDeniedByBucketPolicy"
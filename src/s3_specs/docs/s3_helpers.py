@@ -10,8 +10,18 @@ import yaml
 from pathlib import Path
 import ipynbname
 import json
+import threading
 import time
 from s3_specs.docs.tools.utils import generate_valid_bucket_name
+from s3_specs.docs.tools.listing import iter_objects
+
+# Fast polling waiters: the first probe is repeated after a few milliseconds and the delay grows
+# up to WAIT_MAX_DELAY, so fixtures pay the real propagation delay instead of the 5 seconds cadence
+# of the stock botocore waiters. The default deadline matches the stock one (20 attempts * 5s).
+WAIT_INITIAL_DELAY = 0.05
+WAIT_MAX_DELAY = 1.0
+WAIT_BACKOFF = 1.5
+WAIT_TIMEOUT = 100
 
 def get_spec_path():
     spec_path = os.getenv("SPEC_PATH")
@@ -44,6 +54,109 @@ def generate_unique_bucket_name(base_name="my-unique-bucket"):
 
     return base_name.lower()
 
+class PropagationTimings:
+    """
+    Keeps how long each waited resource took to appear or disappear, grouped by waiter.
+    Taken at the end of every test and attached to its json report metadata.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.waiters = {}
+
+    def record(self, waiter_name, elapsed, polls, timed_out):
+        with self.lock:
+            waiter = self.waiters.setdefault(waiter_name, {"count": 0, "timeouts": 0, "polls": 0, "seconds": []})
+            waiter["count"] += 1
+            waiter["timeouts"] += int(timed_out)
+            waiter["polls"] += polls
+            waiter["seconds"].append(round(elapsed, 4))
+
+    def take(self):
+        with self.lock:
+            waiters, self.waiters = self.waiters, {}
+        return waiters
+
+
+propagation_timings = PropagationTimings()
+
+
+def wait_until(waiter_name, probe, timeout=WAIT_TIMEOUT, **kwargs):
+    """
+    Polls probe until it returns True, with a delay growing from WAIT_INITIAL_DELAY to WAIT_MAX_DELAY.
+
+    :param waiter_name: str: name of the waiter, e.g. bucket_exists, used in the errors and timings
+    :param probe: callable: receives kwargs and returns True when the expected state is reached
+    :param timeout: float: seconds until giving up
+    :return: float: seconds the resource took to reach the expected state
+    :raises WaiterError: if the deadline is reached
+    """
+    started = time.monotonic()
+    deadline = started + timeout
+    delay = WAIT_INITIAL_DELAY
+    polls = 0
+
+    while True:
+        polls += 1
+        if probe(**kwargs):
+            elapsed = time.monotonic() - started
+            propagation_timings.record(waiter_name, elapsed, polls, timed_out=False)
+            return elapsed
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            elapsed = time.monotonic() - started
+            propagation_timings.record(waiter_name, elapsed, polls, timed_out=True)
+            raise WaiterError(
+                name=waiter_name,
+                reason=f"Max wait of {timeout}s exceeded after {polls} polls",
+                last_response=kwargs,
+            )
+        time.sleep(min(delay, remaining))
+        delay = min(delay * WAIT_BACKOFF, WAIT_MAX_DELAY)
+
+
+def head_probe(waiter_name, head, success, retry=()):
+    """
+    Probe for wait_until built on a head request, following the acceptors of the stock waiters:
+    a success status ends the wait, a retry status or a non error response polls again and
+    any other error fails right away.
+
+    :param head: callable: client method, e.g. s3_client.head_bucket
+    :param success: tuple int: status codes meaning the expected state was reached
+    :param retry: tuple int: error status codes meaning the state was not reached yet
+    """
+    def probe(**kwargs):
+        try:
+            status = head(**kwargs)["ResponseMetadata"]["HTTPStatusCode"]
+        except ClientError as e:
+            status = e.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+            if status not in success and status not in retry:
+                raise WaiterError(name=waiter_name, reason=f"Unexpected error: {e}", last_response=e.response)
+        return status in success
+
+    return probe
+
+
+def wait_for_bucket_exists(s3_client, bucket_name, timeout=WAIT_TIMEOUT):
+    probe = head_probe("bucket_exists", s3_client.head_bucket, success=(200, 301, 403), retry=(404,))
+    return wait_until("bucket_exists", probe, timeout=timeout, Bucket=bucket_name)
+
+
+def wait_for_bucket_not_exists(s3_client, bucket_name, timeout=WAIT_TIMEOUT):
+    probe = head_probe("bucket_not_exists", s3_client.head_bucket, success=(404,))
+    return wait_until("bucket_not_exists", probe, timeout=timeout, Bucket=bucket_name)
+
+
+def wait_for_object_exists(s3_client, bucket_name, object_key, timeout=WAIT_TIMEOUT):
+    probe = head_probe("object_exists", s3_client.head_object, success=(200,), retry=(404,))
+    return wait_until("object_exists", probe, timeout=timeout, Bucket=bucket_name, Key=object_key)
+
+
+def wait_for_object_not_exists(s3_client, bucket_name, object_key, timeout=WAIT_TIMEOUT):
+    probe = head_probe("object_not_exists", s3_client.head_object, success=(404,))
+    return wait_until("object_not_exists", probe, timeout=timeout, Bucket=bucket_name, Key=object_key)
+
 def wait_until_bucket_is_empty(s3_client, bucket_name, max_retries=3, delay=2):
     """
     Espera até que o bucket esteja vazio, com número limitado de tentativas.
@@ -90,10 +203,9 @@ def delete_bucket_and_wait(s3_client, bucket_name, max_retries=3, delay=2):
                 logging.error(f"Falha ao deletar o bucket '{bucket_name}' após {max_retries} tentativas.")
                 return
 
-    waiter = s3_client.get_waiter('bucket_not_exists')
     try:
-        waiter.wait(Bucket=bucket_name)
-        logging.info(f"Bucket '{bucket_name}' confirmado como deletado.")
+        elapsed = wait_for_bucket_not_exists(s3_client, bucket_name)
+        logging.info(f"Bucket '{bucket_name}' confirmado como deletado em {elapsed:.3f}s.")
     except WaiterError as e:
         logging.error(f"Erro ao aguardar confirmação de deleção do bucket '{bucket_name}': {e}")
 
@@ -117,9 +229,8 @@ def create_bucket_and_wait(s3_client, bucket_name):
     except Exception as e:
         logging.info(f"create bucket errored with: {e}")
 
-    waiter = s3_client.get_waiter('bucket_exists')
-    waiter.wait(Bucket=bucket_name)
-    logging.info(f"Bucket '{bucket_name}' confirmed as created.")
+    elapsed = wait_for_bucket_exists(s3_client, bucket_name)
+    logging.info(f"Bucket '{bucket_name}' confirmed as created after {elapsed:.3f}s.")
 
 def delete_object_and_wait(s3_client, bucket_name, object_key, version_id=None):
     try:
@@ -133,9 +244,8 @@ def delete_object_and_wait(s3_client, bucket_name, object_key, version_id=None):
     except Exception as e:
         logging.info(f"delete object got error: {e}")
 
-    waiter = s3_client.get_waiter('object_not_exists')
     try:
-        waiter.wait(Bucket=bucket_name, Key=object_key)
+        wait_for_object_not_exists(s3_client, bucket_name, object_key)
     except Exception as e:
         logging.info(f"delete waiter got error: {e}")
     logging.info(f"Object '{object_key}' in bucket '{bucket_name}' confirmed as deleted.")
@@ -206,12 +316,11 @@ def put_object_and_wait(s3_client, bucket_name, object_key, content):
     version_id = put_response.get("VersionId", None)
 
     # Wait for the object to exist
-    waiter = s3_client.get_waiter('object_exists')
-    waiter.wait(Bucket=bucket_name, Key=object_key)
+    elapsed = wait_for_object_exists(s3_client, bucket_name, object_key)
 
     # Log confirmation
     logging.info(
-        f"Object '{object_key}' in bucket '{bucket_name}' confirmed as uploaded. Version ID: {version_id}"
+        f"Object '{object_key}' in bucket '{bucket_name}' confirmed as uploaded after {elapsed:.3f}s. Version ID: {version_id}"
     )
 
     return version_id
@@ -241,18 +350,11 @@ def cleanup_old_buckets(s3_client, base_name, lock_mode=None, retention_days=1):
 
                     # If bucket is versioned, delete all object versions and delete markers
                     if bucket_versioning.get('Status') == 'Enabled':
-                        paginator = s3_client.get_paginator('list_object_versions')
-                        for page in paginator.paginate(Bucket=bucket_name):
-                            # Delete object versions
-                            for version in page.get('Versions', []):
-                                delete_version(
-                                    s3_client, bucket_name, version, lock_mode
-                                )
-                            # Delete markers
-                            for marker in page.get('DeleteMarkers', []):
-                                delete_version(
-                                    s3_client, bucket_name, marker, lock_mode
-                                )
+                        # Object versions and delete markers
+                        for entry in iter_objects(s3_client, bucket_name, versions=True, raw=True):
+                            delete_version(
+                                s3_client, bucket_name, {'Key': entry.key, 'VersionId': entry.version_id}, lock_mode
+                            )
 
                     # Delete the bucket itself
                     s3_client.delete_bucket(Bucket=bucket_name)
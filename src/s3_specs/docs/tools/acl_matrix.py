@@ -0,0 +1,160 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from s3_specs.docs.s3_helpers import (
+    create_bucket_and_wait,
+    generate_unique_bucket_name,
+    probe_versioning_status,
+    update_existing_keys,
+)
+from s3_specs.docs.tools.crud import delete_bucket, delete_objects_multithreaded
+
+# Same as the default max_pool_connections of the boto3 clients
+MATRIX_WORKERS = 10
+CANNED_ACLS = ["private", "public-read", "public-read-write", "authenticated-read"]
+
+### Functions
+
+
+def create_versioned_bucket(s3_client, base_name):
+    """
+    Creates a bucket and waits until its versioning is known to be Enabled
+    :return: str: name of the bucket
+    """
+    bucket_name = generate_unique_bucket_name(base_name=base_name)
+    create_bucket_and_wait(s3_client, bucket_name)
+    s3_client.put_bucket_versioning(Bucket=bucket_name, VersioningConfiguration={"Status": "Enabled"})
+    versioning_status = probe_versioning_status(s3_client, bucket_name)
+    assert versioning_status == "Enabled", f"Expected VersionConfiguration for bucket {bucket_name} to be Enabled, got {versioning_status}"
+    return bucket_name
+
+
+def status_code_of(method, kwargs):
+    """
+    Calls a client method
+    :return: int: http status of the response or of the error, 500 for errors without a response
+    """
+    try:
+        return method(**kwargs)["ResponseMetadata"]["HTTPStatusCode"]
+    except Exception as e:
+        logging.info(f"error {e}")
+        return e.response["ResponseMetadata"]["HTTPStatusCode"] if hasattr(e, "response") else 500
+
+
+class AclMatrix:
+    """
+    Runs the cross account ACL checks of every (acl, method) pair at once. Each ACL gets one versioned
+    bucket, prepared in parallel with the others, holding one object per method under its own key, so
+    a delete_object check doesn't race with the get_object check of the same ACL. The checks are sent
+    concurrently by the second client the first time a test asks for a result, the other tests only
+    read theirs.
+    """
+
+    def __init__(self, cases, allowed_operations, methods_input, workers=MATRIX_WORKERS):
+        """
+        :param cases: list tuple: (acl name, method name, expected status codes) of each test
+        :param allowed_operations: dict: bucket and object methods a non owner may call, by ACL
+        :param methods_input: dict: default kwargs of each method, the keys present are filled in
+        """
+        self.cases = cases
+        self.allowed_operations = allowed_operations
+        self.methods_input = methods_input
+        self.workers = workers
+        self.lock = threading.Lock()
+        # Held by the test that runs the matrix, the others wait for its results
+        self.run_lock = threading.Lock()
+        self.owner = None
+        self.buckets = {}
+        self.results = None
+        self.error = None
+
+    @staticmethod
+    def object_key(method_name):
+        return f"{method_name}-object.txt"
+
+    def prepare(self, acl_name):
+        bucket_name = create_versioned_bucket(self.owner, f"acl-matrix-{acl_name}")
+        with self.lock:
+            self.buckets[acl_name] = bucket_name
+        self.owner.put_bucket_acl(Bucket=bucket_name, ACL=acl_name)
+
+        versions = {}
+        for method_name in {method for acl, method, _ in self.cases if acl == acl_name}:
+            object_key = self.object_key(method_name)
+            response = self.owner.put_object(Bucket=bucket_name, Key=object_key, Body=b"Sample content for testing acls.")
+            versions[method_name] = response.get("VersionId")
+            # Set the object-level ACL if required
+            if method_name in self.allowed_operations[acl_name]["object"]:
+                self.owner.put_object_acl(Bucket=bucket_name, Key=object_key, ACL=acl_name)
+        return acl_name, versions
+
+    def check(self, other, case, versions):
+        acl_name, method_name, _ = case
+        # Copied, the defaults are shared by every check
+        method_kwargs = update_existing_keys(
+            dict(self.methods_input[method_name]),
+            {
+                "Bucket": self.buckets[acl_name],
+                "Key": self.object_key(method_name),
+                "ACL": acl_name,
+                "VersionId": versions[acl_name][method_name],
+            },
+        )
+        logging.info(f"method_args: {method_kwargs} method_name: {method_name}")
+        return (acl_name, method_name), status_code_of(getattr(other, method_name), method_kwargs)
+
+    def run(self, clients):
+        """
+        Prepares the buckets with the first client and runs every check with the second one
+        :param clients: list: boto3 s3 clients, the owner and another user
+        :return: dict: actual status code by (acl name, method name)
+        """
+        self.owner, other = clients[0], clients[1]
+        acl_names = list(dict.fromkeys(acl for acl, _, _ in self.cases))
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            versions = dict(executor.map(self.prepare, acl_names))
+            results = dict(executor.map(lambda case: self.check(other, case, versions), self.cases))
+        logging.info(f"ACL matrix of {len(self.cases)} checks on {len(acl_names)} buckets: {results}")
+        return results
+
+    def status(self, clients, acl_name, method_name):
+        """
+        Status code of a check, running the whole matrix on the first call
+        :param clients: list: multiple_s3_clients of the test, the owner and another user
+        """
+        with self.run_lock:
+            if self.results is None and self.error is None:
+                try:
+                    self.results = self.run(clients)
+                except Exception as e:
+                    self.error = e
+        if self.error is not None:
+            pytest.fail(f"ACL matrix setup failed: {self.error!r}")
+        return self.results[(acl_name, method_name)]
+
+    def teardown(self):
+        for bucket_name in self.buckets.values():
+            delete_objects_multithreaded(self.owner, bucket_name)
+            delete_bucket(self.owner, bucket_name)
+
+
+@pytest.fixture(scope="module")
+def fixture_bucket_with_acl_objects(session_s3_client):
+    """
+    One bucket per module holding one object per canned ACL, for the tests that set an ACL
+    on an object and check it, instead of a new bucket for each ACL
+    :yield: tuple: bucket name and the object key of each canned ACL
+    """
+    bucket_name = generate_unique_bucket_name(base_name="acl-objects")
+    create_bucket_and_wait(session_s3_client, bucket_name)
+    object_keys = {acl_name: f"{acl_name}-object.txt" for acl_name in CANNED_ACLS}
+    for object_key in object_keys.values():
+        session_s3_client.put_object(Bucket=bucket_name, Key=object_key, Body=b"Sample content for testing acls.")
+
+    yield bucket_name, object_keys
+
+    delete_objects_multithreaded(session_s3_client, bucket_name)
+    delete_bucket(session_s3_client, bucket_name)
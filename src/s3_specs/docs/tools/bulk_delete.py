@@ -1,10 +1,11 @@
 import pytest
-import boto3
 import logging
 from s3_specs.docs.s3_helpers import generate_unique_bucket_name, get_tenants
 from s3_specs.docs.tools.permission import generate_policy
 from botocore.exceptions import ClientError
 from botocore.config import Config
+from s3_specs.docs.tools.http_timing import instrument_client
+from s3_specs.docs.tools.params import profile_session
 
 @pytest.fixture
 def get_bulk_s3_clients(session_test_params):
@@ -13,15 +14,7 @@ def get_bulk_s3_clients(session_test_params):
     sessions = []
     
     for client in clients:
-        if "profile_name" in client:
-            session = boto3.Session(profile_name=client["profile_name"])
-        else:
-            session = boto3.Session(
-                region_name=client["region_name"],
-                aws_access_key_id=client["aws_access_key_id"],
-                aws_secret_access_key=client["aws_secret_access_key"],
-            )
-        
+        session = profile_session(client)
         client = session.client("s3", endpoint_url=client.get("endpoint_url"))
         
         def custom_request(request, **kwargs):
@@ -30,7 +23,7 @@ def get_bulk_s3_clients(session_test_params):
         event_system = client.meta.events
         event_system.register_first('request-created', custom_request)
 
-        sessions.append(client)
+        sessions.append(instrument_client(client))
         
     return sessions
 
@@ -0,0 +1,199 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+
+from botocore.exceptions import ConnectionClosedError, ConnectTimeoutError, ReadTimeoutError
+
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 128
+# Multiplicative decrease applied on throttling, timeouts or latency inflation
+DECREASE_FACTOR = 0.5
+# A smoothed latency this many times the baseline latency counts as congestion
+LATENCY_INFLATION = 3.0
+# Weight of each call in the smoothed latency, a single slow call doesn't cut the limit
+LATENCY_SMOOTHING = 0.2
+# The baseline (lowest recent latency) drifts up this much per call, so it follows slower objects or endpoints
+BASELINE_DRIFT = 1.01
+THROTTLING_CODES = ("SlowDown", "Throttling", "ThrottlingException", "RequestTimeout", "ServiceUnavailable")
+TIMEOUT_ERRORS = (ConnectTimeoutError, ReadTimeoutError, ConnectionClosedError)
+
+# Controllers shared by every helper and client talking to the same endpoint
+_controllers = {}
+_controllers_lock = threading.Lock()
+_touched = set()
+
+### Functions
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD (additive increase, multiplicative decrease) limit of the requests in flight to an endpoint.
+    The limit starts at the number of cpus and doubles every round of healthy calls until the first
+    congestion signal, then grows by one per round. It's halved on 503 SlowDown and other throttling
+    responses, on timeouts and when the latency inflates over the baseline, at most once per round
+    so the calls already in flight when the endpoint got congested don't cut it again.
+    """
+
+    def __init__(self, name, initial=None, minimum=MIN_CONCURRENCY, maximum=MAX_CONCURRENCY):
+        self.name = name
+        self.minimum = minimum
+        self.maximum = maximum
+        self.lock = threading.Lock()
+        self.limit = float(min(max(initial or os.cpu_count() or 1, minimum), maximum))
+        self.slow_start = True
+        self.baseline = None
+        self.smoothed = None
+        self.last_decrease = 0.0
+        self.in_flight = 0
+        self.stats = {"calls": 0, "errors": 0, "decreases": 0, "peak": int(self.limit), "signals": {}}
+
+    def current_limit(self):
+        return int(self.limit)
+
+    def started(self):
+        with self.lock:
+            self.in_flight += 1
+        return time.perf_counter()
+
+    def finished(self, started, error=False):
+        """
+        Accounts a call made through map_adaptive
+        :param started: float: value returned by started
+        :param error: bool: whether the call raised
+        """
+        now = time.perf_counter()
+        latency = now - started
+        with self.lock:
+            saturated = self.in_flight >= int(self.limit)
+            self.in_flight -= 1
+            self.stats["calls"] += 1
+            if error:
+                self.stats["errors"] += 1
+                return
+            if self.baseline is None or latency < self.baseline:
+                self.baseline = latency
+            else:
+                self.baseline *= BASELINE_DRIFT
+            self.smoothed = latency if self.smoothed is None else self.smoothed + LATENCY_SMOOTHING * (latency - self.smoothed)
+            if self.smoothed > self.baseline * LATENCY_INFLATION and self.baseline > 0:
+                self._decrease("latency", started)
+            elif saturated:
+                # Only grows while the limit is what holds the calls back
+                self.limit = min(self.limit + (1.0 if self.slow_start else 1.0 / self.limit), self.maximum)
+                self.stats["peak"] = max(self.stats["peak"], int(self.limit))
+
+    def congested(self, reason, started=None):
+        """
+        Reports a congestion signal, e.g. a throttled response seen by the client events
+        :param reason: str: kind of signal, e.g. SlowDown or timeout
+        :param started: float: when the signaling call started, None if unknown
+        """
+        with self.lock:
+            self._decrease(reason, started)
+
+    def _decrease(self, reason, started):
+        self.stats["signals"][reason] = self.stats["signals"].get(reason, 0) + 1
+        now = time.perf_counter()
+        # Calls started before the last decrease (or without start within a baseline of it) already counted
+        cooldown = max(self.baseline or 0.0, 0.05)
+        if (started is not None and started <= self.last_decrease) or now - self.last_decrease < cooldown:
+            return
+        self.limit = max(self.limit * DECREASE_FACTOR, self.minimum)
+        self.slow_start = False
+        self.last_decrease = now
+        self.stats["decreases"] += 1
+        logging.info(f"Concurrency of {self.name} decreased to {int(self.limit)} ({reason})")
+
+    def summary(self):
+        with self.lock:
+            summary = dict(self.stats, signals=dict(self.stats["signals"]))
+            summary.update(
+                limit=int(self.limit),
+                baseline_seconds=round(self.baseline or 0.0, 4),
+                latency_seconds=round(self.smoothed or 0.0, 4),
+            )
+            return summary
+
+
+def controller_for(s3_client):
+    """
+    Concurrency controller of the endpoint of a client, listening to the throttling seen by the client
+    :param s3_client: boto3 s3 client
+    :return: AdaptiveConcurrency: controller shared by the clients of the endpoint
+    """
+    name = s3_client.meta.endpoint_url
+    with _controllers_lock:
+        if name not in _controllers:
+            _controllers[name] = AdaptiveConcurrency(name)
+        controller = _controllers[name]
+        _touched.add(name)
+
+    if getattr(s3_client.meta, "_adaptive_concurrency", None) is not controller:
+        # botocore retries throttled attempts on its own, the helpers only see the slower call
+        s3_client.meta.events.register("needs-retry.s3", lambda **kwargs: notify_congestion(controller, **kwargs))
+        s3_client.meta._adaptive_concurrency = controller
+    return controller
+
+
+def notify_congestion(controller, response=None, caught_exception=None, **kwargs):
+    # Must return None, any other value would be used by botocore as the retry delay
+    if isinstance(caught_exception, TIMEOUT_ERRORS):
+        controller.congested("timeout")
+    elif response is not None:
+        http_response, parsed = response
+        code = (parsed or {}).get("Error", {}).get("Code")
+        if code in THROTTLING_CODES or getattr(http_response, "status_code", None) == 503:
+            controller.congested(code or "503")
+    return None
+
+
+def map_adaptive(s3_client, function, items):
+    """
+    Runs function on each item keeping as many calls in flight as the endpoint of the client sustains
+    :param s3_client: boto3 s3 client used by function, its endpoint selects the controller
+    :param function: callable: called with each item
+    :param items: iterable: arguments of each call, consumed as the calls are submitted
+    :return: generator: results in completion order
+    """
+    controller = controller_for(s3_client)
+    # Calls over the connection pool of the client would open and discard a connection each, so the
+    # limit would measure connection churn instead of the endpoint
+    ceiling = min(controller.maximum, s3_client.meta.config.max_pool_connections)
+
+    def call(item):
+        started = controller.started()
+        try:
+            result = function(item)
+        except Exception:
+            controller.finished(started, error=True)
+            raise
+        controller.finished(started)
+        return result
+
+    with ThreadPoolExecutor(max_workers=ceiling) as executor:
+        in_flight = set()
+        for item in items:
+            while len(in_flight) >= min(controller.current_limit(), ceiling):
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    yield future.result()
+            in_flight.add(executor.submit(call, item))
+        for future in as_completed(in_flight):
+            yield future.result()
+    logging.info(
+        f"Concurrency of {controller.name} settled at {min(controller.current_limit(), ceiling)} "
+        f"(connection pool of {s3_client.meta.config.max_pool_connections})"
+    )
+
+
+def take_concurrency_summaries():
+    """
+    Returns the summaries of the controllers used since the last call, attached to the test using them
+    :return: dict: summary by endpoint
+    """
+    with _controllers_lock:
+        touched = [_controllers[name] for name in sorted(_touched)]
+        _touched.clear()
+    return {controller.name: controller.summary() for controller in touched}
@@ -0,0 +1,181 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+from s3_specs.docs.s3_helpers import create_bucket_and_wait, wait_until
+from s3_specs.docs.tools.permission import generate_policy
+from s3_specs.docs.tools.presigned import pooled_session
+from s3_specs.docs.tools.report_stats import percentile
+
+MATRIX_WORKERS = 16
+# Methods sent as actual (non preflight) requests, the ones that don't change the bucket
+ACTUAL_METHODS = ("GET", "HEAD")
+
+### Functions
+
+
+def preflight_headers(case):
+    """
+    Headers of the OPTIONS request of a preflight case
+    :param case: dict: origin, method, headers and optionally required_headers
+    """
+    headers = {
+        "Origin": case["origin"],
+        "Access-Control-Request-Method": case["method"],
+    }
+    if case["headers"] or case.get("required_headers"):
+        headers["Access-Control-Request-Headers"] = ",".join(case["headers"])
+    return headers
+
+
+def rule_allows(cors_config, origin, method):
+    """
+    Whether a CORS rule matches an actual request, where the request headers are not checked
+    """
+    origins = cors_config["AllowedOrigins"]
+    return bool(origin) and ("*" in origins or origin in origins) and method in cors_config["AllowedMethods"]
+
+
+class CorsMatrix:
+    """
+    Runs a matrix of CORS requests against one bucket per configuration. The buckets are created and
+    configured in parallel, the propagation of their configurations is awaited once for all of them
+    and then every preflight and actual request of the matrix is sent concurrently over a pooled session.
+    Latencies are kept by kind, origin and method.
+    """
+
+    def __init__(self, s3_client, configs, workers=MATRIX_WORKERS):
+        """
+        :param s3_client: boto3 s3 client owning the buckets
+        :param configs: dict: CORS rule by configuration name
+        :param workers: int: requests in flight
+        """
+        self.client = s3_client
+        self.configs = configs
+        self.workers = workers
+        self.endpoint_url = s3_client.meta.endpoint_url.rstrip("/")
+        self.buckets = {}
+        self.session = pooled_session(workers)
+        self.latencies = {}
+        self.lock = threading.Lock()
+
+    def setup(self):
+        """
+        Creates and configures the buckets, returning once every CORS configuration can be read back
+        :return: dict: bucket name by configuration name
+        """
+
+        def create(config_name):
+            bucket_name = f"cors-test-{config_name}-{uuid.uuid4().hex[:8]}"
+            create_bucket_and_wait(self.client, bucket_name)
+            with self.lock:
+                # Known to the teardown even if the setup of another bucket fails
+                self.buckets[config_name] = bucket_name
+            policy = generate_policy(
+                effect="Allow",
+                principals="*",
+                actions="s3:*",
+                resources=[bucket_name, f"{bucket_name}/*"],
+            )
+            self.client.put_bucket_policy(Bucket=bucket_name, Policy=policy)
+            self.client.put_bucket_cors(
+                Bucket=bucket_name, CORSConfiguration={"CORSRules": [self.configs[config_name]]}
+            )
+
+        with ThreadPoolExecutor(max_workers=len(self.configs) or 1) as executor:
+            list(executor.map(create, self.configs))
+
+        pending = dict(self.buckets)
+
+        def propagated():
+            for config_name, bucket_name in list(pending.items()):
+                try:
+                    rules = self.client.get_bucket_cors(Bucket=bucket_name)["CORSRules"]
+                except ClientError:
+                    continue
+                if sorted(rules[0]["AllowedMethods"]) == sorted(self.configs[config_name]["AllowedMethods"]):
+                    del pending[config_name]
+            return not pending
+
+        elapsed = wait_until("bucket_cors", propagated)
+        logging.info(f"CORS configurations of {list(self.buckets.values())} propagated after {elapsed:.3f}s")
+        return self.buckets
+
+    def bucket_url(self, config_name):
+        return f"{self.endpoint_url}/{self.buckets[config_name]}"
+
+    def send(self, kind, case, method, headers):
+        """
+        Sends one request of the matrix and records its latency under the origin and method of the case
+        :param kind: str: preflight or actual
+        :param method: str: http method sent, OPTIONS for the preflights
+        :return: requests.Response
+        """
+        started = time.perf_counter()
+        response = self.session.request(method, self.bucket_url(case["config"]), headers=headers)
+        latency = time.perf_counter() - started
+        with self.lock:
+            self.latencies.setdefault((kind, case["origin"], case["method"]), []).append(latency)
+        return response
+
+    def preflight(self, case):
+        return self.send("preflight", case, "OPTIONS", preflight_headers(case))
+
+    def actual(self, case):
+        headers = {"Origin": case["origin"]} if case["origin"] else {}
+        return self.send("actual", case, case["method"], headers)
+
+    def run(self, cases):
+        """
+        Sends the preflight of every case and, for the methods in ACTUAL_METHODS, the actual request too
+        :param cases: list dict: cases as in PREFLIGHT_TEST_CASES
+        :return: dict: by case name, the preflight response and the actual response (None if not sent)
+        """
+        requests_to_send = [(case, "preflight") for case in cases]
+        requests_to_send += [(case, "actual") for case in cases if case["method"] in ACTUAL_METHODS]
+
+        def call(item):
+            case, kind = item
+            try:
+                return case["name"], kind, getattr(self, kind)(case)
+            except Exception as e:
+                # The case is sent again on its own by whoever checks it
+                logging.warning(f"{kind} of {case['name']} failed: {e}")
+                return case["name"], kind, None
+
+        started = time.perf_counter()
+        results = {case["name"]: {"preflight": None, "actual": None} for case in cases}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for name, kind, response in executor.map(call, requests_to_send):
+                results[name][kind] = response
+        logging.info(f"CORS matrix of {len(requests_to_send)} requests sent in {time.perf_counter() - started:.3f}s")
+        return results
+
+    def latency_summary(self):
+        """
+        :return: dict: count and latency percentiles by "kind method origin"
+        """
+        with self.lock:
+            latencies = {key: sorted(values) for key, values in self.latencies.items()}
+        return {
+            f"{kind} {method} {origin or '<no origin>'}": {
+                "count": len(values),
+                "p50_seconds": round(percentile(values, 50), 4),
+                "p95_seconds": round(percentile(values, 95), 4),
+                "max_seconds": round(values[-1], 4),
+            }
+            for (kind, origin, method), values in sorted(latencies.items())
+        }
+
+    def teardown(self, cleanup):
+        """
+        :param cleanup: callable: receives the client and the name of each bucket to be removed
+        """
+        logging.info(f"CORS matrix latencies: {self.latency_summary()}")
+        self.session.close()
+        for bucket_name in self.buckets.values():
+            cleanup(self.client, bucket_name)
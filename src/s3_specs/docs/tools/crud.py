@@ -1,15 +1,24 @@
 import logging
 import pytest
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from s3_specs.docs.tools.utils import generate_valid_bucket_name, convert_unit
+from s3_specs.docs.tools.listing import iter_keys, iter_objects_parallel
+from s3_specs.docs.tools.concurrency import map_adaptive
+from s3_specs.docs.tools.multipart import JOURNAL_SUFFIX, FilePayload, upload_multipart, upload_single
+from s3_specs.docs.tools.transfer_tuning import load_transfer_config
 from s3_specs.docs.s3_helpers import generate_unique_bucket_name
-from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import BotoCoreError, ClientError
 
+import hashlib
 import os
+import threading
+import time
 from tqdm import tqdm
 from datetime import datetime, timedelta
 
+# Downloaded bodies are read into a buffer reused by each thread and then discarded
+DOWNLOAD_BUFFER_SIZE = 1024 * 1024
+_download_buffers = threading.local()
+
 ### Functions
 
 
@@ -90,22 +99,24 @@ def upload_multiple_objects(
 
 def upload_multipart_file(s3_client, bucket_name, object_key, file_path, config=None) -> int:
     """
-    Uploads a large file in multiple chunks to an S3 bucket.
+    Uploads a large file in multiple chunks to an S3 bucket, or in a single PUT when it is smaller than
+    the multipart threshold of the config. Parts are sent from the memory mapped file with their md5, an interrupted upload of the same
+    file resumes from its journal (saved next to the file) instead of starting over.
     :param s3_client: boto3 S3 client
     :param bucket_name: str: name of the bucket
     :param object_key: str: key of the object
     :param file_path: str: path to the file to be uploaded
-    :param config: TransferConfig: optional configuration for multipart upload
+    :param config: TransferConfig: optional configuration for multipart upload, tuned for the endpoint by default
     :return: int: size in bytes of the uploaded object
     """
-    # Default TransferConfig if none is provided
-    if config is None:
-        config = TransferConfig(multipart_threshold=8 * 1024 * 1024, max_concurrency=10)
-
     # Getting file size
     file_size = os.path.getsize(file_path)
     logging.info(f"File size: {file_size} bytes")
 
+    # Tuned TransferConfig (see tools.transfer_tuning) if none is provided
+    if config is None:
+        config = load_transfer_config(s3_client, file_size)
+
     # Upload Progress Bar with time stamp
     with tqdm(
         total=file_size,
@@ -115,9 +126,21 @@ def upload_multipart_file(s3_client, bucket_name, object_key, file_path, config=
         unit_scale=True,
         unit_divisor=1024,
     ) as pbar:
-        s3_client.upload_file(
-            file_path, bucket_name, object_key, Config=config, Callback=pbar.update
-        )
+        # Same rule as boto3 upload_file, multipart from the threshold on
+        if file_size < config.multipart_threshold:
+            upload_single(s3_client, bucket_name, object_key, FilePayload(file_path), callback=pbar.update)
+        else:
+            result = upload_multipart(
+                s3_client,
+                bucket_name,
+                object_key,
+                FilePayload(file_path),
+                part_size=config.multipart_chunksize,
+                max_workers=config.max_concurrency,
+                journal_path=f"{file_path}{JOURNAL_SUFFIX}",
+                callback=pbar.update,
+            )
+            logging.info(f"Part upload latency: {result['part_seconds']}")
 
     # Checking if the object was uploaded
     object_size = s3_client.head_object(Bucket=bucket_name, Key=object_key).get(
@@ -127,19 +150,78 @@ def upload_multipart_file(s3_client, bucket_name, object_key, file_path, config=
 
     return object_size
 
+def drain_body(body, digest=None):
+    """
+    Reads a get_object body to the end without keeping it, which also returns its connection to the pool
+    :param body: botocore StreamingBody
+    :param digest: hashlib hash updated with the body, None to only count the bytes
+    :return: int: number of bytes read
+    """
+    buffer = getattr(_download_buffers, "buffer", None)
+    if buffer is None:
+        buffer = _download_buffers.buffer = bytearray(DOWNLOAD_BUFFER_SIZE)
+    view = memoryview(buffer)
+    # urllib3 reads straight into the buffer, the public read() allocates a new bytes per chunk
+    readinto = getattr(getattr(body, "_raw_stream", None), "readinto", None)
+
+    total = 0
+    try:
+        while True:
+            if readinto is not None:
+                read = readinto(view)
+            else:
+                chunk = body.read(DOWNLOAD_BUFFER_SIZE)
+                read = len(chunk)
+                view[:read] = chunk
+            if not read:
+                break
+            if digest is not None:
+                digest.update(view[:read])
+            total += read
+    finally:
+        body.close()
+    return total
+
+
+def fetch_object(s3_client, bucket_name, object_key, verify=True):
+    """
+    Downloads an object reading its whole body and checks it against the length and ETag of the response
+    The ETag is only checked for single part objects without kms encryption, where it's the md5 of the body
+    :param s3_client: boto3 s3 client
+    :param bucket_name: str: name of the bucket
+    :param object_key: str: key of the object
+    :param verify: bool: check the length and the ETag
+    :return: tuple: (HTTPStatusCode or None on errors, bytes read, whether the body matched)
+    """
+    response = s3_client.get_object(Bucket=bucket_name, Key=object_key)
+    etag = response.get("ETag", "").strip('"')
+    check_md5 = verify and etag and "-" not in etag and response.get("ServerSideEncryption") != "aws:kms"
+    digest = hashlib.md5(usedforsecurity=False) if check_md5 else None
+
+    size = drain_body(response["Body"], digest)
+    matched = True
+    if verify and size != response.get("ContentLength", size):
+        logging.error(f"Object {object_key} has {size} bytes, expected {response['ContentLength']}")
+        matched = False
+    if digest is not None and digest.hexdigest() != etag:
+        logging.error(f"Object {object_key} md5 {digest.hexdigest()} doesn't match its ETag {etag}")
+        matched = False
+    return response["ResponseMetadata"]["HTTPStatusCode"], size, matched
+
+
 def download_object(s3_client, bucket_name, object_key):
     """
-    Download an object from a s3 Bucket
+    Download an object from a s3 Bucket, reading and verifying its whole body
     :param s3_client: boto3 s3 client
     :param bucket_name: str: name of the bucket
     :param object_key: str: key of the object
-    :return: HTTPStatusCode from boto3 get_object
+    :return: HTTPStatusCode from boto3 get_object, None if the download failed or the body didn't match
     """
 
     try:
-        response = s3_client.get_object(Bucket=bucket_name, Key=object_key)
-        logging.info(f"Object {object_key} downloaded from bucket {bucket_name}")
-        return response["ResponseMetadata"]["HTTPStatusCode"]
+        status_code, size, matched = fetch_object(s3_client, bucket_name, object_key)
+        logging.info(f"Object {object_key} downloaded from bucket {bucket_name} ({size} bytes)")
+        return status_code if matched else None
     except Exception as e:
         logging.error(f"Error downloading object {object_key}: {e}")
 
@@ -152,16 +234,8 @@ def list_all_objects(s3_client, bucket_name):
     :param bucket_name: str: name of the bucket
     :return: list str: names of objects in the bucket
     """
-    objects_names = []
-
-    paginator = s3_client.get_paginator("list_objects_v2")
-    pages = paginator.paginate(Bucket=bucket_name)
-    for page in pages:
-        if "Contents" in page:
-            for obj in page["Contents"]:
-                objects_names.append(obj["Key"])
-
-    return objects_names
+    # Keeps every key, use tools.listing.iter_keys or count_objects on big buckets
+    return list(iter_keys(s3_client, bucket_name, raw=True))
 
 
 def delete_object(s3_client, bucket_name, object_key):
@@ -206,56 +280,75 @@ def delete_bucket(s3_client, bucket_name):
 def upload_objects_multithreaded(s3_client, bucket_name, objects_paths):
     """
     Upload all objects to one bucket in parallel
-    The number of simultaneous uploads are limited by the number of objects in the list
+    The number of simultaneous uploads adapts to what the endpoint sustains, see tools.concurrency
     :param s3_client: boto3 s3 client
     :param bucket_name: str: name of the bucket
     :param objects_paths: list: list of paths of the objects to be uploaded
     :return: int: number of successful uploads
     """
 
-    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
-        # atributes processes to the available workers
-        futures = [
-            executor.submit(
-                upload_object, s3_client, bucket_name, path["key"], path["path"]
-            )
-            for path in objects_paths
-        ]
+    results = map_adaptive(
+        s3_client, lambda path: upload_object(s3_client, bucket_name, path["key"], path["path"]), objects_paths
+    )
 
-        # List all results of the futures
-        successful_uploads = list(
-            filter(lambda f: f.result() == 200, as_completed(futures))
-        )
-        logging.info(f"Successful uploads: {successful_uploads}")
+    # Count the successful results
+    successful_uploads = sum(1 for result in results if result == 200)
+    logging.info(f"Successful uploads: {successful_uploads}")
+
+    return successful_uploads
+
+
+def download_objects_throughput(s3_client, bucket_name, verify=True):
+    """
+    Download all objects from a bucket in parallel, reading every body, and measure the throughput
+    The number of simultaneous downloads adapts to what the endpoint sustains, see tools.concurrency
+    :param s3_client: boto3 s3 client
+    :param bucket_name: str: name of the bucket
+    :param verify: bool: check the length and ETag of each body, see fetch_object
+    :return: dict: downloaded and failed objects, bytes, seconds, MB/s and objects/s
+    """
 
-        return len(successful_uploads)
+    def fetch(entry):
+        try:
+            status_code, size, matched = fetch_object(s3_client, bucket_name, entry.key, verify)
+            # The listed size must match too, a short body with a matching Content-Length is still short
+            return status_code == 200 and matched and (not verify or size == entry.size), size
+        except Exception as e:
+            logging.error(f"Error downloading object {entry.key}: {e}")
+            return False, 0
+
+    started = time.perf_counter()
+    # Downloads start with the first listed page, keys are never all kept in memory
+    entries = iter_objects_parallel(s3_client, bucket_name, raw=True)
+    stats = {"objects": 0, "failed": 0, "bytes": 0}
+    for downloaded, size in map_adaptive(s3_client, fetch, entries):
+        stats["objects" if downloaded else "failed"] += 1
+        stats["bytes"] += size
+
+    seconds = time.perf_counter() - started
+    stats["seconds"] = round(seconds, 3)
+    stats["mb_per_second"] = round(stats["bytes"] / 1024**2 / seconds, 3) if seconds else 0.0
+    stats["objects_per_second"] = round(stats["objects"] / seconds, 3) if seconds else 0.0
+    logging.info(
+        f"Downloaded {stats['objects']} objects ({stats['failed']} failed) from {bucket_name}: "
+        f"{stats['bytes']} bytes in {stats['seconds']}s, {stats['mb_per_second']} MB/s, "
+        f"{stats['objects_per_second']} objects/s"
+    )
+    return stats
 
 
 def download_objects_multithreaded(s3_client, bucket_name):
     """
     Download all objects from a bucket in parallel
-    The number of simultaneous downloads are limited by the number of objects in the list
     :param s3_client: boto3 s3 client
     :param bucket_name: str: name of the bucket
     :return: int: number of successful downloads
     """
 
-    objects_keys = list_all_objects(s3_client, bucket_name)
+    successful_downloads = download_objects_throughput(s3_client, bucket_name)["objects"]
+    logging.info(f"Successful downloads: {successful_downloads}")
 
-    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
-        # atributes processes to the available workers
-        futures = [
-            executor.submit(download_object, s3_client, bucket_name, key)
-            for key in objects_keys
-        ]
-
-        # List all results of the futures
-        successful_downloads = list(
-            filter(lambda f: f.result() == 200, as_completed(futures))
-        )
-        logging.info(f"Successful downloads: {successful_downloads}")
-
-    return len(successful_downloads)
+    return successful_downloads
 
 def delete_objects_multithreaded(s3_client, bucket_name, lock_mode=None, retention_days=1):
     """
@@ -273,37 +366,22 @@ def delete_objects_multithreaded(s3_client, bucket_name, lock_mode=None, retenti
 
         # If bucket is versioned, delete all object versions and delete markers using multithreading
         if bucket_versioning.get('Status') == 'Enabled':
-            paginator = s3_client.get_paginator('list_object_versions')
-            with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
-                futures = []
-                for page in paginator.paginate(Bucket=bucket_name):
-                    # Delete object versions
-                    for version in page.get('Versions', []):
-                        futures.append(
-                            executor.submit(
-                                delete_version, s3_client, bucket_name, version, lock_mode
-                            )
-                        )
-                    # Delete markers
-                    for marker in page.get('DeleteMarkers', []):
-                        futures.append(
-                            executor.submit(
-                                delete_version, s3_client, bucket_name, marker, lock_mode
-                            )
-                        )
-                # Wait for all futures to complete
-                for future in as_completed(futures):
-                    future.result()
+            # Object versions and delete markers, deleted while they are listed
+            versions = (
+                {"Key": entry.key, "VersionId": entry.version_id}
+                for entry in iter_objects_parallel(s3_client, bucket_name, versions=True, raw=True)
+            )
+            for _ in map_adaptive(
+                s3_client, lambda version: delete_version(s3_client, bucket_name, version, lock_mode), versions
+            ):
+                pass
 
         # Delete all objects in the bucket
-        objects_keys = list_all_objects(s3_client, bucket_name)
-        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
-            futures = [
-                executor.submit(delete_object, s3_client, bucket_name, key)
-                for key in objects_keys
-            ]
+        objects_keys = (obj.key for obj in iter_objects_parallel(s3_client, bucket_name, raw=True))
+        for _ in map_adaptive(s3_client, lambda key: delete_object(s3_client, bucket_name, key), objects_keys):
+            pass
     except Exception as e:
-        raise f"An unexpected error occurred while deleting object '{bucket_name}': {e}"
+        raise Exception(f"An unexpected error occurred while deleting object '{bucket_name}': {e}")
 
 def delete_version(s3_client, bucket_name, version, lock_mode):
     """
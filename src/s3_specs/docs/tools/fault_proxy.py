@@ -0,0 +1,408 @@
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+import xml.etree.ElementTree as ET
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import quote
+
+import boto3
+import urllib3
+from botocore.auth import S3SigV4Auth
+from botocore.awsrequest import AWSRequest
+
+from s3_specs.docs.tools.local_s3 import (
+    LocalS3Server,
+    decode_aws_chunked,
+    operation_name,
+    parse_distribution,
+    parse_per_operation,
+    route,
+    sample,
+)
+from s3_specs.docs.tools.report_stats import percentile
+
+DEFAULT_PORT = 8000
+STREAM_CHUNK_SIZE = 64 * 1024
+# Headers of the connection between two hops, never forwarded
+HOP_HEADERS = ("connection", "keep-alive", "proxy-connection", "transfer-encoding", "te", "trailer", "upgrade", "expect")
+# Headers of the client signature, replaced when the proxy signs the request again
+SIGNATURE_HEADERS = ("authorization", "x-amz-date", "x-amz-security-token", "x-amz-content-sha256")
+ERROR_CODES = {500: "InternalError", 503: "SlowDown"}
+
+### Functions
+
+
+def parse_error(value):
+    """
+    :param value: str: "status:probability", e.g. "503:0.05"
+    :return: tuple: (int status, float probability)
+    """
+    status, _, rate = value.partition(":")
+    return int(status), float(rate)
+
+
+def parse_tail(value):
+    """
+    :param value: str: "probability:seconds", e.g. "0.01:2" delays one request in a hundred by 2 seconds
+    :return: tuple: (float probability, float seconds)
+    """
+    rate, _, seconds = value.partition(":")
+    return float(rate), float(seconds)
+
+
+class FaultProxy:
+    """
+    Reverse proxy between the suite and an S3 endpoint that injects faults per operation, to see
+    how retries and timeouts behave under tail latency, throttling and broken connections.
+
+    For every request, in this order:
+    - delays: sampled (mean, stddev) seconds before forwarding, plus tail_delays, a rare long delay
+    - errors: 500/503 answered by the proxy itself, the request never reaches the endpoint
+    - drops: the request is forwarded, and so applied, but the connection is closed without a response
+    - partial_bodies: the response is cut in the middle of its body, Content-Length promising the whole
+
+    Every setting is a dict by operation name (PutObject, GetObject...), "*" for the others.
+
+    SigV4 signs the Host header, so a request signed for the proxy is rejected by another host. When
+    the proxy has credentials it signs every request again for the upstream, otherwise the requests are
+    forwarded with the Host header of the client, which only upstreams that don't route by the Host
+    accept (the local stand-in, path style endpoints...). Presigned urls are always forwarded as they are.
+    """
+
+    def __init__(self, upstream_url, credentials=None, region_name=None, host="localhost", port=DEFAULT_PORT,
+                 delays=None, tail_delays=None, errors=None, drops=None, partial_bodies=None, seed=None,
+                 timings_file=None):
+        """
+        :param upstream_url: str: endpoint the requests are forwarded to
+        :param credentials: botocore Credentials: signs the forwarded requests, see above
+        :param region_name: str: region of the upstream signatures
+        :param port: int: 0 picks a free port
+        :param delays: dict: (mean, stddev) seconds by operation
+        :param tail_delays: dict: (probability, seconds) by operation
+        :param errors: dict: by operation, probability of each injected status, e.g. {"*": {503: 0.05}}
+        :param drops: dict: probability of dropping the connection by operation
+        :param partial_bodies: dict: probability of cutting the response body by operation
+        :param timings_file: str: .ndjson file where each request is recorded as it is served
+        """
+        self.upstream_url = upstream_url.rstrip("/")
+        self.credentials = credentials
+        self.region_name = region_name
+        self.host = host
+        self.port = port
+        self.delays = delays or {}
+        self.tail_delays = tail_delays or {}
+        self.errors = errors or {}
+        self.drops = drops or {}
+        self.partial_bodies = partial_bodies or {}
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.timings = []
+        self.timings_file = timings_file
+        self.timings_stream = None
+        self.pool = urllib3.PoolManager(maxsize=32, retries=False, timeout=urllib3.Timeout(connect=10, read=300))
+        self.server = None
+        self.thread = None
+
+    @property
+    def endpoint_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        """
+        Serves in a background thread
+        :return: str: endpoint url to be set on the profiles
+        """
+        proxy = self
+
+        class Handler(FaultProxyHandler):
+            fault_proxy = proxy
+
+        if self.timings_file:
+            self.timings_stream = open(self.timings_file, "a")
+        self.server = LocalS3Server((self.host, self.port), Handler)
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, name="fault-proxy", daemon=True)
+        self.thread.start()
+        logging.info(f"Fault proxy listening on {self.endpoint_url}, forwarding to {self.upstream_url} "
+                     f"({'signing again' if self.credentials else 'passthrough'})")
+        return self.endpoint_url
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.thread.join()
+            self.server = None
+        if self.timings_stream is not None:
+            self.timings_stream.close()
+            self.timings_stream = None
+        self.pool.clear()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def setting(self, settings, operation, default):
+        return settings.get(operation, settings.get("*", default))
+
+    def plan_faults(self, operation):
+        """
+        Draws the faults of a request
+        :return: dict: delay seconds, injected status (or None), drop and partial_body
+        """
+        with self.lock:
+            delay = sample(self.rng, self.setting(self.delays, operation, (0.0, 0.0)))
+            tail_rate, tail_seconds = self.setting(self.tail_delays, operation, (0.0, 0.0))
+            if self.rng.random() < tail_rate:
+                delay += tail_seconds
+            status = None
+            for error_status, rate in self.setting(self.errors, operation, {}).items():
+                if self.rng.random() < rate:
+                    status = error_status
+                    break
+            drop = self.rng.random() < self.setting(self.drops, operation, 0.0)
+            partial_body = self.rng.random() < self.setting(self.partial_bodies, operation, 0.0)
+        return {"delay": delay, "status": status, "drop": drop, "partial_body": partial_body}
+
+    def upstream_request(self, method, path, bucket_name, headers, body, virtual_host):
+        """
+        Builds the request sent upstream, signed again when the proxy has credentials
+        :return: tuple: (url, dict headers, bytes body)
+        """
+        forwarded = {name: value for name, value in headers.items() if name.lower() not in HOP_HEADERS}
+        presigned = "X-Amz-Signature=" in path
+        if self.credentials is None or presigned:
+            return f"{self.upstream_url}{path}", forwarded, body
+
+        # Virtual host style requests are sent path style, the upstream host has no bucket in it
+        if virtual_host:
+            path = f"/{quote(bucket_name)}{path}"
+        forwarded = {
+            name: value for name, value in forwarded.items()
+            if name.lower() not in SIGNATURE_HEADERS + ("host", "content-length")
+        }
+        if "aws-chunked" in forwarded.get("Content-Encoding", ""):
+            # The chunk signatures chain from the client signature, the payload is sent whole instead
+            body = decode_aws_chunked(body)
+            encodings = [e for e in forwarded.pop("Content-Encoding").split(",") if e.strip() != "aws-chunked"]
+            if encodings:
+                forwarded["Content-Encoding"] = ",".join(encodings)
+            forwarded.pop("X-Amz-Decoded-Content-Length", None)
+        request = AWSRequest(method=method, url=f"{self.upstream_url}{path}", headers=forwarded, data=body)
+        S3SigV4Auth(self.credentials, "s3", self.region_name).add_auth(request)
+        return request.url, dict(request.headers.items()), body
+
+    def record(self, timing):
+        with self.lock:
+            self.timings.append(timing)
+            if self.timings_stream is not None:
+                self.timings_stream.write(json.dumps(timing) + "\n")
+                self.timings_stream.flush()
+
+    def summary(self):
+        """
+        :return: dict: by operation, the requests, the injected faults by kind and the latency percentiles
+            seen by the client, including the injected delays
+        """
+        with self.lock:
+            timings = list(self.timings)
+        by_operation = {}
+        for timing in timings:
+            by_operation.setdefault(timing["operation"], []).append(timing)
+        summary = {}
+        for operation, operation_timings in sorted(by_operation.items()):
+            seconds = sorted(timing["seconds"] for timing in operation_timings)
+            faults = {}
+            for timing in operation_timings:
+                if timing["fault"]:
+                    faults[timing["fault"]] = faults.get(timing["fault"], 0) + 1
+            summary[operation] = {
+                "requests": len(operation_timings),
+                "faults": faults,
+                "p50_seconds": round(percentile(seconds, 50), 4),
+                "p95_seconds": round(percentile(seconds, 95), 4),
+                "p99_seconds": round(percentile(seconds, 99), 4),
+                "max_seconds": round(seconds[-1], 4),
+            }
+        return summary
+
+
+class FaultProxyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    fault_proxy = None
+
+    def log_message(self, format, *args):
+        logging.debug(f"fault-proxy {self.address_string()} {format % args}")
+
+    def send_error_response(self, status):
+        root = ET.Element("Error")
+        ET.SubElement(root, "Code").text = ERROR_CODES.get(status, "InternalError")
+        ET.SubElement(root, "Message").text = "Injected by the fault proxy"
+        body = b'<?xml version="1.0" encoding="UTF-8"?>\n' + ET.tostring(root)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/xml")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def handle_request(self):
+        proxy = self.fault_proxy
+        started = time.perf_counter()
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        bucket_name, key, query = route(self.path, self.headers.get("Host"), proxy.host)
+        virtual_host = (self.headers.get("Host") or "").rsplit(":", 1)[0].endswith(f".{proxy.host}")
+        operation = operation_name(self.command, bucket_name, key, query, self.headers)
+        faults = proxy.plan_faults(operation)
+        timing = {
+            "operation": operation,
+            "method": self.command,
+            "path": self.path,
+            "status": None,
+            "fault": None,
+            "upstream_seconds": None,
+            "seconds": None,
+            "bytes_sent": 0,
+            "started_at": time.time(),
+        }
+
+        try:
+            time.sleep(faults["delay"])
+            if faults["status"]:
+                timing["fault"] = f"status_{faults['status']}"
+                timing["status"] = faults["status"]
+                self.send_error_response(faults["status"])
+                return
+
+            url, headers, upstream_body = proxy.upstream_request(
+                self.command, self.path, bucket_name, dict(self.headers.items()), body, virtual_host
+            )
+            upstream_started = time.perf_counter()
+            response = proxy.pool.urlopen(
+                self.command, url, body=upstream_body or None, headers=headers,
+                preload_content=False, decode_content=False, redirect=False,
+            )
+            try:
+                timing["status"] = response.status
+                if faults["drop"]:
+                    # The upstream applied the request, only its response is lost
+                    timing["fault"] = "drop"
+                    self.close_connection = True
+                    return
+
+                content_length = response.headers.get("Content-Length")
+                chunks = response.stream(STREAM_CHUNK_SIZE) if self.command != "HEAD" else iter(())
+                if content_length is None and self.command != "HEAD":
+                    # Chunked upstream responses are buffered, the client gets a Content-Length
+                    chunks = [response.read()]
+                    content_length = str(len(chunks[0]))
+
+                self.send_response(response.status)
+                for name, value in response.headers.items():
+                    if name.lower() not in HOP_HEADERS + ("content-length",):
+                        self.send_header(name, value)
+                self.send_header("Content-Length", content_length or "0")
+                self.end_headers()
+
+                cut_at = int(content_length or 0) // 2 if faults["partial_body"] else None
+                for chunk in chunks:
+                    if cut_at is not None and timing["bytes_sent"] + len(chunk) >= cut_at:
+                        self.wfile.write(chunk[:cut_at - timing["bytes_sent"]])
+                        timing["bytes_sent"] = cut_at
+                        timing["fault"] = "partial_body"
+                        self.close_connection = True
+                        break
+                    self.wfile.write(chunk)
+                    timing["bytes_sent"] += len(chunk)
+                timing["upstream_seconds"] = round(time.perf_counter() - upstream_started, 6)
+            finally:
+                # What the client didn't get is read anyway, the pooled connection is reused clean
+                response.drain_conn()
+                response.release_conn()
+        except (urllib3.exceptions.HTTPError, OSError) as e:
+            logging.warning(f"fault-proxy {self.command} {self.path} failed upstream: {e}")
+            timing["fault"] = timing["fault"] or "upstream_error"
+            if timing["status"] is None:
+                timing["status"] = 502
+                self.send_error_response(502)
+            self.close_connection = True
+        finally:
+            timing["seconds"] = round(time.perf_counter() - started, 6)
+            proxy.record(timing)
+
+    do_GET = do_PUT = do_POST = do_HEAD = do_DELETE = handle_request
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Proxy reverso que injeta falhas e latência entre a suíte e o endpoint")
+    parser.add_argument("--upstream", required=True, help="Endpoint para onde as requisições são encaminhadas")
+    parser.add_argument("--profile", default=None,
+                        help="AWS profile usado para assinar de novo as requisições, sem ele o Host do cliente é mantido")
+    parser.add_argument("--region", default=None, help="Região das assinaturas, a do profile por padrão")
+    parser.add_argument("--host", default="localhost", help="Endereço de escuta")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Porta de escuta")
+    parser.add_argument("--delay", action="append",
+                        help="Atraso por operação, 'Operacao=media:desvio' em segundos, '*' para todas. Repetível")
+    parser.add_argument("--tail-delay", action="append",
+                        help="Atraso raro por operação, 'Operacao=probabilidade:segundos'. Repetível")
+    parser.add_argument("--error", action="append",
+                        help="Resposta de erro por operação, 'Operacao=status:probabilidade' (500 ou 503). Repetível")
+    parser.add_argument("--drop", action="append",
+                        help="Probabilidade de derrubar a conexão após o upstream responder, 'Operacao=taxa'. Repetível")
+    parser.add_argument("--partial-body", action="append",
+                        help="Probabilidade de cortar o corpo da resposta no meio, 'Operacao=taxa'. Repetível")
+    parser.add_argument("--seed", type=int, default=None, help="Semente das escolhas aleatórias")
+    parser.add_argument("--timings-file", default=None, help="Arquivo .ndjson com o tempo de cada requisição")
+    parser.add_argument("--stats-interval", type=float, default=0, help="Imprime o resumo a cada N segundos")
+    args = parser.parse_args()
+
+    credentials = None
+    region_name = args.region
+    if args.profile:
+        session = boto3.Session(profile_name=args.profile)
+        credentials = session.get_credentials()
+        region_name = region_name or session.region_name
+
+    # Unlike the other settings an operation can have many statuses, e.g. *=500:0.01 and *=503:0.05
+    errors = {}
+    for value in args.error or []:
+        operation, _, setting = value.rpartition("=")
+        status, rate = parse_error(setting)
+        errors.setdefault(operation or "*", {})[status] = rate
+
+    proxy = FaultProxy(
+        args.upstream,
+        credentials=credentials,
+        region_name=region_name,
+        host=args.host,
+        port=args.port,
+        delays=parse_per_operation(args.delay, parse_distribution),
+        tail_delays=parse_per_operation(args.tail_delay, parse_tail),
+        errors=errors,
+        drops=parse_per_operation(args.drop, float),
+        partial_bodies=parse_per_operation(args.partial_body, float),
+        seed=args.seed,
+        timings_file=args.timings_file,
+    )
+    print(f"Proxy em {proxy.start()} encaminhando para {args.upstream}, Ctrl-C para parar")
+    try:
+        while True:
+            time.sleep(args.stats_interval or 3600)
+            if args.stats_interval:
+                print(json.dumps(proxy.summary(), indent=2))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        proxy.stop()
+        print(json.dumps(proxy.summary(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
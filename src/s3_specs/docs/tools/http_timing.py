@@ -0,0 +1,162 @@
+import threading
+import time
+
+# Attempt phases measured through botocore's event system:
+#   response: before-send -> before-parse, request sent and response received
+#             (only the headers for streaming operations such as get_object, so it's the time to first byte)
+#   parse:    before-parse -> after-call, parsing of the response
+#   total:    before-call -> after-call, the whole api call including the retries and their backoff
+TIMING_METRICS = ["total", "response", "parse"]
+COUNTER_METRICS = ["count", "errors", "attempts", "retries", "bytes_sent", "bytes_received"]
+
+### Functions
+
+
+def new_operation_timings():
+    timings = dict.fromkeys(COUNTER_METRICS, 0)
+    timings.update({f"{metric}_seconds": 0.0 for metric in TIMING_METRICS})
+    timings.update({f"{metric}_max_seconds": 0.0 for metric in TIMING_METRICS})
+    timings["status"] = {}
+    return timings
+
+
+def merge_operation_timings(target, source):
+    """
+    Adds the timings of an operation into another, used to aggregate tests into runs
+    :param target: dict: timings to be updated, as built by new_operation_timings
+    :param source: dict: timings to be added
+    :return: dict: the updated target
+    """
+    for metric in COUNTER_METRICS:
+        target[metric] += source.get(metric, 0)
+    for metric in TIMING_METRICS:
+        target[f"{metric}_seconds"] += source.get(f"{metric}_seconds", 0.0)
+        target[f"{metric}_max_seconds"] = max(target[f"{metric}_max_seconds"], source.get(f"{metric}_max_seconds", 0.0))
+    for status, count in source.get("status", {}).items():
+        target["status"][status] = target["status"].get(status, 0) + count
+    return target
+
+
+def content_length(headers):
+    try:
+        return int(headers.get("Content-Length") or headers.get("content-length") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+class HttpTimingCollector:
+    """
+    Collects the timings of every api call made by the instrumented clients, grouped by operation.
+    Calls are synchronous per thread, so the call in flight is kept in a thread local and the
+    events of its attempts (before-send, before-parse) are matched to it without any lookup.
+    The timings are accumulated until taken, which is done at the end of every test.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.operations = {}
+
+    def instrument(self, client):
+        """
+        Registers the timing handlers on a client, safe to be called more than once
+        :param client: boto3.client: client to be instrumented
+        :return: boto3.client: the same client
+        """
+        if getattr(client.meta, "_http_timing_collector", None) is self:
+            return client
+        events = client.meta.events
+        events.register("before-call.s3", self.before_call)
+        events.register("before-send.s3", self.before_send)
+        events.register("before-parse.s3", self.before_parse)
+        events.register("after-call.s3", self.after_call)
+        events.register("after-call-error.s3", self.after_call_error)
+        client.meta._http_timing_collector = self
+        return client
+
+    def before_call(self, model, **kwargs):
+        self.local.call = {
+            "operation": model.name,
+            "started": time.perf_counter(),
+            "attempt_started": None,
+            "parse_started": None,
+            "timings": new_operation_timings(),
+        }
+
+    def before_send(self, request, **kwargs):
+        # Must return None, any other value would be used by botocore as the http response
+        call = getattr(self.local, "call", None)
+        if call is None:
+            return None
+        call["attempt_started"] = time.perf_counter()
+        call["timings"]["attempts"] += 1
+        call["timings"]["bytes_sent"] += content_length(request.headers)
+        return None
+
+    def before_parse(self, response_dict, **kwargs):
+        call = getattr(self.local, "call", None)
+        if call is None or call["attempt_started"] is None:
+            return
+        now = time.perf_counter()
+        elapsed = now - call["attempt_started"]
+        timings = call["timings"]
+        timings["response_seconds"] += elapsed
+        timings["response_max_seconds"] = max(timings["response_max_seconds"], elapsed)
+        timings["bytes_received"] += content_length(response_dict.get("headers", {}))
+        status = str(response_dict.get("status_code"))
+        timings["status"][status] = timings["status"].get(status, 0) + 1
+        call["parse_started"] = now
+
+    def after_call(self, http_response, parsed, **kwargs):
+        call = getattr(self.local, "call", None)
+        if call is None:
+            return
+        # Error responses (4xx/5xx) are parsed and emitted here too, the client raises right after
+        if getattr(http_response, "status_code", 0) >= 300:
+            call["timings"]["errors"] += 1
+        retries = parsed.get("ResponseMetadata", {}).get("RetryAttempts") if isinstance(parsed, dict) else None
+        self.finish(call, retries=retries)
+
+    def after_call_error(self, exception, **kwargs):
+        call = getattr(self.local, "call", None)
+        if call is None:
+            return
+        call["timings"]["errors"] += 1
+        self.finish(call)
+
+    def finish(self, call, retries=None):
+        self.local.call = None
+        now = time.perf_counter()
+        timings = call["timings"]
+        timings["count"] = 1
+        timings["retries"] = retries if retries is not None else max(timings["attempts"] - 1, 0)
+        timings["total_seconds"] = timings["total_max_seconds"] = now - call["started"]
+        if call["parse_started"] is not None:
+            timings["parse_seconds"] = timings["parse_max_seconds"] = now - call["parse_started"]
+
+        with self.lock:
+            operation = self.operations.setdefault(call["operation"], new_operation_timings())
+            merge_operation_timings(operation, timings)
+
+    def take(self):
+        """
+        Returns and resets the timings collected since the last call
+        :return: dict: timings by operation name
+        """
+        with self.lock:
+            operations, self.operations = self.operations, {}
+        return operations
+
+
+# Each pytest process (controller or xdist worker) runs a single test at a time, so one collector
+# shared by every client attributes the calls, including the ones made from thread pools, to the running test
+http_timings = HttpTimingCollector()
+
+
+def instrument_client(client):
+    """
+    Records the per operation http timings of a client, which are attached to the test using it
+    :param client: boto3.client: s3 client
+    :return: boto3.client: the same client
+    """
+    return http_timings.instrument(client)
@@ -0,0 +1,279 @@
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from s3_specs.docs.tools.raw_listing import ListEntry, entry_from_dict, raw_lister
+
+# Characters used to split a flat keyspace in key ranges, in the binary order s3 lists keys
+SPLIT_CHARACTERS = "-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+PAGE_SIZE = 1000
+# Pages listed by the shards and not yet consumed, per worker, bounding the memory of a parallel listing
+PAGES_BUFFERED_PER_WORKER = 2
+
+### Functions
+
+
+def entry_key(entry):
+    return entry.key if isinstance(entry, ListEntry) else entry["Key"]
+
+
+def entry_size(entry):
+    return entry.size if isinstance(entry, ListEntry) else entry.get("Size", 0)
+
+
+def list_page(s3_client, bucket_name, prefix, marker, token, versions, page_size=PAGE_SIZE, raw=False):
+    """
+    Lists one page of objects (list_objects_v2) or of versions and delete markers (list_object_versions)
+    :param marker: str: key to list after, None to start at the prefix
+    :param token: str or tuple: continuation of the previous page, returned by this function
+    :param raw: bool: entries as ListEntry tuples, parsed from the raw responses when the client allows it
+    :return: tuple: (entries of the page, continuation token or None when it's the last page)
+    """
+    if raw:
+        lister = raw_lister(s3_client)
+        if lister is not None:
+            return lister.list_page(bucket_name, prefix, marker, token, versions, page_size)
+        entries, next_token = list_page(s3_client, bucket_name, prefix, marker, token, versions, page_size)
+        return [entry_from_dict(entry) for entry in entries], next_token
+
+    if versions:
+        params = {"Bucket": bucket_name, "Prefix": prefix, "MaxKeys": page_size}
+        if token:
+            params["KeyMarker"], version_id_marker = token
+            if version_id_marker is not None:
+                params["VersionIdMarker"] = version_id_marker
+        elif marker:
+            params["KeyMarker"] = marker
+        page = s3_client.list_object_versions(**params)
+        entries = page.get("Versions", []) + [
+            {**marker_entry, "IsDeleteMarker": True} for marker_entry in page.get("DeleteMarkers", [])
+        ]
+        # Versions and delete markers come in two lists, both in key order
+        entries.sort(key=lambda entry: entry["Key"])
+        next_token = (page.get("NextKeyMarker"), page.get("NextVersionIdMarker")) if page.get("IsTruncated") else None
+        return entries, next_token
+
+    params = {"Bucket": bucket_name, "Prefix": prefix, "MaxKeys": page_size}
+    if token:
+        params["ContinuationToken"] = token
+    elif marker:
+        params["StartAfter"] = marker
+    page = s3_client.list_objects_v2(**params)
+    next_token = page.get("NextContinuationToken") if page.get("IsTruncated") else None
+    return page.get("Contents", []), next_token
+
+
+def iter_pages(
+    s3_client, bucket_name, prefix="", start_after=None, end_key=None, versions=False, page_size=PAGE_SIZE, raw=False
+):
+    """
+    Yields the pages of the keys after start_after and up to end_key (both optional)
+    :return: generator of list of dict (or ListEntry when raw): entries as returned by boto3
+    """
+    token = None
+    while True:
+        entries, token = list_page(s3_client, bucket_name, prefix, start_after, token, versions, page_size, raw)
+        if end_key is not None and entries and entry_key(entries[-1]) > end_key:
+            entries = [entry for entry in entries if entry_key(entry) <= end_key]
+            token = None
+        if entries:
+            yield entries
+        if not token:
+            return
+
+
+def iter_objects(s3_client, bucket_name, prefix="", start_after=None, end_key=None, versions=False, raw=False):
+    """
+    Yields the objects of a bucket one at a time, only one page is kept in memory
+    :param s3_client: boto3 s3 client
+    :param bucket_name: str: name of the bucket
+    :param prefix: str: only keys starting with it
+    :param start_after: str: only keys after it
+    :param end_key: str: only keys up to it (inclusive)
+    :param versions: bool: list versions and delete markers instead of the current objects
+    :param raw: bool: yield ListEntry tuples parsed from the raw responses, much cheaper on big buckets
+    :return: generator of dict (or ListEntry when raw): objects as returned by boto3
+    """
+    for page in iter_pages(s3_client, bucket_name, prefix, start_after, end_key, versions, raw=raw):
+        yield from page
+
+
+def iter_keys(s3_client, bucket_name, prefix="", raw=False):
+    """
+    Yields the keys of a bucket one at a time
+    """
+    for obj in iter_objects(s3_client, bucket_name, prefix, raw=raw):
+        yield entry_key(obj)
+
+
+def common_prefix(first, second):
+    length = 0
+    for a, b in zip(first, second):
+        if a != b:
+            break
+        length += 1
+    return first[:length]
+
+
+def plan_key_ranges(base, shards):
+    """
+    Splits the keys after base in ranges by the character following base.
+    The ranges cover every possible key, they only differ in how well they balance the listing.
+    :param base: str: part shared by the keys, e.g. "multiple-object-" for multiple-object-1..N
+    :param shards: int: maximum number of ranges
+    :return: list tuple: (start_after, end_key) of each range, None meaning unbounded
+    """
+    step = max(len(SPLIT_CHARACTERS) // max(shards - 1, 1), 1)
+    boundaries = [base + character for character in SPLIT_CHARACTERS[::step]][: max(shards - 1, 0)]
+    edges = [None] + boundaries + [None]
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def list_delimited(s3_client, bucket_name, prefix, delimiter, versions, raw=False):
+    """
+    Lists one level of a delimited keyspace
+    :return: tuple: (list of common prefixes, list of the entries directly under prefix)
+    """
+    prefixes, entries = [], []
+    method = "list_object_versions" if versions else "list_objects_v2"
+    paginator = s3_client.get_paginator(method)
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix, Delimiter=delimiter):
+        prefixes.extend(common["Prefix"] for common in page.get("CommonPrefixes", []))
+        if versions:
+            entries.extend(page.get("Versions", []))
+            entries.extend({**marker, "IsDeleteMarker": True} for marker in page.get("DeleteMarkers", []))
+        else:
+            entries.extend(page.get("Contents", []))
+    if raw:
+        entries = [entry_from_dict(entry) for entry in entries]
+    return prefixes, entries
+
+
+def iter_objects_parallel(
+    s3_client, bucket_name, prefix="", delimiter=None, versions=False, max_workers=None, raw=False
+):
+    """
+    Yields the objects of a bucket while shards of the keyspace are listed in parallel.
+    With a delimiter each common prefix is a shard, otherwise the keys are split in start-after ranges
+    guessed from the first page. Objects are yielded in no particular order and only a few pages per
+    worker are kept in memory, so buckets with millions of keys can be walked in bounded memory.
+
+    :param s3_client: boto3 s3 client
+    :param bucket_name: str: name of the bucket
+    :param prefix: str: only keys starting with it
+    :param delimiter: str: shard by the common prefixes of this delimiter, e.g. "/"
+    :param versions: bool: list versions and delete markers instead of the current objects
+    :param max_workers: int: listing threads, the number of cpus by default
+    :param raw: bool: yield ListEntry tuples parsed from the raw responses, see iter_objects
+    :return: generator of dict (or ListEntry when raw): objects as returned by boto3
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+
+    if delimiter:
+        prefixes, entries = list_delimited(s3_client, bucket_name, prefix, delimiter, versions, raw)
+        yield from entries
+        shards = [(shard_prefix, None, None) for shard_prefix in prefixes]
+    else:
+        # The first page tells whether sharding is worth it and which part the keys share
+        first_page, token = list_page(s3_client, bucket_name, prefix, None, None, versions, raw=raw)
+        if not token:
+            yield from first_page
+            return
+        last_key = entry_key(first_page[-1])
+        if versions:
+            # The versions of the last key may go on in the next page, the shards list them again
+            first_page = [entry for entry in first_page if entry_key(entry) < last_key]
+            if not first_page:
+                yield from iter_objects(s3_client, bucket_name, prefix, versions=True, raw=raw)
+                return
+            last_key = entry_key(first_page[-1])
+        yield from first_page
+
+        base = common_prefix(entry_key(first_page[0]), last_key)
+        shards = [
+            (prefix, max(start_after or last_key, last_key), end_key)
+            for start_after, end_key in plan_key_ranges(base, max_workers * 4)
+            if end_key is None or end_key > last_key
+        ]
+
+    if not shards:
+        return
+
+    pages = queue.Queue(maxsize=max_workers * PAGES_BUFFERED_PER_WORKER)
+    stop = threading.Event()
+    done = object()
+
+    def offer(item):
+        # Blocks while the consumer is behind, gives up once it's gone
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def list_shard(shard_prefix, start_after, end_key):
+        try:
+            for page in iter_pages(s3_client, bucket_name, shard_prefix, start_after, end_key, versions, raw=raw):
+                if not offer(page):
+                    return
+        except Exception as e:
+            logging.error(f"Error listing shard {shard_prefix!r} ({start_after!r}, {end_key!r}] of {bucket_name}: {e}")
+            offer(e)
+        finally:
+            offer(done)
+
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(shards)))
+    try:
+        for shard in shards:
+            executor.submit(list_shard, *shard)
+
+        pending = len(shards)
+        while pending:
+            page = pages.get()
+            if page is done:
+                pending -= 1
+            elif isinstance(page, Exception):
+                raise page
+            else:
+                yield from page
+    finally:
+        # Also reached when the consumer stops early, the shards still listing are told to give up
+        stop.set()
+        executor.shutdown(wait=False)
+
+
+def count_objects(s3_client, bucket_name, prefix="", versions=False, parallel=False, raw=False, **kwargs):
+    """
+    Counts the objects of a bucket without keeping their keys
+    :param parallel: bool: list shards of the keyspace in parallel, see iter_objects_parallel
+    :param raw: bool: parse the raw responses, see iter_objects
+    :return: tuple: (number of objects, total size in bytes)
+    """
+    objects = (
+        iter_objects_parallel(s3_client, bucket_name, prefix, versions=versions, raw=raw, **kwargs)
+        if parallel
+        else iter_objects(s3_client, bucket_name, prefix, versions=versions, raw=raw)
+    )
+    count = size = 0
+    for obj in objects:
+        count += 1
+        size += entry_size(obj)
+    return count, size
+
+
+def iter_batches(items, batch_size=PAGE_SIZE):
+    """
+    Groups an iterable in lists of up to batch_size, e.g. for delete_objects which takes 1000 keys
+    """
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
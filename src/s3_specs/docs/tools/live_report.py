@@ -0,0 +1,245 @@
+import html
+import json
+import logging
+import os
+import time
+from datetime import datetime
+
+import pytest
+
+from s3_specs.docs.tools.report_stats import (
+    PHASES,
+    ReportStatsAccumulator,
+    failure_signature,
+    save_stats,
+    sidecar_name,
+    sidecar_path,
+)
+
+# Minimum interval between rewrites of the live stats sidecar and html page
+LIVE_FLUSH_INTERVAL = 10
+LIVE_PAGE_REFRESH = 15
+LIVE_PAGE_LAST_FAILURES = 20
+
+### Functions
+
+
+def live_html_path(stream_file):
+    """
+    Path of the auto refreshing html page of a live stream
+    :param stream_file: str: path of the stream, e.g. reports_html/full_br-se1_live.ndjson
+    :return: str: path of the page, e.g. reports_html/full_br-se1_live.html
+    """
+    base, _ = os.path.splitext(str(stream_file))
+    return f"{base}.html"
+
+
+def iter_live_tests(stream_file):
+    """
+    Yields the tests of a live stream, each one shaped as a pytest-json-report test.
+    A line cut in half by a crash is ignored, every test finished before it is still yielded.
+    :param stream_file: str: path of the stream
+    """
+    with open(stream_file, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def stage_from_report(report):
+    """
+    Converts a pytest TestReport into a stage shaped as the ones of pytest-json-report
+    :param report: TestReport: report of the setup, call or teardown phase
+    :return: dict: stage with outcome, duration and the failure details
+    """
+    stage = {"outcome": report.outcome, "duration": round(report.duration, 6)}
+    crash = getattr(report.longrepr, "reprcrash", None)
+    if crash is not None:
+        stage["crash"] = {"path": crash.path, "lineno": crash.lineno, "message": crash.message}
+    if report.longrepr:
+        stage["longrepr"] = report.longreprtext
+    if hasattr(report, "wasxfail"):
+        stage["wasxfail"] = True
+    return stage
+
+
+def final_outcome(stages):
+    """
+    Final outcome of a test from its phases, following pytest-json-report rules
+    :param stages: dict: stages by phase name
+    :return: str: passed, failed, skipped, error, xfailed, xpassed or rerun
+    """
+    for phase in PHASES:
+        stage = stages.get(phase)
+        if stage is None:
+            continue
+        if stage["outcome"] == "failed":
+            return "failed" if phase == "call" else "error"
+        if stage["outcome"] == "skipped":
+            return "xfailed" if stage.get("wasxfail") else "skipped"
+        if stage["outcome"] == "rerun":
+            return "rerun"
+        if phase == "call" and stage.get("wasxfail"):
+            return "xpassed"
+    return "passed"
+
+
+class LiveReport:
+    """
+    Pytest plugin that appends every finished test to a line-delimited json stream as soon
+    as it finishes, and keeps a stats sidecar and an auto refreshing html page up to date.
+    Runs on the xdist controller, which receives the reports of all the workers.
+    """
+
+    def __init__(self, stream_file):
+        self.stream_file = str(stream_file)
+        self.stats_file = sidecar_path(self.stream_file)
+        self.html_file = live_html_path(self.stream_file)
+        self.name = sidecar_name(self.stats_file)
+
+        self.accumulator = ReportStatsAccumulator()
+        self.pending = {}
+        self.last_failures = []
+        self.started = time.time()
+        self.last_flush = 0.0
+        self.stream = None
+
+    def pytest_sessionstart(self, session):
+        os.makedirs(os.path.dirname(self.stream_file) or ".", exist_ok=True)
+        # A new run starts a new stream, line buffered so tailing it shows each test right away
+        self.stream = open(self.stream_file, "w", encoding="utf-8", buffering=1)
+        self.started = time.time()
+        self.flush(running=True)
+
+    def pytest_runtest_logreport(self, report):
+        stages = self.pending.setdefault(report.nodeid, {})
+        stages[report.when] = stage_from_report(report)
+        if report.when != "teardown":
+            return
+
+        self.pending.pop(report.nodeid)
+        test = {
+            "nodeid": report.nodeid,
+            "outcome": final_outcome(stages),
+            "duration": round(sum(stage["duration"] for stage in stages.values()), 6),
+            "finished": time.time(),
+            "worker": getattr(report, "worker_id", None) or getattr(getattr(report, "node", None), "workerinput", {}).get("workerid"),
+            **stages,
+        }
+        # Metadata added by the tests (e.g. http_timings) is relayed by pytest-json-report on the report
+        metadata = getattr(report, "_json_report_extra", {}).get("metadata")
+        if metadata:
+            test["metadata"] = metadata
+        self.record(test)
+
+    def record(self, test):
+        """
+        Appends a finished test to the stream and accounts it in the live stats
+        :param test: dict: test shaped as a pytest-json-report test
+        """
+        if self.stream is not None:
+            self.stream.write(json.dumps(test, ensure_ascii=False) + "\n")
+
+        self.accumulator.add(test)
+        if test["outcome"] in ("failed", "error"):
+            self.last_failures = (self.last_failures + [test])[-LIVE_PAGE_LAST_FAILURES:]
+
+        if time.time() - self.last_flush >= LIVE_FLUSH_INTERVAL:
+            self.flush(running=True)
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_sessionfinish(self, session, exitstatus):
+        # Runs before the json report sidecar is written, which replaces this one when available
+        self.flush(running=False, exitcode=int(exitstatus))
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+    def live_stats(self, running, exitcode=None):
+        """
+        :return: dict: stats in the sidecar format plus the live progress of the run
+        """
+        elapsed = time.time() - self.started
+        stats = self.accumulator.stats(
+            name=self.name,
+            created=self.started,
+            exitcode=exitcode,
+            duration=round(elapsed, 3),
+        )
+        finished = stats["counts"]["total"]
+        failures = stats["counts"]["failed"] + stats["counts"]["error"]
+        stats["live"] = {
+            "running": running,
+            "updated": time.time(),
+            "stream": os.path.basename(self.stream_file),
+            "tests_per_minute": round(finished / elapsed * 60, 2) if elapsed > 0 else 0.0,
+            "failure_rate": round(failures / finished, 4) if finished else 0.0,
+        }
+        return stats
+
+    def flush(self, running, exitcode=None):
+        """
+        Rewrites the stats sidecar and the html page, a failure here must never break the run
+        """
+        self.last_flush = time.time()
+        try:
+            stats = self.live_stats(running, exitcode)
+            save_stats(stats, self.stats_file)
+            self.write_html(stats)
+        except OSError as e:
+            logging.warning(f"Could not update the live report {self.stats_file}: {e}")
+
+    def write_html(self, stats):
+        counts = stats["counts"]
+        live = stats["live"]
+        refresh = f'<meta http-equiv="refresh" content="{LIVE_PAGE_REFRESH}">' if live["running"] else ""
+        status = "Em execução" if live["running"] else "Finalizado"
+
+        failures = "".join(
+            f"<tr><td>{html.escape(test['nodeid'])}</td><td>{test['outcome']}</td>"
+            f"<td>{html.escape(failure_signature(test) or '')}</td></tr>"
+            for test in reversed(self.last_failures)
+        )
+        content = f"""<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+    <meta charset="UTF-8">
+    {refresh}
+    <title>{html.escape(self.name)} - {status}</title>
+    <style>
+        body {{ font-family: Arial, sans-serif; margin: 20px; color: #333; background-color: #f5f5f5; }}
+        table {{ border-collapse: collapse; width: 100%; background-color: #fff; }}
+        td, th {{ border: 1px solid #ddd; padding: 6px; text-align: left; font-size: 0.9em; }}
+        .passed {{ color: #27ae60; }} .failed {{ color: #e74c3c; }} .skipped {{ color: #3498db; }} .error {{ color: #c0392b; }}
+    </style>
+</head>
+<body>
+    <h1>{html.escape(self.name)} - {status}</h1>
+    <p>
+        <span class="passed">{counts["passed"]} passaram</span> |
+        <span class="failed">{counts["failed"]} falharam</span> |
+        <span class="skipped">{counts["skipped"]} pulados</span> |
+        <span class="error">{counts["error"]} erros</span> |
+        {counts["total"]} finalizados
+    </p>
+    <p>
+        Tempo decorrido: {stats["duration"]:.0f}s |
+        Vazão: {live["tests_per_minute"]} testes/min |
+        Taxa de falha: {live["failure_rate"] * 100:.1f}% |
+        Duração p95: {stats["test_durations"]["p95"]}s
+    </p>
+    <h2>Últimas falhas</h2>
+    <table>
+        <tr><th>Teste</th><th>Resultado</th><th>Mensagem</th></tr>
+        {failures}
+    </table>
+    <p>Atualizado em: {datetime.fromtimestamp(live["updated"]).strftime("%d/%m/%Y %H:%M:%S")}</p>
+</body>
+</html>
+"""
+        tmp_file = f"{self.html_file}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_file, self.html_file)
@@ -0,0 +1,795 @@
+import argparse
+import base64
+import hashlib
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+S3_NAMESPACE = "http://s3.amazonaws.com/doc/2006-03-01/"
+XSI_NAMESPACE = "http://www.w3.org/2001/XMLSchema-instance"
+DEFAULT_PORT = 9000
+DEFAULT_REPLICAS = 3
+# Operations that only read, served by a random replica. Writes go to the primary and reach the replicas later
+READ_OPERATIONS = ("ListBuckets", "HeadBucket", "GetBucketVersioning", "GetBucketLocation", "GetBucketAcl",
+                   "GetObject", "HeadObject", "ListObjects", "ListObjectsV2", "ListObjectVersions")
+MAX_KEYS = 1000
+# S3 bucket naming rules: 3 to 63 lowercase letters, digits, dots and hyphens, starting and ending alphanumeric
+BUCKET_NAME = re.compile(r"^[a-z0-9][a-z0-9.-]{1,61}[a-z0-9]$")
+
+### Functions
+
+
+def parse_distribution(value):
+    """
+    Parses a distribution given on the command line
+    :param value: str: "mean" or "mean:stddev", in seconds
+    :return: tuple: (mean, stddev)
+    """
+    mean, _, stddev = value.partition(":")
+    return float(mean), float(stddev or 0)
+
+
+def parse_per_operation(values, parse):
+    """
+    Parses repeated "Operation=value" arguments, "*" being the default of every operation
+    :param values: list str: e.g. ["*=0.01", "GetObject=0.05:0.02"]
+    :return: dict: parsed value by operation name
+    """
+    parsed = {}
+    for value in values or []:
+        operation, _, setting = value.rpartition("=")
+        parsed[operation or "*"] = parse(setting)
+    return parsed
+
+
+def decode_aws_chunked(raw):
+    """
+    Decodes a body sent with Content-Encoding aws-chunked, the chunk signatures are not verified
+    :param raw: bytes: body as received, with the chunk framing
+    :return: bytes: payload without the chunk framing and trailers
+    """
+    payload = bytearray()
+    position = 0
+    while position < len(raw):
+        line_end = raw.index(b"\r\n", position)
+        size = int(raw[position:line_end].split(b";")[0], 16)
+        if size == 0:
+            break
+        payload += raw[line_end + 2:line_end + 2 + size]
+        position = line_end + 2 + size + 2
+    return bytes(payload)
+
+
+def sample(rng, distribution):
+    mean, stddev = distribution
+    return max(0.0, rng.gauss(mean, stddev) if stddev else mean)
+
+
+class S3Error(Exception):
+    def __init__(self, status, code, message, headers=None, stale=False):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.message = message
+        self.headers = headers or {}
+        # The primary would have answered otherwise, e.g. NoSuchKey from a replica the write didn't reach
+        self.stale = stale
+
+
+class LocalS3:
+    """
+    Local S3 compatible stand-in with tunable eventual consistency, to develop and benchmark the
+    consistency tools, waiters and load generators without a real endpoint.
+
+    Every write is committed on the primary and reaches each of the replicas after its own lag,
+    sampled from replica_lag. Reads are served by a random replica, so they see what reached that
+    replica; listings additionally see the replica as it was listing_staleness seconds ago. Each
+    operation can have a latency distribution and an error rate (503 SlowDown). The random choices
+    come from one seeded generator, so runs with the same seed and the same sequence of requests
+    are reproducible.
+
+    Covers the bucket and object calls the specs use the most: buckets (create, head, delete, list,
+    versioning, location, acl) and objects (put, get, head, delete, bulk delete, list v1/v2 and versions).
+    Signatures are not checked, each access key is its own owner, and any other call answers 501
+    NotImplemented.
+    """
+
+    def __init__(self, host="localhost", port=DEFAULT_PORT, replicas=DEFAULT_REPLICAS, replica_lag=(0.0, 0.0),
+                 listing_staleness=0.0, latencies=None, error_rates=None, seed=None):
+        """
+        :param port: int: 0 picks a free port
+        :param replicas: int: replicas serving the reads
+        :param replica_lag: tuple: (mean, stddev) seconds for a write to reach a replica
+        :param listing_staleness: float: seconds listings lag behind the replica serving them
+        :param latencies: dict: (mean, stddev) seconds by operation name, "*" for the others
+        :param error_rates: dict: probability of a 503 SlowDown by operation name, "*" for the others
+        :param seed: int: seed of the random choices, None for a random one
+        """
+        self.host = host
+        self.port = port
+        self.replicas = replicas
+        self.replica_lag = replica_lag
+        self.listing_staleness = listing_staleness
+        self.latencies = latencies or {}
+        self.error_rates = error_rates or {}
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        # Bucket name to its history (existence and versioning) and the history of each key
+        self.buckets = {}
+        self.counters = {}
+        self.server = None
+        self.thread = None
+
+    # Server
+
+    @property
+    def endpoint_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        """
+        Serves in a background thread
+        :return: str: endpoint url of the stand-in
+        """
+        stand_in = self
+
+        class Handler(LocalS3Handler):
+            local_s3 = stand_in
+
+        self.server = LocalS3Server((self.host, self.port), Handler)
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, name="local-s3", daemon=True)
+        self.thread.start()
+        logging.info(f"Local S3 listening on {self.endpoint_url}: replicas={self.replicas}, "
+                     f"replica_lag={self.replica_lag}, listing_staleness={self.listing_staleness}")
+        return self.endpoint_url
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.thread.join()
+            self.server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    # Randomness and counters
+
+    def setting(self, settings, operation, default):
+        return settings.get(operation, settings.get("*", default))
+
+    def plan_request(self, operation):
+        """
+        Draws what happens to a request before it is served
+        :return: tuple: (latency seconds, inject a 503, replica serving it)
+        """
+        with self.lock:
+            latency = sample(self.rng, self.setting(self.latencies, operation, (0.0, 0.0)))
+            fail = self.rng.random() < self.setting(self.error_rates, operation, 0.0)
+            replica = self.rng.randrange(self.replicas) if operation in READ_OPERATIONS else None
+        return latency, fail, replica
+
+    def count(self, operation, outcome):
+        with self.lock:
+            counters = self.counters.setdefault(operation, {"requests": 0, "injected_errors": 0, "stale": 0})
+            counters[outcome] += 1
+
+    def stats(self):
+        """
+        :return: dict: by operation, the requests, the injected 503s and the responses that were stale,
+            i.e. differed from what the primary would have answered
+        """
+        with self.lock:
+            return {operation: dict(counters) for operation, counters in sorted(self.counters.items())}
+
+    # Replicated state
+
+    def commit(self, history, entry):
+        """
+        Appends a write to a history, stamping when it becomes visible on each replica
+        """
+        now = time.monotonic()
+        entry["visible_at"] = [now + sample(self.rng, self.replica_lag) for _ in range(self.replicas)]
+        history.append(entry)
+        # A null version overwritten by a null version that reached every replica is never seen again,
+        # the other versions of versioned buckets are kept until deleted
+        overwritten = [index for index, old in enumerate(history)
+                       if old.get("version_id", "null") == "null" and max(old["visible_at"]) <= now]
+        if overwritten:
+            last = overwritten[-1]
+            history[:last] = [old for old in history[:last] if old.get("version_id", "null") != "null"]
+
+    def view(self, history, replica, at):
+        """
+        Entries of a history visible on a replica at a time, the primary (replica None) sees every entry
+        """
+        if replica is None:
+            return list(history)
+        return [entry for entry in history if entry["visible_at"][replica] <= at]
+
+    def bucket_state(self, bucket_name, replica, at):
+        """
+        :return: dict: latest bucket entry on the replica, None if it doesn't know the bucket
+        """
+        bucket = self.buckets.get(bucket_name)
+        if bucket is None:
+            return None
+        entries = self.view(bucket["history"], replica, at)
+        if not entries or entries[-1]["deleted"]:
+            return None
+        return entries[-1]
+
+    def require_bucket(self, bucket_name, replica=None, at=None):
+        state = self.bucket_state(bucket_name, replica, at)
+        if state is None:
+            stale = replica is not None and self.bucket_state(bucket_name, None, None) is not None
+            raise S3Error(404, "NoSuchBucket", "The specified bucket does not exist", stale=stale)
+        return self.buckets[bucket_name], state
+
+    def latest_objects(self, bucket, replica, at, prefix=""):
+        """
+        :return: dict: latest visible version of each live key starting with prefix
+        """
+        objects = {}
+        for key, history in bucket["objects"].items():
+            if not key.startswith(prefix):
+                continue
+            entries = self.view(history, replica, at)
+            if entries and not entries[-1]["deleted"]:
+                objects[key] = entries[-1]
+        return objects
+
+    # Operations, called with the lock held
+
+    def list_buckets(self, owner_id, query, replica, at):
+        prefixed = [name for name in sorted(self.buckets) if name.startswith(query.get("prefix", ""))]
+        names = [name for name in prefixed if self.bucket_state(name, replica, at)]
+        stale = names != [name for name in prefixed if self.bucket_state(name, None, None)]
+        root = ET.Element("ListAllMyBucketsResult", xmlns=S3_NAMESPACE)
+        owner = ET.SubElement(root, "Owner")
+        ET.SubElement(owner, "ID").text = owner_id
+        buckets = ET.SubElement(root, "Buckets")
+        for name in names:
+            bucket = ET.SubElement(buckets, "Bucket")
+            ET.SubElement(bucket, "Name").text = name
+            ET.SubElement(bucket, "CreationDate").text = self.buckets[name]["created"]
+        return 200, {}, root, stale
+
+    def create_bucket(self, bucket_name, owner_id):
+        if not BUCKET_NAME.match(bucket_name) or ".." in bucket_name:
+            raise S3Error(400, "InvalidBucketName", "The specified bucket is not valid.")
+        if self.bucket_state(bucket_name, None, None):
+            raise S3Error(409, "BucketAlreadyOwnedByYou", "Your previous request to create the named bucket succeeded")
+        bucket = self.buckets.setdefault(bucket_name, {"history": [], "objects": {}})
+        bucket["created"] = iso_timestamp(time.time())
+        bucket["owner"] = owner_id
+        bucket["objects"] = {}
+        self.commit(bucket["history"], {"deleted": False, "versioning": None})
+        return 200, {"Location": f"/{bucket_name}"}, None, False
+
+    def head_bucket(self, bucket_name, replica, at):
+        self.require_bucket(bucket_name, replica, at)
+        return 200, {}, None, False
+
+    def delete_bucket(self, bucket_name):
+        bucket, _ = self.require_bucket(bucket_name)
+        for history in bucket["objects"].values():
+            null_versions = [entry for entry in history if entry["version_id"] == "null"]
+            if len(null_versions) < len(history) or (null_versions and not null_versions[-1]["deleted"]):
+                    raise S3Error(409, "BucketNotEmpty", "The bucket you tried to delete is not empty")
+        self.commit(bucket["history"], {"deleted": True, "versioning": None})
+        return 204, {}, None, False
+
+    def put_bucket_versioning(self, bucket_name, body):
+        bucket, _ = self.require_bucket(bucket_name)
+        status = find_text(ET.fromstring(body), "Status")
+        if status not in ("Enabled", "Suspended"):
+            raise S3Error(400, "MalformedXML", "The versioning status must be Enabled or Suspended")
+        self.commit(bucket["history"], {"deleted": False, "versioning": status})
+        return 200, {}, None, False
+
+    def get_bucket_versioning(self, bucket_name, replica, at):
+        _, state = self.require_bucket(bucket_name, replica, at)
+        _, primary = self.require_bucket(bucket_name)
+        root = ET.Element("VersioningConfiguration", xmlns=S3_NAMESPACE)
+        if state["versioning"]:
+            ET.SubElement(root, "Status").text = state["versioning"]
+        return 200, {}, root, state["versioning"] != primary["versioning"]
+
+    def get_bucket_location(self, bucket_name, replica, at):
+        self.require_bucket(bucket_name, replica, at)
+        return 200, {}, ET.Element("LocationConstraint", xmlns=S3_NAMESPACE), False
+
+    def get_bucket_acl(self, bucket_name, replica, at):
+        bucket, _ = self.require_bucket(bucket_name, replica, at)
+        root = ET.Element("AccessControlPolicy", xmlns=S3_NAMESPACE)
+        owner = ET.SubElement(root, "Owner")
+        ET.SubElement(owner, "ID").text = bucket["owner"]
+        grant = ET.SubElement(ET.SubElement(root, "AccessControlList"), "Grant")
+        grantee = ET.SubElement(grant, "Grantee", {"xmlns:xsi": XSI_NAMESPACE, "xsi:type": "CanonicalUser"})
+        ET.SubElement(grantee, "ID").text = bucket["owner"]
+        ET.SubElement(grant, "Permission").text = "FULL_CONTROL"
+        return 200, {}, root, False
+
+    def put_object(self, bucket_name, key, body, headers):
+        bucket, state = self.require_bucket(bucket_name)
+        etag = f'"{hashlib.md5(body, usedforsecurity=False).hexdigest()}"'
+        content_md5 = headers.get("Content-MD5")
+        if content_md5 and base64.b64decode(content_md5) != bytes.fromhex(etag.strip('"')):
+            raise S3Error(400, "BadDigest", "The Content-MD5 you specified did not match what was received")
+        version_id = uuid.uuid4().hex if state["versioning"] == "Enabled" else "null"
+        self.commit(bucket["objects"].setdefault(key, []), {
+            "deleted": False,
+            "body": body,
+            "etag": etag,
+            "version_id": version_id,
+            "last_modified": time.time(),
+            "content_type": headers.get("Content-Type", "binary/octet-stream"),
+        })
+        response_headers = {"ETag": etag}
+        if state["versioning"]:
+            response_headers["x-amz-version-id"] = version_id
+        return 200, response_headers, None, False
+
+    def find_object(self, bucket_name, key, version_id, replica, at):
+        """
+        :return: tuple: (entry served by the replica, whether the primary would serve another one)
+        """
+        bucket, _ = self.require_bucket(bucket_name, replica, at)
+        history = bucket["objects"].get(key, [])
+
+        def pick(entries):
+            if version_id is not None:
+                matches = [entry for entry in entries if entry["version_id"] == version_id]
+                return matches[-1] if matches else None
+            return entries[-1] if entries else None
+
+        entry = pick(self.view(history, replica, at))
+        stale = entry is not pick(history)
+        if entry is None:
+            if version_id is not None:
+                raise S3Error(404, "NoSuchVersion", "The specified version does not exist", stale=stale)
+            raise S3Error(404, "NoSuchKey", "The specified key does not exist", stale=stale)
+        if entry["deleted"]:
+            headers = {"x-amz-delete-marker": "true"}
+            if entry["version_id"] != "null":
+                headers["x-amz-version-id"] = entry["version_id"]
+            if version_id is not None:
+                raise S3Error(405, "MethodNotAllowed", "The specified method is not allowed against this resource",
+                              headers, stale)
+            raise S3Error(404, "NoSuchKey", "The specified key does not exist", headers, stale)
+        return entry, stale
+
+    def get_object(self, bucket_name, key, query, replica, at, head=False):
+        entry, stale = self.find_object(bucket_name, key, query.get("versionId"), replica, at)
+        headers = {
+            "ETag": entry["etag"],
+            "Last-Modified": formatdate(entry["last_modified"], usegmt=True),
+            "Content-Type": entry["content_type"],
+            "Content-Length": str(len(entry["body"])),
+            "Accept-Ranges": "bytes",
+        }
+        if entry["version_id"] != "null":
+            headers["x-amz-version-id"] = entry["version_id"]
+        return 200, headers, None if head else entry["body"], stale
+
+    def delete_object(self, bucket_name, key, version_id):
+        """
+        Without a version a tombstone (a delete marker on versioned buckets) is committed like any write,
+        a specific version is removed from every replica at once
+        :return: dict: headers of the response
+        """
+        bucket, state = self.require_bucket(bucket_name)
+        history = bucket["objects"].setdefault(key, [])
+        headers = {}
+        if version_id is not None:
+            removed = [entry for entry in history if entry["version_id"] == version_id]
+            history[:] = [entry for entry in history if entry["version_id"] != version_id]
+            headers["x-amz-version-id"] = version_id
+            if removed and removed[-1]["deleted"]:
+                headers["x-amz-delete-marker"] = "true"
+            return headers
+        marker_id = uuid.uuid4().hex if state["versioning"] == "Enabled" else "null"
+        self.commit(history, {"deleted": True, "version_id": marker_id, "last_modified": time.time()})
+        if state["versioning"]:
+            headers.update({"x-amz-delete-marker": "true", "x-amz-version-id": marker_id})
+        return headers
+
+    def delete_objects(self, bucket_name, body):
+        self.require_bucket(bucket_name)
+        request = ET.fromstring(body)
+        quiet = (find_text(request, "Quiet") or "false").lower() == "true"
+        root = ET.Element("DeleteResult", xmlns=S3_NAMESPACE)
+        for obj in find_all(request, "Object"):
+            key = find_text(obj, "Key")
+            version_id = find_text(obj, "VersionId")
+            headers = self.delete_object(bucket_name, key, version_id)
+            if quiet:
+                continue
+            deleted = ET.SubElement(root, "Deleted")
+            ET.SubElement(deleted, "Key").text = key
+            if version_id:
+                ET.SubElement(deleted, "VersionId").text = version_id
+            if headers.get("x-amz-delete-marker"):
+                ET.SubElement(deleted, "DeleteMarker").text = "true"
+                if not version_id:
+                    ET.SubElement(deleted, "DeleteMarkerVersionId").text = headers["x-amz-version-id"]
+        return 200, {}, root, False
+
+    def list_objects(self, bucket_name, query, replica, at, version=2):
+        bucket, _ = self.require_bucket(bucket_name, replica, at)
+        prefix = query.get("prefix", "")
+        delimiter = query.get("delimiter", "")
+        max_keys = min(int(query.get("max-keys", MAX_KEYS)), MAX_KEYS)
+        if version == 2:
+            start = query.get("continuation-token") or query.get("start-after", "")
+        else:
+            start = query.get("marker", "")
+        url_encoded = query.get("encoding-type") == "url"
+
+        objects = self.latest_objects(bucket, replica, at - self.listing_staleness, prefix)
+        stale = objects.keys() != self.latest_objects(bucket, None, None, prefix).keys()
+
+        contents, prefixes, truncated, last = [], [], False, None
+        for key in sorted(objects):
+            # A page may end on a common prefix, its keys were all rolled up in it
+            if key <= start or (delimiter and start.endswith(delimiter) and key.startswith(start)):
+                continue
+            common_prefix = None
+            if delimiter and delimiter in key[len(prefix):]:
+                common_prefix = key[:key.index(delimiter, len(prefix)) + len(delimiter)]
+                if prefixes and prefixes[-1] == common_prefix:
+                    continue
+            if len(contents) + len(prefixes) == max_keys:
+                truncated = True
+                break
+            if common_prefix:
+                prefixes.append(common_prefix)
+                last = common_prefix
+            else:
+                contents.append(key)
+                last = key
+
+        root = ET.Element("ListBucketResult", xmlns=S3_NAMESPACE)
+        ET.SubElement(root, "Name").text = bucket_name
+        ET.SubElement(root, "Prefix").text = encode_key(prefix, url_encoded)
+        ET.SubElement(root, "MaxKeys").text = str(max_keys)
+        if delimiter:
+            ET.SubElement(root, "Delimiter").text = encode_key(delimiter, url_encoded)
+        if url_encoded:
+            ET.SubElement(root, "EncodingType").text = "url"
+        ET.SubElement(root, "IsTruncated").text = str(truncated).lower()
+        if version == 2:
+            ET.SubElement(root, "KeyCount").text = str(len(contents) + len(prefixes))
+            if query.get("continuation-token"):
+                ET.SubElement(root, "ContinuationToken").text = query["continuation-token"]
+            if truncated:
+                ET.SubElement(root, "NextContinuationToken").text = last
+        else:
+            ET.SubElement(root, "Marker").text = encode_key(start, url_encoded)
+            if truncated and delimiter:
+                ET.SubElement(root, "NextMarker").text = encode_key(last, url_encoded)
+        for key in contents:
+            entry = objects[key]
+            content = ET.SubElement(root, "Contents")
+            ET.SubElement(content, "Key").text = encode_key(key, url_encoded)
+            ET.SubElement(content, "LastModified").text = iso_timestamp(entry["last_modified"])
+            ET.SubElement(content, "ETag").text = entry["etag"]
+            ET.SubElement(content, "Size").text = str(len(entry["body"]))
+            ET.SubElement(content, "StorageClass").text = "STANDARD"
+        for common_prefix in prefixes:
+            ET.SubElement(ET.SubElement(root, "CommonPrefixes"), "Prefix").text = encode_key(common_prefix, url_encoded)
+        return 200, {}, root, stale
+
+    def list_object_versions(self, bucket_name, query, replica, at):
+        bucket, _ = self.require_bucket(bucket_name, replica, at)
+        prefix = query.get("prefix", "")
+        max_keys = min(int(query.get("max-keys", MAX_KEYS)), MAX_KEYS)
+        key_marker = query.get("key-marker", "")
+        version_id_marker = query.get("version-id-marker", "")
+        listed_at = at - self.listing_staleness
+
+        versions, truncated = [], False
+        for key in sorted(bucket["objects"]):
+            if not key.startswith(prefix) or key < key_marker or (key == key_marker and not version_id_marker):
+                continue
+            entries = self.view(bucket["objects"][key], replica, listed_at)
+            listed = [(key, entry, entry is entries[-1]) for entry in reversed(entries)]
+            if key == key_marker:
+                # The previous page ended in the middle of the versions of this key
+                version_ids = [entry["version_id"] for _, entry, _ in listed]
+                listed = listed[version_ids.index(version_id_marker) + 1:] if version_id_marker in version_ids else []
+            for item in listed:
+                if len(versions) == max_keys:
+                    truncated = True
+                    break
+                versions.append(item)
+            if truncated:
+                break
+
+        root = ET.Element("ListVersionsResult", xmlns=S3_NAMESPACE)
+        ET.SubElement(root, "Name").text = bucket_name
+        ET.SubElement(root, "Prefix").text = prefix
+        ET.SubElement(root, "KeyMarker").text = key_marker
+        ET.SubElement(root, "VersionIdMarker").text = version_id_marker
+        ET.SubElement(root, "MaxKeys").text = str(max_keys)
+        ET.SubElement(root, "IsTruncated").text = str(truncated).lower()
+        if truncated:
+            ET.SubElement(root, "NextKeyMarker").text = versions[-1][0]
+            ET.SubElement(root, "NextVersionIdMarker").text = versions[-1][1]["version_id"]
+        for key, entry, is_latest in versions:
+            element = ET.SubElement(root, "DeleteMarker" if entry["deleted"] else "Version")
+            ET.SubElement(element, "Key").text = key
+            ET.SubElement(element, "VersionId").text = entry["version_id"]
+            ET.SubElement(element, "IsLatest").text = str(is_latest).lower()
+            ET.SubElement(element, "LastModified").text = iso_timestamp(entry["last_modified"])
+            if not entry["deleted"]:
+                ET.SubElement(element, "ETag").text = entry["etag"]
+                ET.SubElement(element, "Size").text = str(len(entry["body"]))
+                ET.SubElement(element, "StorageClass").text = "STANDARD"
+        return 200, {}, root, False
+
+    def dispatch(self, method, bucket_name, key, query, headers, body):
+        """
+        Serves a request, applying its latency and error injection
+        :return: tuple: (operation name, status, headers, body as bytes or xml element)
+        """
+        operation = operation_name(method, bucket_name, key, query, headers)
+        latency, fail, replica = self.plan_request(operation)
+        time.sleep(latency)
+        if fail:
+            self.count(operation, "requests")
+            self.count(operation, "injected_errors")
+            raise S3Error(503, "SlowDown", "Please reduce your request rate.")
+        at = time.monotonic()
+
+        self.count(operation, "requests")
+        try:
+            result = self.serve(operation, bucket_name, key, query, headers, body, replica, at)
+        except S3Error as e:
+            if e.stale:
+                self.count(operation, "stale")
+            raise
+        status, response_headers, response_body, stale = result
+        if stale:
+            self.count(operation, "stale")
+        return operation, status, response_headers, response_body
+
+    def serve(self, operation, bucket_name, key, query, headers, body, replica, at):
+        """
+        :return: tuple: (status, headers, body, whether the primary would have answered otherwise)
+        """
+        with self.lock:
+            if operation == "ListBuckets":
+                result = self.list_buckets(owner_of(headers, query), query, replica, at)
+            elif operation == "CreateBucket":
+                result = self.create_bucket(bucket_name, owner_of(headers, query))
+            elif operation == "HeadBucket":
+                result = self.head_bucket(bucket_name, replica, at)
+            elif operation == "DeleteBucket":
+                result = self.delete_bucket(bucket_name)
+            elif operation == "PutBucketVersioning":
+                result = self.put_bucket_versioning(bucket_name, body)
+            elif operation == "GetBucketVersioning":
+                result = self.get_bucket_versioning(bucket_name, replica, at)
+            elif operation == "GetBucketLocation":
+                result = self.get_bucket_location(bucket_name, replica, at)
+            elif operation == "GetBucketAcl":
+                result = self.get_bucket_acl(bucket_name, replica, at)
+            elif operation == "ListObjectsV2":
+                result = self.list_objects(bucket_name, query, replica, at)
+            elif operation == "ListObjects":
+                result = self.list_objects(bucket_name, query, replica, at, version=1)
+            elif operation == "ListObjectVersions":
+                result = self.list_object_versions(bucket_name, query, replica, at)
+            elif operation == "DeleteObjects":
+                result = self.delete_objects(bucket_name, body)
+            elif operation == "PutObject":
+                result = self.put_object(bucket_name, key, body, headers)
+            elif operation in ("GetObject", "HeadObject"):
+                result = self.get_object(bucket_name, key, query, replica, at, head=operation == "HeadObject")
+            elif operation == "DeleteObject":
+                result = (204, self.delete_object(bucket_name, key, query.get("versionId")), None, False)
+            else:
+                raise S3Error(501, "NotImplemented", f"{operation} is not implemented by the local S3 stand-in")
+        return result
+
+
+def operation_name(method, bucket_name, key, query, headers):
+    if not bucket_name:
+        return "ListBuckets" if method == "GET" else "Unknown"
+    if not key:
+        subresources = {
+            ("GET", "versioning"): "GetBucketVersioning",
+            ("PUT", "versioning"): "PutBucketVersioning",
+            ("GET", "versions"): "ListObjectVersions",
+            ("GET", "location"): "GetBucketLocation",
+            ("POST", "delete"): "DeleteObjects",
+        }
+        for (subresource_method, subresource), name in subresources.items():
+            if method == subresource_method and subresource in query:
+                return name
+        if method == "GET":
+            # Other bucket subresources (acl, policy, cors...) are not implemented
+            unknown = set(query) - {"list-type", "prefix", "delimiter", "max-keys", "continuation-token",
+                                    "start-after", "marker", "encoding-type", "fetch-owner"}
+            if unknown:
+                return f"GetBucket{sorted(unknown)[0].capitalize()}"
+            return "ListObjectsV2" if query.get("list-type") == "2" else "ListObjects"
+        if query:
+            return f"{method.capitalize()}Bucket{sorted(query)[0].capitalize()}"
+        return {"PUT": "CreateBucket", "HEAD": "HeadBucket", "DELETE": "DeleteBucket"}.get(method, "Unknown")
+    if set(query) - {"versionId"} or "x-amz-copy-source" in headers:
+        return f"{method.capitalize()}Object{sorted(set(query) - {'versionId'} or ['Copy'])[0].capitalize()}"
+    return {"PUT": "PutObject", "GET": "GetObject", "HEAD": "HeadObject", "DELETE": "DeleteObject"}.get(method, "Unknown")
+
+
+def owner_of(headers, query):
+    """
+    Canonical id of the owner of the access key signing a request, by header or presigned query
+    """
+    credential = query.get("X-Amz-Credential", "")
+    match = re.search(r"Credential=([^/,\s]+)", headers.get("Authorization", ""))
+    access_key = match.group(1) if match else credential.split("/", 1)[0]
+    return hashlib.sha256(access_key.encode()).hexdigest()
+
+
+def route(request_path, host_header, server_host):
+    """
+    Bucket, key and query of a path style (/bucket/key) or virtual host style (bucket.host/key) request
+    :param request_path: str: path and query of the request line
+    :param host_header: str: Host header of the request
+    :param server_host: str: host name of the server, the prefix of a virtual host style Host is the bucket
+    :return: tuple: (bucket name, key, dict query parameters)
+    """
+    url = urlsplit(request_path)
+    path = unquote(url.path)
+    host = (host_header or "").rsplit(":", 1)[0]
+    if host.endswith(f".{server_host}"):
+        bucket_name, key = host[:-len(server_host) - 1], path.lstrip("/")
+    else:
+        bucket_name, _, key = path.lstrip("/").partition("/")
+    query = {name: values[0] for name, values in parse_qs(url.query, keep_blank_values=True).items()}
+    return bucket_name, key, query
+
+
+def iso_timestamp(epoch):
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def encode_key(key, url_encoded):
+    return quote(key, safe="/") if url_encoded else key
+
+
+def find_text(element, name):
+    found = element.find(f"{{{S3_NAMESPACE}}}{name}")
+    if found is None:
+        found = element.find(name)
+    return found.text if found is not None else None
+
+
+def find_all(element, name):
+    return element.findall(f"{{{S3_NAMESPACE}}}{name}") or element.findall(name)
+
+
+class LocalS3Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients dropping keep-alive connections are expected, e.g. at the end of a load
+        logging.debug(f"local-s3 connection of {client_address} errored", exc_info=True)
+
+
+class LocalS3Handler(BaseHTTPRequestHandler):
+    """
+    HTTP front of a LocalS3, path style (http://host:port/bucket/key) and virtual host style
+    (http://bucket.host:port/key) requests are both accepted
+    """
+
+    protocol_version = "HTTP/1.1"
+    local_s3 = None
+
+    def log_message(self, format, *args):
+        logging.debug(f"local-s3 {self.address_string()} {format % args}")
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if "aws-chunked" in self.headers.get("Content-Encoding", ""):
+            return decode_aws_chunked(self.rfile.read(length))
+        return self.rfile.read(length) if length else b""
+
+    def handle_request(self):
+        body = self.read_body()
+        bucket_name, key, query = route(self.path, self.headers.get("Host"), self.local_s3.host)
+        request_id = uuid.uuid4().hex[:16].upper()
+        try:
+            _, status, headers, response_body = self.local_s3.dispatch(
+                self.command, bucket_name, key, query, self.headers, body
+            )
+        except S3Error as e:
+            status, headers = e.status, dict(e.headers)
+            root = ET.Element("Error")
+            ET.SubElement(root, "Code").text = e.code
+            ET.SubElement(root, "Message").text = e.message
+            ET.SubElement(root, "RequestId").text = request_id
+            response_body = root
+        except Exception as e:
+            logging.exception(f"local-s3 failed to serve {self.command} {self.path}")
+            status, headers = 500, {}
+            root = ET.Element("Error")
+            ET.SubElement(root, "Code").text = "InternalError"
+            ET.SubElement(root, "Message").text = str(e)
+            response_body = root
+
+        if isinstance(response_body, ET.Element):
+            response_body = b'<?xml version="1.0" encoding="UTF-8"?>\n' + ET.tostring(response_body)
+            headers.setdefault("Content-Type", "application/xml")
+        response_body = response_body or b""
+
+        self.send_response(status)
+        headers.setdefault("Content-Length", str(len(response_body)))
+        headers["x-amz-request-id"] = request_id
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(response_body)
+
+    do_GET = do_PUT = do_POST = do_HEAD = do_DELETE = handle_request
+
+
+def main():
+    parser = argparse.ArgumentParser(description="S3 local com consistência eventual configurável")
+    parser.add_argument("--host", default="localhost", help="Endereço de escuta")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Porta de escuta")
+    parser.add_argument("--replicas", type=int, default=DEFAULT_REPLICAS, help="Réplicas que servem as leituras")
+    parser.add_argument("--replica-lag", type=parse_distribution, default=(0.0, 0.0),
+                        help="Atraso de uma escrita até cada réplica, 'media:desvio' em segundos")
+    parser.add_argument("--listing-staleness", type=float, default=0.0,
+                        help="Segundos que as listagens ficam atrás da réplica")
+    parser.add_argument("--latency", action="append",
+                        help="Latência por operação, 'Operacao=media:desvio' em segundos, '*' para todas. Repetível")
+    parser.add_argument("--error-rate", action="append",
+                        help="Probabilidade de 503 SlowDown por operação, 'Operacao=taxa', '*' para todas. Repetível")
+    parser.add_argument("--seed", type=int, default=None, help="Semente das escolhas aleatórias")
+    parser.add_argument("--stats-interval", type=float, default=0, help="Imprime as estatísticas a cada N segundos")
+    args = parser.parse_args()
+
+    local_s3 = LocalS3(
+        host=args.host,
+        port=args.port,
+        replicas=args.replicas,
+        replica_lag=args.replica_lag,
+        listing_staleness=args.listing_staleness,
+        latencies=parse_per_operation(args.latency, parse_distribution),
+        error_rates=parse_per_operation(args.error_rate, float),
+        seed=args.seed,
+    )
+    print(f"S3 local em {local_s3.start()}, Ctrl-C para parar")
+    try:
+        while True:
+            time.sleep(args.stats_interval or 3600)
+            if args.stats_interval:
+                print(local_s3.stats())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        local_s3.stop()
+        print(f"Estatísticas: {local_s3.stats()}")
+
+
+if __name__ == "__main__":
+    main()
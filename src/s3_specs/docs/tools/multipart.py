@@ -0,0 +1,453 @@
+import base64
+import hashlib
+import io
+import json
+import logging
+import mmap
+import os
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from botocore.exceptions import ClientError
+
+from s3_specs.docs.tools.report_stats import percentile
+
+try:
+    # CRC32C is only available with the aws crt, installed by boto3[crt]
+    from awscrt import checksums as crt_checksums
+except ImportError:
+    crt_checksums = None
+
+PART_SIZE = 8 * 1024 * 1024
+PART_WORKERS = 10
+PART_ATTEMPTS = 3
+PART_RETRY_DELAY = 0.5
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10_000
+JOURNAL_SUFFIX = ".upload.json"
+CHECKSUMS = ("MD5", "CRC32", "CRC32C")
+
+### Functions
+
+
+def part_checksum(algorithm, view):
+    """
+    Checksum of a part as sent to upload_part, computed straight from the memoryview
+    :param algorithm: str: MD5, CRC32 or CRC32C
+    :param view: memoryview: body of the part
+    :return: dict: upload_part parameters carrying the checksum
+    """
+    if algorithm == "MD5":
+        return {"ContentMD5": base64.b64encode(hashlib.md5(view, usedforsecurity=False).digest()).decode()}
+    if algorithm == "CRC32":
+        crc = zlib.crc32(view)
+    elif algorithm == "CRC32C":
+        crc = crt_checksums.crc32c(view)
+    else:
+        return {}
+    return {f"Checksum{algorithm}": base64.b64encode(crc.to_bytes(4, "big")).decode()}
+
+
+class MemoryViewReader(io.RawIOBase):
+    """
+    Read-only file over a memoryview, handed to botocore as the body of a part.
+    Reads return slices of the view, so the part is never copied into a bytes object.
+    """
+
+    def __init__(self, view):
+        self.view = view
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def __len__(self):
+        return len(self.view)
+
+    def read(self, size=-1):
+        end = len(self.view) if size is None or size < 0 else min(self.position + size, len(self.view))
+        chunk = self.view[self.position : end]
+        self.position = end
+        return chunk
+
+    def readinto(self, buffer):
+        chunk = self.read(len(buffer))
+        buffer[: len(chunk)] = chunk
+        return len(chunk)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: len(self.view)}[whence]
+        self.position = max(base + offset, 0)
+        return self.position
+
+    def tell(self):
+        return self.position
+
+
+class FilePayload:
+    """
+    Payload of a file, memory mapped so each part is a view of the page cache
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.size = os.path.getsize(file_path)
+        self.identity = {"path": os.path.abspath(file_path), "size": self.size, "mtime": os.path.getmtime(file_path)}
+        self.file = open(file_path, "rb")
+        self.mapped = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        self.view = memoryview(self.mapped)
+
+    def part(self, start, end):
+        return self.view[start:end]
+
+    def body(self):
+        return MemoryViewReader(self.view)
+
+    def close(self):
+        try:
+            self.view.release()
+            if self.size:
+                self.mapped.close()
+        except BufferError:
+            # Views of a failed part are still referenced (e.g. by its traceback), the map goes with them
+            pass
+        self.file.close()
+
+
+class SyntheticReader(io.RawIOBase):
+    """
+    Read-only file of a given size repeating a block, the body of a single request is never materialized
+    """
+
+    def __init__(self, block, size):
+        self.block = block
+        self.size = size
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def __len__(self):
+        return self.size
+
+    def readinto(self, buffer):
+        with memoryview(buffer) as view:
+            length = min(len(view), self.size - self.position)
+            written = 0
+            while written < length:
+                offset = (self.position + written) % len(self.block)
+                chunk = min(len(self.block) - offset, length - written)
+                view[written : written + chunk] = self.block[offset : offset + chunk]
+                written += chunk
+        self.position += length
+        return length
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: self.size}[whence]
+        self.position = min(max(base + offset, 0), self.size)
+        return self.position
+
+    def tell(self):
+        return self.position
+
+
+class SyntheticPayload:
+    """
+    Payload of a given size generated from one random block repeated, for uploads that don't need a file.
+    Parts are views of a single buffer as long as the largest part, filled from the block the first time
+    a part is asked for, and a single request body streams the block (see body). Nothing is written to disk.
+    :param part_size: int: the part size given to upload_multipart
+    """
+
+    def __init__(self, size, part_size=PART_SIZE, seed=None):
+        self.size = size
+        self.seed = seed if seed is not None else os.urandom(16).hex()
+        self.identity = {"synthetic": self.seed, "size": size}
+        self.block = hashlib.sha256(self.seed.encode()).digest() * (64 * 1024 // 32)
+        self.part_size = part_size
+        self.view = None
+        self.lock = threading.Lock()
+
+    def part(self, start, end):
+        with self.lock:
+            if self.view is None:
+                _, first_start, first_end = plan_parts(self.size, self.part_size)[0]
+                buffer = bytearray(first_end - first_start)
+                SyntheticReader(self.block, len(buffer)).readinto(buffer)
+                self.view = memoryview(buffer)
+        return self.view[: end - start]
+
+    def body(self):
+        return SyntheticReader(self.block, self.size)
+
+    def close(self):
+        # The buffer is freed with the last view, see FilePayload.close
+        pass
+
+
+def plan_parts(size, part_size):
+    """
+    Splits an object in parts, growing the part size if needed to stay under the 10000 parts limit
+    :return: list tuple: (part number, start, end) of each part, a single empty part for an empty object
+    """
+    part_size = max(part_size, MIN_PART_SIZE, -(-size // MAX_PARTS))
+    starts = range(0, size, part_size) if size else [0]
+    return [(number, start, min(start + part_size, size)) for number, start in enumerate(starts, start=1)]
+
+
+class UploadJournal:
+    """
+    Upload state saved after every part, so an interrupted upload resumes with the same upload id
+    and only sends the parts still missing. Written atomically, a crash never leaves it half written.
+    """
+
+    def __init__(self, path, state):
+        # Without a path the state is only kept in memory
+        self.path = path
+        self.state = state
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path, expected):
+        """
+        :param expected: dict: fields that must match the saved state (bucket, key, payload, part size)
+        :return: UploadJournal or None if there is no journal for the same upload
+        """
+        try:
+            with open(path, "r") as f:
+                state = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if any(state.get(field) != value for field, value in expected.items()):
+            logging.info(f"Ignoring upload journal {path}, it belongs to another upload")
+            return None
+        return cls(path, state)
+
+    def part_done(self, number, etag, checksum):
+        with self.lock:
+            self.state["parts"][str(number)] = {"ETag": etag, **checksum}
+            self.save()
+
+    def save(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def upload_multipart(
+    s3_client,
+    bucket_name,
+    object_key,
+    payload,
+    part_size=PART_SIZE,
+    max_workers=PART_WORKERS,
+    checksum="MD5",
+    journal_path=None,
+    callback=None,
+    extra_args=None,
+):
+    """
+    Uploads a payload in parts sent in parallel from memoryviews, each one with its checksum and retried
+    on its own. The state is kept in a journal: when an upload is interrupted, calling this again with the
+    same arguments resumes it, checking the parts already uploaded against list_parts.
+
+    :param s3_client: boto3 s3 client
+    :param bucket_name: str: name of the bucket
+    :param object_key: str: key of the object
+    :param payload: FilePayload or SyntheticPayload: content of the object
+    :param part_size: int: bytes per part, grown if the object would need more than 10000 parts
+    :param max_workers: int: parts uploaded in parallel
+    :param checksum: str: MD5, CRC32, CRC32C (needs awscrt) or None
+    :param journal_path: str: upload state file, none to not persist it (no resume, a failed upload is aborted)
+    :param callback: callable: called with the bytes sent, e.g. a tqdm update
+    :param extra_args: dict: extra create_multipart_upload parameters, e.g. StorageClass
+    :return: dict: etag, size, parts, resumed parts, seconds, MB/s and the per part latencies
+    """
+    if checksum not in CHECKSUMS and checksum is not None:
+        raise ValueError(f"checksum must be one of {CHECKSUMS} or None, got {checksum!r}")
+    if checksum == "CRC32C" and crt_checksums is None:
+        raise ValueError("CRC32C checksums need awscrt, install boto3[crt] or use CRC32/MD5")
+
+    parts = plan_parts(payload.size, part_size)
+    expected = {
+        "bucket": bucket_name,
+        "key": object_key,
+        "payload": payload.identity,
+        "part_size": part_size,
+        "checksum": checksum,
+    }
+    journal = UploadJournal.load(journal_path, expected) if journal_path else None
+    done = {}
+    if journal is not None:
+        done = resumable_parts(s3_client, bucket_name, object_key, journal, parts)
+        if done is None:
+            journal = None
+    if journal is None:
+        create_args = {"Bucket": bucket_name, "Key": object_key, **(extra_args or {})}
+        if checksum in ("CRC32", "CRC32C"):
+            create_args["ChecksumAlgorithm"] = checksum
+        upload_id = s3_client.create_multipart_upload(**create_args)["UploadId"]
+        journal = UploadJournal(journal_path, {**expected, "upload_id": upload_id, "parts": {}})
+        done = {}
+        journal.save()
+    upload_id = journal.state["upload_id"]
+    if done:
+        logging.info(f"Resuming upload {upload_id} of {object_key}: {len(done)} of {len(parts)} parts already uploaded")
+        if callback:
+            callback(sum(end - start for number, start, end in parts if number in done))
+
+    latencies = []
+    latencies_lock = threading.Lock()
+
+    def upload_part(number, start, end):
+        view = payload.part(start, end)
+        part_args = part_checksum(checksum, view)
+        for attempt in range(1, PART_ATTEMPTS + 1):
+            started = time.perf_counter()
+            try:
+                response = s3_client.upload_part(
+                    Bucket=bucket_name,
+                    Key=object_key,
+                    UploadId=upload_id,
+                    PartNumber=number,
+                    Body=MemoryViewReader(view),
+                    **part_args,
+                )
+                break
+            except Exception as e:
+                if attempt == PART_ATTEMPTS:
+                    raise
+                logging.info(f"Part {number} of {object_key} failed ({e}), retrying")
+                time.sleep(PART_RETRY_DELAY * 2 ** (attempt - 1))
+
+        with latencies_lock:
+            latencies.append(time.perf_counter() - started)
+        # The parts checksums are sent again on complete_multipart_upload
+        checksum_args = {key: value for key, value in part_args.items() if key.startswith("Checksum")}
+        journal.part_done(number, response["ETag"], checksum_args)
+        if callback:
+            callback(end - start)
+        return number
+
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(upload_part, *part) for part in parts if part[0] not in done]
+            for future in as_completed(futures):
+                future.result()
+
+        completed_parts = sorted(
+            ({"PartNumber": int(number), **part} for number, part in journal.state["parts"].items()),
+            key=lambda part: part["PartNumber"],
+        )
+        response = s3_client.complete_multipart_upload(
+            Bucket=bucket_name, Key=object_key, UploadId=upload_id, MultipartUpload={"Parts": completed_parts}
+        )
+    except BaseException:
+        if not journal_path:
+            # Without a journal nothing resumes the upload, its parts would stay stored (and billed)
+            abort_upload(s3_client, bucket_name, object_key, upload_id)
+        raise
+    finally:
+        payload.close()
+    journal.remove()
+    seconds = time.perf_counter() - started
+    uploaded_bytes = sum(end - start for number, start, end in parts if number not in done)
+
+    latencies.sort()
+    result = {
+        "etag": response.get("ETag"),
+        "size": payload.size,
+        "parts": len(parts),
+        "resumed_parts": len(done),
+        "seconds": round(seconds, 3),
+        "mb_per_second": round(uploaded_bytes / 1024**2 / seconds, 3) if seconds else 0.0,
+        "part_seconds": {
+            "mean": round(sum(latencies) / len(latencies), 4) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50), 4),
+            "p95": round(percentile(latencies, 95), 4),
+            "max": round(latencies[-1], 4) if latencies else 0.0,
+        },
+    }
+    logging.info(f"Uploaded {object_key} in {len(parts)} parts: {result}")
+    return result
+
+
+def abort_upload(s3_client, bucket_name, object_key, upload_id):
+    """
+    Aborts a failed upload, logging instead of raising so the error that failed it is the one reported
+    """
+    try:
+        s3_client.abort_multipart_upload(Bucket=bucket_name, Key=object_key, UploadId=upload_id)
+        logging.info(f"Aborted upload {upload_id} of {object_key}")
+    except Exception as e:
+        logging.warning(f"Failed to abort upload {upload_id} of {object_key}: {e}")
+
+
+def upload_single(s3_client, bucket_name, object_key, payload, callback=None, extra_args=None):
+    """
+    Uploads a payload in a single PutObject, for objects under the multipart threshold
+    :param payload: FilePayload or SyntheticPayload: content of the object
+    :param callback: callable: called with the bytes sent, e.g. a tqdm update
+    :param extra_args: dict: extra put_object parameters, e.g. StorageClass
+    :return: dict: etag, size, seconds and MB/s
+    """
+    started = time.perf_counter()
+    try:
+        response = s3_client.put_object(Bucket=bucket_name, Key=object_key, Body=payload.body(), **(extra_args or {}))
+    finally:
+        payload.close()
+    seconds = time.perf_counter() - started
+    if callback:
+        callback(payload.size)
+    result = {
+        "etag": response.get("ETag"),
+        "size": payload.size,
+        "seconds": round(seconds, 3),
+        "mb_per_second": round(payload.size / 1024**2 / seconds, 3) if seconds else 0.0,
+    }
+    logging.info(f"Uploaded {object_key} in a single request: {result}")
+    return result
+
+
+def resumable_parts(s3_client, bucket_name, object_key, journal, parts):
+    """
+    Parts of a journaled upload that are really on the server, with the size and ETag recorded
+    :return: dict: recorded parts by part number, None if the upload no longer exists
+    """
+    sizes = {number: end - start for number, start, end in parts}
+    listed = {}
+    try:
+        paginator = s3_client.get_paginator("list_parts")
+        for page in paginator.paginate(Bucket=bucket_name, Key=object_key, UploadId=journal.state["upload_id"]):
+            for part in page.get("Parts", []):
+                listed[part["PartNumber"]] = part
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("NoSuchUpload", "404"):
+            logging.info(f"Upload {journal.state['upload_id']} of {object_key} no longer exists, starting over")
+            return None
+        raise
+
+    done = {}
+    for number, part in list(journal.state["parts"].items()):
+        server_part = listed.get(int(number))
+        if server_part and server_part["ETag"] == part["ETag"] and server_part["Size"] == sizes.get(int(number)):
+            done[int(number)] = part
+        else:
+            del journal.state["parts"][number]
+    return done
@@ -0,0 +1,178 @@
+import bisect
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from s3_specs.docs.tools.report_stats import percentile
+
+PAYLOAD_SIZE = 1024
+MAX_EXAMPLES = 5
+
+### Functions
+
+
+def payload(sequence, size=PAYLOAD_SIZE):
+    """
+    Body of a write, its sequence number on the first line padded to size
+    """
+    header = f"{sequence}\n".encode()
+    return header + b"0" * max(0, size - len(header))
+
+
+def parse_sequence(body):
+    """
+    :return: int: sequence number of a body written by payload, None for a foreign body
+    """
+    first_line = body.split(b"\n", 1)[0]
+    return int(first_line) if first_line.isdigit() else None
+
+
+def staleness_of(read_started, sequence, writes, acked_order):
+    """
+    How long a read was behind: the time since the first write that superseded what it returned was acked.
+    A write supersedes another when it started after the other was acked, concurrent writes have no order.
+    :param read_started: float: when the read was sent
+    :param sequence: int: sequence returned by the read
+    :param writes: dict: (started, acked) of each sequence
+    :param acked_order: tuple: (ack times sorted, sequences in the same order)
+    :return: float: seconds behind, 0.0 for a fresh read
+    """
+    acked_times, acked_sequences = acked_order
+    _, returned_acked = writes[sequence]
+    # A write starting after the returned one was acked is also acked after it
+    for position in range(bisect.bisect_right(acked_times, returned_acked), len(acked_times)):
+        if acked_times[position] > read_started:
+            break
+        started, acked = writes[acked_sequences[position]]
+        if started > returned_acked:
+            return read_started - acked
+    return 0.0
+
+
+class OverwriteRace:
+    """
+    Races writers and readers on a single key to find stale and non monotonic reads, in process and
+    at hundreds of operations per second. Writers overwrite the key with increasing sequence numbers,
+    recording when each put was sent and acked; readers read it in a loop, recording when each read
+    was sent and the sequence it returned.
+
+    Concurrent writes have no defined order, so reads are judged in real time only: a read is stale
+    when a write that started after the returned one was acked had itself been acked before the read
+    was sent, and a reader breaks monotonic reads when it returns a write acked before the start of
+    a write it had already seen.
+    """
+
+    def __init__(self, s3_client, bucket_name, object_key, writers=2, readers=8, payload_size=PAYLOAD_SIZE):
+        """
+        :param s3_client: boto3 s3 client, with max_pool_connections of at least writers + readers
+        """
+        self.client = s3_client
+        self.bucket_name = bucket_name
+        self.object_key = object_key
+        self.writers = writers
+        self.readers = readers
+        self.payload_size = payload_size
+        self.sequences = itertools.count()
+        self.lock = threading.Lock()
+        self.stop = threading.Event()
+        # (started, acked) of each write by sequence, and (reader, started, sequence) of each read
+        self.writes = {}
+        self.reads = []
+        self.errors = []
+        self.foreign_reads = 0
+        self.started = time.monotonic()
+
+    def now(self):
+        return time.monotonic() - self.started
+
+    def write(self):
+        with self.lock:
+            sequence = next(self.sequences)
+        started = self.now()
+        self.client.put_object(Bucket=self.bucket_name, Key=self.object_key, Body=payload(sequence, self.payload_size))
+        acked = self.now()
+        with self.lock:
+            self.writes[sequence] = (started, acked)
+
+    def read(self, reader):
+        started = self.now()
+        response = self.client.get_object(Bucket=self.bucket_name, Key=self.object_key)
+        sequence = parse_sequence(response["Body"].read())
+        with self.lock:
+            if sequence is None:
+                self.foreign_reads += 1
+            else:
+                self.reads.append((reader, started, sequence))
+
+    def loop(self, operation, *args):
+        while not self.stop.is_set():
+            # Timeouts and dropped connections are counted as errors too, a worker must outlive them
+            try:
+                operation(*args)
+            except (ClientError, BotoCoreError, OSError) as e:
+                with self.lock:
+                    self.errors.append(str(e))
+
+    def run(self, duration=10):
+        """
+        Writes the first sequence, then races the writers and readers for duration seconds
+        :return: dict: see analyze
+        """
+        self.write()
+        self.stop.clear()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.writers + self.readers) as executor:
+            workers = [executor.submit(self.loop, self.write) for _ in range(self.writers)]
+            workers += [executor.submit(self.loop, self.read, reader) for reader in range(self.readers)]
+            time.sleep(duration)
+            self.stop.set()
+            for worker in workers:
+                worker.result()
+        elapsed = time.perf_counter() - started
+        result = self.analyze(elapsed)
+        logging.info(f"Overwrite race on {self.bucket_name}/{self.object_key}: {result}")
+        return result
+
+    def analyze(self, elapsed):
+        """
+        :return: dict: writes, reads, operations per second, stale reads and their staleness in ms,
+            monotonic read violations with a few examples, errors and reads of bodies not written here
+        """
+        writes = dict(self.writes)
+        acked = sorted((acked, sequence) for sequence, (_, acked) in writes.items())
+        acked_order = ([time_acked for time_acked, _ in acked], [sequence for _, sequence in acked])
+
+        staleness_ms = []
+        violations = []
+        # Latest start among the writes seen by each reader
+        seen_started = {}
+        for reader, read_started, sequence in sorted(self.reads, key=lambda read: read[1]):
+            if sequence not in writes:
+                # Written by a put that errored, its ack time is unknown
+                continue
+            staleness_ms.append(staleness_of(read_started, sequence, writes, acked_order) * 1000)
+            write_started, write_acked = writes[sequence]
+            if write_acked < seen_started.get(reader, float("-inf")):
+                violations.append({"reader": reader, "at_seconds": round(read_started, 4), "sequence": sequence})
+            seen_started[reader] = max(seen_started.get(reader, float("-inf")), write_started)
+
+        stale = sorted(value for value in staleness_ms if value > 0)
+        return {
+            "writes": len(writes),
+            "reads": len(staleness_ms),
+            "operations_per_second": round((len(writes) + len(self.reads)) / elapsed, 1) if elapsed else 0.0,
+            "stale_reads": len(stale),
+            "staleness_ms": {
+                "p50": round(percentile(stale, 50), 1),
+                "p99": round(percentile(stale, 99), 1),
+                "max": round(stale[-1], 1) if stale else 0.0,
+            },
+            "monotonic_violations": len(violations),
+            "violation_examples": violations[:MAX_EXAMPLES],
+            "errors": len(self.errors),
+            "foreign_reads": self.foreign_reads,
+        }
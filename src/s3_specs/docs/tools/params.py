@@ -0,0 +1,171 @@
+import json
+import os
+from types import MappingProxyType
+
+import boto3
+import yaml
+
+DEFAULT_CONFIG_PATH = "../params.example.yaml"
+# Profiles are named after --profile by position: the default one, the second owner and the service account
+ROLE_SUFFIXES = {"default": "", "second": "-second", "sa": "-sa"}
+KEY_FIELDS = ("region_name", "aws_access_key_id", "aws_secret_access_key")
+WAIT_TIME_FIELDS = ("policy_wait_time", "lock_wait_time")
+
+# Parsed configs of this process by (path, modification time, profile)
+_configs = {}
+
+### Functions
+
+
+def freeze(value):
+    """
+    Read-only copy of a parsed yaml value, dicts become mappingproxy and lists become tuples
+    """
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value):
+    """
+    Plain (json serializable) copy of a frozen value
+    """
+    if isinstance(value, MappingProxyType):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+
+def validate_params(params):
+    """
+    Checks the test parameters before anything uses them
+    :param params: dict: parsed config file
+    :return: list str: problems found, empty if the config is valid
+    """
+    if not isinstance(params, dict):
+        return ["config must be a mapping"]
+    profiles = params.get("profiles")
+    if not isinstance(profiles, list) or not profiles:
+        return ["config must have a non empty 'profiles' list"]
+
+    errors = []
+    default_index = params.get("default_profile_index", 0)
+    if not isinstance(default_index, int) or not 0 <= default_index < len(profiles):
+        errors.append(f"default_profile_index {default_index!r} is out of the {len(profiles)} profiles")
+
+    for index, profile in enumerate(profiles):
+        if not isinstance(profile, dict):
+            errors.append(f"profile {index} must be a mapping")
+            continue
+        if "profile_name" not in profile and not all(profile.get(field) for field in KEY_FIELDS):
+            errors.append(f"profile {index} needs a profile_name or {', '.join(KEY_FIELDS)}")
+        for field in WAIT_TIME_FIELDS:
+            value = profile.get(field, 0)
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+                errors.append(f"profile {index} {field} must be a non negative number, got {value!r}")
+        endpoint_url = profile.get("endpoint_url")
+        if endpoint_url is not None and not str(endpoint_url).startswith(("http://", "https://")):
+            errors.append(f"profile {index} endpoint_url must be an http(s) url, got {endpoint_url!r}")
+    return errors
+
+
+def apply_profile_name(params, profile):
+    """
+    Names the first profiles after --profile, e.g. br-se1, br-se1-second and br-se1-sa
+    """
+    if not profile:
+        return params
+    for index, suffix in enumerate(ROLE_SUFFIXES.values()):
+        if index < len(params["profiles"]) and "profile_name" in params["profiles"][index]:
+            params["profiles"][index]["profile_name"] = f"{profile}{suffix}"
+    return params
+
+
+class SpecsConfig:
+    """
+    Immutable and validated test parameters, parsed once per process.
+    The profiles are indexed by role (default, second, sa) and by name for O(1) lookups.
+    """
+
+    def __init__(self, params):
+        errors = validate_params(params)
+        if errors:
+            raise ValueError("Invalid test parameters: " + "; ".join(errors))
+
+        self.params = freeze(params)
+        self.profiles = self.params["profiles"]
+        self.default_profile = self.profiles[self.params.get("default_profile_index", 0)]
+        self.by_name = {profile["profile_name"]: profile for profile in self.profiles if "profile_name" in profile}
+
+        default_name = self.default_profile.get("profile_name")
+        self.by_role = {"default": self.default_profile}
+        for role, suffix in ROLE_SUFFIXES.items():
+            if suffix and default_name and f"{default_name}{suffix}" in self.by_name:
+                self.by_role[role] = self.by_name[f"{default_name}{suffix}"]
+        self.rbac_profiles = tuple(profile for profile in self.profiles if "rbac" in profile.get("profile_name", ""))
+
+    def profile(self, role):
+        """
+        :param role: str: default, second or sa
+        :return: mappingproxy: profile or None if the config has no profile for the role
+        """
+        return self.by_role.get(role)
+
+    def capabilities(self, role="default"):
+        """
+        What a profile can be used for, e.g. cli tests need a profile_name and consistency tests a bucket
+        :return: frozenset str: capabilities of the profile, empty if there is no profile for the role
+        """
+        profile = self.profile(role)
+        if profile is None:
+            return frozenset()
+        capabilities = {
+            "profile_name": bool(profile.get("profile_name")),
+            "keys": all(profile.get(field) for field in KEY_FIELDS),
+            "endpoint_url": bool(profile.get("endpoint_url")),
+            "bucket": bool(profile.get("bucket")),
+            "service_account": bool(profile.get("sa_key_email")),
+        }
+        return frozenset(name for name, available in capabilities.items() if available)
+
+    def to_json(self):
+        return json.dumps(thaw(self.params))
+
+    @classmethod
+    def from_json(cls, serialized):
+        return cls(json.loads(serialized))
+
+
+def load_specs_config(config_path, profile=None):
+    """
+    Parses and validates a config file, only once per process while the file is unchanged
+    :param config_path: str: path of the yaml config
+    :param profile: str: name given to the profiles, see apply_profile_name
+    :return: SpecsConfig: parsed config
+    """
+    key = (os.path.abspath(config_path), os.path.getmtime(config_path), profile)
+    if key not in _configs:
+        with open(config_path, "r") as f:
+            params = yaml.safe_load(f)
+        if isinstance(params, dict) and isinstance(params.get("profiles"), list):
+            params = apply_profile_name(params, profile)
+        _configs[key] = SpecsConfig(params)
+    return _configs[key]
+
+
+def profile_session(profile):
+    """
+    boto3 session of a profile, from its profile_name or its keys
+    :param profile: mapping: profile of the test parameters
+    :return: boto3.Session
+    """
+    if "profile_name" in profile:
+        return boto3.Session(profile_name=profile["profile_name"])
+    return boto3.Session(
+        region_name=profile["region_name"],
+        aws_access_key_id=profile["aws_access_key_id"],
+        aws_secret_access_key=profile["aws_secret_access_key"],
+    )
@@ -35,12 +35,12 @@ def fixture_private_bucket(s3_client, bucket_with_one_object):
     return bucket_name, object_key
 
 @pytest.fixture
-def profile_name_second(test_params, profile_name):
-    profiles = [profile['profile_name'] for profile in test_params['profiles']]
+def profile_name_second(specs_config, profile_name):
+    second_profile = specs_config.profile("second")
     
-    logging.info(profiles)
+    logging.info(second_profile)
 
-    if f"{profile_name}-second" not in profiles:
+    if second_profile is None:
         pytest.skip("Second Account not provided")
     
     return f"{profile_name}-second"
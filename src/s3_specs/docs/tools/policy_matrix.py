@@ -0,0 +1,219 @@
+import copy
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+from s3_specs.docs.s3_helpers import (
+    create_bucket_and_wait,
+    create_policy_json,
+    delete_bucket_and_wait,
+    generate_unique_bucket_name,
+)
+
+# What the policy tests slept after every put_bucket_policy before the matrix, used when the profile has no policy_wait_time
+DEFAULT_POLICY_WAIT = 120
+# Bucket policies are limited to 20 KB, scenarios that don't fit go to another shared bucket
+MAX_POLICY_SIZE = 20 * 1024
+MATRIX_WORKERS = 8
+PLACEHOLDERS = ("BUCKET_NAME", "BUCKET_NAME/*")
+# Operations evaluated on the object of the scenario, only these can be confined to a key prefix
+OBJECT_OPERATIONS = ("get_object", "head_object", "put_object", "delete_object")
+# Condition keys of bucket requests, meaningless on an object resource
+BUCKET_CONDITION_KEYS = ("s3:prefix", "s3:delimiter", "s3:max-keys")
+OBJECT_NAME = "object.txt"
+
+### Functions
+
+
+def scenarios_from_cases(cases, ids):
+    """
+    Converts the parametrize tuples of the policy tests into matrix scenarios
+    :param cases: list tuple: (clients param, policy template, boto3 action, expected result)
+    :param ids: list str: test id of each case, also the name of the scenario
+    :return: list dict: name, policy, action and expected of each scenario
+    """
+    return [
+        {"name": name, "policy": policy, "action": action, "expected": expected}
+        for name, (_, policy, action, expected) in zip(ids, cases)
+    ]
+
+
+def prefix_scopable(scenario):
+    """
+    Whether the statements of a scenario can be confined to a key prefix without changing its result:
+    the evaluated operation must be on an object and every statement must target the bucket placeholders
+    through Action and Resource, without bucket condition keys
+    """
+    if scenario["action"] not in OBJECT_OPERATIONS:
+        return False
+    for statement in scenario["policy"]["Statement"]:
+        if "NotResource" in statement or "NotAction" in statement:
+            return False
+        resources = statement.get("Resource", [])
+        resources = [resources] if isinstance(resources, str) else resources
+        if not resources or any(resource not in PLACEHOLDERS for resource in resources):
+            return False
+        condition_keys = {key for operator in statement.get("Condition", {}).values() for key in operator}
+        if condition_keys & set(BUCKET_CONDITION_KEYS):
+            return False
+    return True
+
+
+def scoped_statements(scenario, index, bucket_name):
+    """
+    Statements of a scenario confined to the prefix of its object, with Sids unique in the shared policy
+    """
+    statements = []
+    for number, statement in enumerate(scenario["policy"]["Statement"]):
+        statement = copy.deepcopy(statement)
+        statement["Sid"] = f"Scenario{index}Statement{number}"
+        statement["Resource"] = [f"{bucket_name}/{scenario['name']}/*"]
+        statements.append(statement)
+    return statements
+
+
+def evaluate(s3_client, bucket_name, object_key, action):
+    """
+    Runs the operation of a scenario
+    :return: dict: result (allow or deny), http status and error code of a denied operation
+    """
+    kwargs = {"Bucket": bucket_name, "Key": object_key}
+    if action == "put_object":
+        kwargs["Body"] = b"42"
+    try:
+        response = getattr(s3_client, action)(**kwargs)
+    except ClientError as e:
+        return {
+            "result": "deny",
+            "status": e.response.get("ResponseMetadata", {}).get("HTTPStatusCode"),
+            "code": e.response.get("Error", {}).get("Code"),
+        }
+    if "Body" in response:
+        response["Body"].close()
+    return {"result": "allow", "status": response["ResponseMetadata"]["HTTPStatusCode"], "code": None}
+
+
+class PolicyMatrix:
+    """
+    Evaluates many bucket policy scenarios paying the policy propagation wait only once.
+    Scenarios whose statements can be confined to a key prefix (see prefix_scopable) are packed
+    into the policy of a shared bucket, each one with its own object under its own prefix. The
+    others get a bucket of their own. Every policy is applied at once, the propagation is awaited
+    once and then the scenarios are evaluated concurrently.
+    """
+
+    def __init__(self, s3_client, scenarios, policy_wait_time=DEFAULT_POLICY_WAIT, workers=MATRIX_WORKERS):
+        """
+        :param s3_client: boto3 s3 client owning the buckets and running the operations
+        :param scenarios: list dict: name, policy (with BUCKET_NAME placeholders), action and expected
+        :param policy_wait_time: int: seconds for a policy to propagate
+        """
+        self.client = s3_client
+        self.scenarios = scenarios
+        self.policy_wait_time = policy_wait_time
+        self.workers = workers
+        # Bucket and object of each scenario, and the policy of each bucket
+        self.targets = {}
+        self.policies = {}
+        self.buckets = []
+        self.lock = threading.Lock()
+
+    def plan(self):
+        """
+        Assigns a bucket and an object to every scenario and compiles the policy of each bucket
+        :return: dict: policy document by bucket name
+        """
+        shared_bucket = None
+        shared_statements = []
+        for index, scenario in enumerate(self.scenarios):
+            if not prefix_scopable(scenario):
+                bucket_name = generate_unique_bucket_name(base_name="policy-matrix-isolated")
+                self.targets[scenario["name"]] = (bucket_name, OBJECT_NAME)
+                self.policies[bucket_name] = create_policy_json(bucket_name, scenario["policy"])
+                logging.info(f"Scenario {scenario['name']} can't be prefix scoped, using bucket {bucket_name}")
+                continue
+
+            if shared_bucket is not None:
+                statements = scoped_statements(scenario, index, shared_bucket)
+                candidate = {"Version": "2012-10-17", "Statement": shared_statements + statements}
+                if len(json.dumps(candidate)) > MAX_POLICY_SIZE:
+                    shared_bucket = None
+            if shared_bucket is None:
+                shared_bucket = generate_unique_bucket_name(base_name="policy-matrix")
+                shared_statements = []
+            shared_statements += scoped_statements(scenario, index, shared_bucket)
+            self.policies[shared_bucket] = json.dumps({"Version": "2012-10-17", "Statement": shared_statements})
+            self.targets[scenario["name"]] = (shared_bucket, f"{scenario['name']}/{OBJECT_NAME}")
+        return self.policies
+
+    def setup(self):
+        """
+        Creates the buckets and objects, applies every policy and waits once for their propagation
+        """
+        self.plan()
+        objects = {}
+        for bucket_name, object_key in self.targets.values():
+            objects.setdefault(bucket_name, []).append(object_key)
+
+        def prepare(bucket_name):
+            create_bucket_and_wait(self.client, bucket_name)
+            with self.lock:
+                self.buckets.append(bucket_name)
+            for object_key in objects[bucket_name]:
+                self.client.put_object(Bucket=bucket_name, Key=object_key, Body=b"42")
+            self.client.put_bucket_policy(Bucket=bucket_name, Policy=self.policies[bucket_name])
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            list(executor.map(prepare, objects))
+        logging.info(
+            f"{len(self.scenarios)} policy scenarios applied to {len(self.policies)} buckets, "
+            f"waiting {self.policy_wait_time} seconds for the propagation"
+        )
+        time.sleep(self.policy_wait_time)
+
+    def run(self):
+        """
+        Evaluates every scenario concurrently
+        :return: dict: outcome of each scenario by name, see evaluate
+        """
+
+        def run_scenario(scenario):
+            bucket_name, object_key = self.targets[scenario["name"]]
+            return scenario["name"], evaluate(self.client, bucket_name, object_key, scenario["action"])
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            outcomes = dict(executor.map(run_scenario, self.scenarios))
+        logging.info(f"Policy matrix outcomes: {outcomes}")
+        return outcomes
+
+    def teardown(self):
+        """
+        Removes the policies, waits once for the removal to propagate and deletes objects and buckets
+        """
+
+        def delete_policy(bucket_name):
+            try:
+                self.client.delete_bucket_policy(Bucket=bucket_name)
+            except ClientError as e:
+                logging.info(f"delete policy of {bucket_name} errored with: {e}")
+
+        def delete_bucket(bucket_name):
+            for bucket, object_key in self.targets.values():
+                if bucket == bucket_name:
+                    try:
+                        self.client.delete_object(Bucket=bucket_name, Key=object_key)
+                    except ClientError as e:
+                        logging.info(f"delete of {object_key} errored with: {e}")
+            delete_bucket_and_wait(self.client, bucket_name)
+
+        if not self.buckets:
+            return
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            list(executor.map(delete_policy, self.buckets))
+            logging.info(f"waiting for policy delete to propagate, {self.policy_wait_time} seconds")
+            time.sleep(self.policy_wait_time)
+            list(executor.map(delete_bucket, self.buckets))
@@ -0,0 +1,242 @@
+import hmac
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+from urllib.parse import quote
+
+import requests
+from botocore.auth import S3SigV4QueryAuth
+from botocore.awsrequest import AWSRequest
+from requests.adapters import HTTPAdapter
+
+from s3_specs.docs.tools.raw_listing import RawLister
+from s3_specs.docs.tools.report_stats import percentile
+
+PRESIGN_EXPIRES = 300
+# Same as the default max_pool_connections of the boto3 clients, both loads get as many connections
+LOAD_WORKERS = 10
+READ_CHUNK_SIZE = 64 * 1024
+# Derived keys only change with the day, the region and the secret, a handful per run
+MAX_SIGNING_KEYS = 64
+
+_signing_keys = {}
+_signing_keys_lock = threading.Lock()
+
+### Functions
+
+
+def signing_key(secret_key, date, region_name, service_name="s3"):
+    """
+    SigV4 signing key of a day, derived once (four chained HMACs) and then reused by every signature
+    :param date: str: day of the signature, YYYYMMDD
+    :return: bytes: the derived key
+    """
+    cache_key = (secret_key, date, region_name, service_name)
+    key = _signing_keys.get(cache_key)
+    if key is None:
+        key = f"AWS4{secret_key}".encode()
+        for part in (date, region_name, service_name, "aws4_request"):
+            key = hmac.new(key, part.encode(), sha256).digest()
+        with _signing_keys_lock:
+            if len(_signing_keys) >= MAX_SIGNING_KEYS:
+                _signing_keys.clear()
+            _signing_keys[cache_key] = key
+    return key
+
+
+class CachedKeyQueryAuth(S3SigV4QueryAuth):
+    """
+    botocore presigned url signer that reuses the derived signing key instead of deriving it per url
+    """
+
+    def signature(self, string_to_sign, request):
+        key = signing_key(self.credentials.secret_key, request.context["timestamp"][0:8], self._region_name, self._service_name)
+        return hmac.new(key, string_to_sign.encode(), sha256).hexdigest()
+
+
+class Presigner:
+    """
+    Presigns urls of objects in batches. Urls are built straight from the endpoint and signed with
+    CachedKeyQueryAuth, skipping the parameter validation and endpoint resolution done by
+    generate_presigned_url for every url. Clients that can't be signed this way (same limits as
+    the raw listing: sigv4, path style and with credentials) fall back to generate_presigned_url.
+    The urls are the same generate_presigned_url builds with signature_version s3v4.
+    """
+
+    def __init__(self, s3_client, expires=PRESIGN_EXPIRES):
+        self.client = s3_client
+        self.expires = expires
+        self.endpoint_url = s3_client.meta.endpoint_url.rstrip("/")
+        self.region_name = s3_client.meta.region_name
+        self.raw = RawLister.supports(s3_client)
+
+    def presign(self, method, bucket_name, object_key, auth=None):
+        """
+        :param method: str: GET or PUT
+        :param auth: CachedKeyQueryAuth: signer to be reused, one is built if omitted
+        :return: str: presigned url of the object
+        """
+        if not self.raw:
+            client_method = {"GET": "get_object", "PUT": "put_object"}[method]
+            return self.client.generate_presigned_url(
+                client_method, Params={"Bucket": bucket_name, "Key": object_key}, ExpiresIn=self.expires
+            )
+        if auth is None:
+            auth = self.auth()
+        request = AWSRequest(method=method, url=f"{self.endpoint_url}/{quote(bucket_name)}/{quote(object_key, safe='/~')}")
+        auth.add_auth(request)
+        return request.url
+
+    def auth(self):
+        # Credentials are frozen per batch, refreshable ones (e.g. sso) stay valid on long runs
+        credentials = self.client._get_credentials().get_frozen_credentials()
+        return CachedKeyQueryAuth(credentials, "s3", self.region_name, expires=self.expires)
+
+    def presign_batch(self, method, bucket_name, object_keys):
+        """
+        Presigns one url per key and measures the local signing throughput
+        :return: tuple: (list str urls in the order of the keys, dict urls, seconds and urls/s)
+        """
+        started = time.perf_counter()
+        auth = self.auth() if self.raw else None
+        urls = [self.presign(method, bucket_name, key, auth) for key in object_keys]
+        seconds = time.perf_counter() - started
+        stats = {
+            "urls": len(urls),
+            "seconds": round(seconds, 4),
+            "urls_per_second": round(len(urls) / seconds, 1) if seconds else 0.0,
+            "cached_signing": self.raw,
+        }
+        logging.info(f"Presigned {len(urls)} {method} urls: {stats}")
+        return urls, stats
+
+
+def signing_throughput(s3_client, bucket_name, object_keys, method="GET"):
+    """
+    Compares the presigning throughput of boto3 generate_presigned_url and of the Presigner
+    :return: dict: urls/s of each one and the speedup
+    """
+    client_method = {"GET": "get_object", "PUT": "put_object"}[method]
+    started = time.perf_counter()
+    for key in object_keys:
+        s3_client.generate_presigned_url(
+            client_method, Params={"Bucket": bucket_name, "Key": key}, ExpiresIn=PRESIGN_EXPIRES
+        )
+    boto_seconds = time.perf_counter() - started
+    _, stats = Presigner(s3_client).presign_batch(method, bucket_name, object_keys)
+
+    boto_rate = len(object_keys) / boto_seconds if boto_seconds else 0.0
+    return {
+        "urls": len(object_keys),
+        "boto3_urls_per_second": round(boto_rate, 1),
+        "presigner_urls_per_second": stats["urls_per_second"],
+        "speedup": round(stats["urls_per_second"] / boto_rate, 2) if boto_rate else 0.0,
+    }
+
+
+def pooled_session(workers=LOAD_WORKERS):
+    """
+    requests session keeping up to one keep-alive connection per worker, so the load doesn't pay
+    a tcp (and tls) handshake per url as the bare requests.get/put calls do
+    :return: requests.Session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def run_load(function, items, workers=LOAD_WORKERS):
+    """
+    Calls function on every item with a fixed number of workers, timing each call
+    :param function: callable: returns the bytes transferred, raises on failure
+    :return: dict: requests, errors, seconds, requests/s, MB/s and the latency percentiles
+    """
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def call(item):
+        started = time.perf_counter()
+        try:
+            transferred = function(item)
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+            return 0
+        with lock:
+            latencies.append(time.perf_counter() - started)
+        return transferred
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        transferred = sum(executor.map(call, items))
+    seconds = time.perf_counter() - started
+
+    latencies.sort()
+    if errors:
+        logging.info(f"{len(errors)} failed requests, first: {errors[0]}")
+    return {
+        "requests": len(latencies) + len(errors),
+        "errors": len(errors),
+        "seconds": round(seconds, 3),
+        "requests_per_second": round(len(latencies) / seconds, 1) if seconds else 0.0,
+        "mb_per_second": round(transferred / 1024**2 / seconds, 3) if seconds else 0.0,
+        "latency_seconds": {
+            "p50": round(percentile(latencies, 50), 4),
+            "p95": round(percentile(latencies, 95), 4),
+            "p99": round(percentile(latencies, 99), 4),
+            "max": round(latencies[-1], 4) if latencies else 0.0,
+        },
+    }
+
+
+def presigned_load(s3_client, bucket_name, object_keys, method="GET", body=b"", workers=LOAD_WORKERS):
+    """
+    Presigns a url per key and sends them concurrently through a pooled session
+    :param method: str: GET reads every object, PUT writes body to every key
+    :return: dict: signing stats and load stats, see run_load
+    """
+    urls, signing = Presigner(s3_client).presign_batch(method, bucket_name, object_keys)
+    session = pooled_session(workers)
+
+    def send(url):
+        if method == "PUT":
+            response = session.put(url, data=body)
+            response.raise_for_status()
+            return len(body)
+        with session.get(url, stream=True) as response:
+            response.raise_for_status()
+            return sum(len(chunk) for chunk in response.iter_content(READ_CHUNK_SIZE))
+
+    try:
+        load = run_load(send, urls, workers)
+    finally:
+        session.close()
+    load["signing"] = signing
+    logging.info(f"Presigned {method} load of {bucket_name}: {load}")
+    return load
+
+
+def authenticated_load(s3_client, bucket_name, object_keys, method="GET", body=b"", workers=LOAD_WORKERS):
+    """
+    Same load as presigned_load sent through the boto3 client, the baseline of the presigned access
+    :return: dict: load stats, see run_load
+    """
+
+    def send(key):
+        if method == "PUT":
+            s3_client.put_object(Bucket=bucket_name, Key=key, Body=body)
+            return len(body)
+        response_body = s3_client.get_object(Bucket=bucket_name, Key=key)["Body"]
+        try:
+            return sum(len(chunk) for chunk in iter(lambda: response_body.read(READ_CHUNK_SIZE), b""))
+        finally:
+            response_body.close()
+
+    load = run_load(send, object_keys, workers)
+    logging.info(f"Authenticated {method} load of {bucket_name}: {load}")
+    return load
@@ -0,0 +1,233 @@
+import json
+import logging
+import mmap
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from botocore.exceptions import ClientError
+
+# Same parallelism and part size the big object tests used through boto3 TransferConfig
+RANGE_SIZE = 8 * 1024 * 1024
+DOWNLOAD_WORKERS = 10
+RANGE_ATTEMPTS = 3
+STATE_SUFFIX = ".ranges"
+# Bytes read at a time by a single GET download
+SINGLE_BUFFER_SIZE = 1024 * 1024
+
+### Functions
+
+
+def read_into(body, view, callback=None):
+    """
+    Reads a get_object body straight into a writable buffer, without intermediate bytes objects
+    :param body: botocore StreamingBody
+    :param view: memoryview: destination, exactly as long as the expected body
+    :param callback: callable: called with the number of bytes of each read, e.g. a tqdm update
+    :return: int: bytes read, less than len(view) if the body was short
+    """
+    readinto = getattr(getattr(body, "_raw_stream", None), "readinto", None)
+    total = 0
+    try:
+        while total < len(view):
+            if readinto is not None:
+                read = readinto(view[total:])
+            else:
+                chunk = body.read(len(view) - total)
+                read = len(chunk)
+                view[total : total + read] = chunk
+            if not read:
+                break
+            total += read
+            if callback:
+                callback(read)
+    finally:
+        body.close()
+    return total
+
+
+class RangeState:
+    """
+    Bitmap of the ranges already written to the destination, kept next to it so an interrupted
+    download resumes where it stopped. The file is a json header line (etag, size and range size
+    of the object) followed by one bit per range, set only after the range is flushed to disk.
+    """
+
+    def __init__(self, path, header, ranges):
+        self.path = path
+        self.header = header
+        self.ranges = ranges
+        self.lock = threading.Lock()
+        self.bitmap = bytearray((ranges + 7) // 8)
+        self.offset = 0
+        self.fd = None
+
+    def open(self, resume):
+        header_line = (json.dumps(self.header, sort_keys=True) + "\n").encode()
+        if resume and os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                if f.readline() == header_line:
+                    saved = f.read()
+                    if len(saved) == len(self.bitmap):
+                        self.bitmap[:] = saved
+        self.offset = len(header_line)
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        os.ftruncate(self.fd, 0)
+        os.pwrite(self.fd, header_line + bytes(self.bitmap), 0)
+        return self
+
+    def done(self, index):
+        return bool(self.bitmap[index // 8] & (1 << index % 8))
+
+    def mark(self, index):
+        with self.lock:
+            self.bitmap[index // 8] |= 1 << index % 8
+            os.pwrite(self.fd, bytes(self.bitmap[index // 8 : index // 8 + 1]), self.offset + index // 8)
+
+    def close(self, remove):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+        if remove:
+            os.remove(self.path)
+
+
+def preallocate(path, size):
+    """
+    Creates (or resizes) the destination with its final size, reserving the blocks when the system allows it
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if os.fstat(fd).st_size != size:
+            os.ftruncate(fd, size)
+        if size and hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(fd, 0, size)
+            except OSError:
+                # Not supported by every file system, the sparse file from ftruncate is still valid
+                pass
+    finally:
+        os.close(fd)
+
+
+def download_single(s3_client, bucket_name, object_key, download_path, callback=None):
+    """
+    Downloads an object with a single GET streamed to the destination, for objects under the multipart threshold
+    :param callback: callable: called with the bytes of each read, e.g. a tqdm update
+    :return: int: size of the downloaded object
+    """
+    response = s3_client.get_object(Bucket=bucket_name, Key=object_key)
+    body = response["Body"]
+    readinto = getattr(getattr(body, "_raw_stream", None), "readinto", None)
+    buffer = bytearray(SINGLE_BUFFER_SIZE)
+    size = 0
+    try:
+        with open(download_path, "wb") as f, memoryview(buffer) as view:
+            while True:
+                if readinto is not None:
+                    read = readinto(view)
+                else:
+                    chunk = body.read(len(view))
+                    read = len(chunk)
+                    view[:read] = chunk
+                if not read:
+                    break
+                f.write(view[:read])
+                size += read
+                if callback:
+                    callback(read)
+    finally:
+        body.close()
+    if size != response["ContentLength"]:
+        raise IOError(f"{object_key} returned {size} of {response['ContentLength']} bytes")
+    logging.info(f"Downloaded {object_key} ({size} bytes) in a single request to {download_path}")
+    return size
+
+
+def download_ranged(
+    s3_client,
+    bucket_name,
+    object_key,
+    download_path,
+    range_size=RANGE_SIZE,
+    max_workers=DOWNLOAD_WORKERS,
+    callback=None,
+    resume=True,
+):
+    """
+    Downloads an object with parallel ranged GETs, each one read straight into its slice of the
+    memory mapped destination. The ranges finished are recorded in a state file next to the
+    destination, a download interrupted midway resumes from it if the object did not change.
+
+    :param s3_client: boto3 s3 client
+    :param bucket_name: str: name of the bucket
+    :param object_key: str: key of the object
+    :param download_path: str: destination file
+    :param range_size: int: bytes per ranged GET, a multiple of mmap.ALLOCATIONGRANULARITY
+    :param max_workers: int: ranged GETs in parallel
+    :param callback: callable: called with the bytes of each completed range, e.g. a tqdm update
+    :param resume: bool: reuse the ranges of a previous interrupted download
+    :return: int: size of the downloaded object
+    """
+    if range_size % mmap.ALLOCATIONGRANULARITY:
+        raise ValueError(f"range_size must be a multiple of {mmap.ALLOCATIONGRANULARITY}, got {range_size}")
+
+    head = s3_client.head_object(Bucket=bucket_name, Key=object_key)
+    size = head["ContentLength"]
+    etag = head["ETag"]
+    ranges = (size + range_size - 1) // range_size
+
+    preallocate(download_path, size)
+    if not size:
+        return 0
+
+    state = RangeState(
+        f"{download_path}{STATE_SUFFIX}", {"etag": etag, "size": size, "range_size": range_size}, ranges
+    ).open(resume)
+    pending = [index for index in range(ranges) if not state.done(index)]
+    if len(pending) < ranges:
+        logging.info(f"Resuming download of {object_key}: {ranges - len(pending)} of {ranges} ranges already done")
+        if callback:
+            callback(size - sum(min(range_size, size - index * range_size) for index in pending))
+
+    completed = False
+    with open(download_path, "r+b") as f, mmap.mmap(f.fileno(), size) as mapped:
+
+        def download_range(index):
+            start = index * range_size
+            end = min(start + range_size, size)
+            for attempt in range(1, RANGE_ATTEMPTS + 1):
+                try:
+                    # IfMatch makes a ranged GET fail if the object changed under the download
+                    response = s3_client.get_object(
+                        Bucket=bucket_name, Key=object_key, Range=f"bytes={start}-{end - 1}", IfMatch=etag
+                    )
+                    with memoryview(mapped) as view, view[start:end] as target:
+                        read = read_into(response["Body"], target)
+                    if read != end - start:
+                        raise IOError(f"range {start}-{end - 1} of {object_key} returned {read} bytes")
+                    mapped.flush(start, end - start)
+                    state.mark(index)
+                    # Reported once the range is done, the bytes of a failed attempt are read again
+                    if callback:
+                        callback(end - start)
+                    return end - start
+                except Exception as e:
+                    # 412 PreconditionFailed: the object changed, no retry can succeed
+                    if isinstance(e, ClientError) and e.response["ResponseMetadata"]["HTTPStatusCode"] == 412:
+                        raise
+                    if attempt == RANGE_ATTEMPTS:
+                        raise
+                    logging.info(f"Ranged GET {start}-{end - 1} of {object_key} failed ({e}), retrying")
+
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(download_range, index) for index in pending]
+                for future in as_completed(futures):
+                    future.result()
+            completed = True
+        finally:
+            state.close(remove=completed)
+
+    logging.info(f"Downloaded {object_key} ({size} bytes) in {ranges} ranges to {download_path}")
+    return size
@@ -0,0 +1,241 @@
+import logging
+import time
+from collections import namedtuple
+from operator import itemgetter
+from urllib.parse import quote, unquote_plus
+from xml.parsers import expat
+
+from botocore.auth import S3SigV4Auth
+from botocore.awsrequest import AWSRequest
+from botocore.exceptions import ClientError, HTTPClientError
+from botocore.utils import percent_encode_sequence
+
+# Compact entry of a listing, a tuple instead of the dict botocore builds for every object.
+# Delete markers have no size nor etag, they come with size 0, etag None and delete_marker True.
+ListEntry = namedtuple("ListEntry", ["key", "size", "etag", "version_id", "is_latest", "delete_marker"])
+
+ENTRY_ELEMENTS = ("Contents", "Version", "DeleteMarker")
+READ_CHUNK_SIZE = 64 * 1024
+RAW_MAX_ATTEMPTS = 3
+RAW_RETRY_DELAY = 0.2
+
+### Functions
+
+
+def entry_from_dict(entry, delete_marker=False):
+    """
+    Converts an object, version or delete marker as returned by boto3 into a ListEntry
+    """
+    return ListEntry(
+        entry["Key"],
+        entry.get("Size", 0),
+        entry.get("ETag"),
+        entry.get("VersionId"),
+        entry.get("IsLatest", True),
+        delete_marker or entry.get("IsDeleteMarker", False),
+    )
+
+
+class ListingParser:
+    """
+    Streaming parser of ListObjectsV2 and ListObjectVersions responses (and of s3 error bodies).
+    Only the fields of ListEntry are kept, the text of the other elements is dropped as soon as it ends,
+    and the fields of the entry being parsed live in a single dict reused by every entry.
+    """
+
+    def __init__(self):
+        self.parser = expat.ParserCreate()
+        self.parser.buffer_text = True
+        self.parser.StartElementHandler = self.start
+        self.parser.EndElementHandler = self.end
+        self.parser.CharacterDataHandler = self.data
+        self.depth = 0
+        self.text = []
+        self.fields = {}
+        self.url_encoded = False
+        self.entries = []
+        self.prefixes = []
+        self.result = {}
+
+    def feed(self, chunk):
+        self.parser.Parse(chunk, False)
+
+    def close(self):
+        self.parser.Parse(b"", True)
+        return self
+
+    def start(self, name, attrs):
+        self.depth += 1
+        self.text.clear()
+
+    def data(self, text):
+        self.text.append(text)
+
+    def end(self, name):
+        depth = self.depth
+        self.depth -= 1
+        if depth == 3:
+            # Key, Size, ETag... of an entry, or Prefix of a common prefix
+            self.fields[name] = "".join(self.text)
+        elif depth == 2:
+            if name in ENTRY_ELEMENTS:
+                self.add_entry(name)
+            elif name == "CommonPrefixes":
+                self.prefixes.append(self.decode(self.fields.get("Prefix", "")))
+                self.fields.clear()
+            else:
+                self.result[name] = "".join(self.text)
+                if name == "EncodingType" and self.result[name] == "url" and not self.url_encoded:
+                    # The entries parsed before this element were left encoded
+                    self.url_encoded = True
+                    self.entries = [entry._replace(key=unquote_plus(entry.key)) for entry in self.entries]
+                    self.prefixes = [unquote_plus(prefix) for prefix in self.prefixes]
+        self.text.clear()
+
+    def add_entry(self, name):
+        fields = self.fields
+        size = fields.get("Size")
+        self.entries.append(
+            ListEntry(
+                self.decode(fields.get("Key", "")),
+                int(size) if size else 0,
+                fields.get("ETag"),
+                fields.get("VersionId"),
+                fields.get("IsLatest", "true") == "true",
+                name == "DeleteMarker",
+            )
+        )
+        fields.clear()
+
+    def decode(self, value):
+        return unquote_plus(value) if self.url_encoded else value
+
+    def next_token(self, versions):
+        """
+        :return: str or tuple: continuation of the listing as expected by list_page, None on the last page
+        """
+        if self.result.get("IsTruncated") != "true":
+            return None
+        if versions:
+            return self.decode(self.result.get("NextKeyMarker", "")), self.result.get("NextVersionIdMarker")
+        return self.result.get("NextContinuationToken")
+
+
+def raw_lister(s3_client):
+    """
+    Raw lister of a client, built once and kept in the client
+    :param s3_client: boto3 s3 client
+    :return: RawLister or None if the client can't be listed raw (unsigned, sigv2 or virtual hosted)
+    """
+    lister = getattr(s3_client.meta, "_raw_lister", False)
+    if lister is False:
+        lister = RawLister(s3_client) if RawLister.supports(s3_client) else None
+        if lister is None:
+            logging.info("Raw listing is not supported by this client, falling back to boto3 listing")
+        s3_client.meta._raw_lister = lister
+    return lister
+
+
+class RawLister:
+    """
+    Lists buckets with sigv4 signed GETs sent over the connection pool of a boto3 client,
+    parsing the response while it's read instead of building the botocore response dicts.
+    """
+
+    def __init__(self, s3_client):
+        self.client = s3_client
+        self.endpoint_url = s3_client.meta.endpoint_url.rstrip("/")
+        self.region_name = s3_client.meta.region_name
+        # Requests share the pooled (keep-alive) connections of the client
+        self.http_session = s3_client._endpoint.http_session
+
+    @staticmethod
+    def supports(s3_client):
+        config = s3_client.meta.config
+        addressing_style = (config.s3 or {}).get("addressing_style")
+        return (
+            s3_client._get_credentials() is not None
+            and config.signature_version in (None, "s3v4", "v4")
+            and addressing_style != "virtual"
+        )
+
+    def list_page(self, bucket_name, prefix, marker, token, versions, page_size):
+        """
+        Same contract as tools.listing.list_page, with ListEntry entries
+        :return: tuple: (list ListEntry, continuation token or None when it's the last page)
+        """
+        params = {"prefix": prefix, "max-keys": str(page_size), "encoding-type": "url"}
+        if versions:
+            params["versions"] = ""
+            if token:
+                params["key-marker"], version_id_marker = token
+                if version_id_marker is not None:
+                    params["version-id-marker"] = version_id_marker
+            elif marker:
+                params["key-marker"] = marker
+        else:
+            params["list-type"] = "2"
+            if token:
+                params["continuation-token"] = token
+            elif marker:
+                params["start-after"] = marker
+
+        parser = self.get(bucket_name, params, "ListObjectVersions" if versions else "ListObjectsV2")
+        if versions:
+            # S3 interleaves versions and delete markers in key order, some implementations don't.
+            # Sorting is linear on an already sorted page.
+            parser.entries.sort(key=itemgetter(0))
+        return parser.entries, parser.next_token(versions)
+
+    def get(self, bucket_name, params, operation_name):
+        """
+        Sends a signed GET to the bucket and parses the response as it streams in
+        :return: ListingParser: parsed page
+        """
+        for attempt in range(1, RAW_MAX_ATTEMPTS + 1):
+            try:
+                status_code, parser = self.send(bucket_name, params)
+            except HTTPClientError as e:
+                if attempt == RAW_MAX_ATTEMPTS:
+                    raise
+                logging.info(f"Raw {operation_name} of {bucket_name} failed ({e}), retrying")
+            else:
+                if status_code == 200:
+                    return parser
+                error = {
+                    "Error": {"Code": parser.result.get("Code", str(status_code)), "Message": parser.result.get("Message", "")},
+                    "ResponseMetadata": {"HTTPStatusCode": status_code, "RequestId": parser.result.get("RequestId")},
+                }
+                if status_code < 500 or attempt == RAW_MAX_ATTEMPTS:
+                    raise ClientError(error, operation_name)
+                logging.info(f"Raw {operation_name} of {bucket_name} returned {status_code}, retrying")
+            time.sleep(RAW_RETRY_DELAY * 2 ** (attempt - 1))
+
+    def send(self, bucket_name, params):
+        # The query is encoded here as sigv4 canonicalizes it (spaces as %20, not +), so what is signed is sent
+        request = AWSRequest(
+            method="GET",
+            url=f"{self.endpoint_url}/{quote(bucket_name)}?{percent_encode_sequence(params)}",
+            stream_output=True,
+        )
+        # Credentials are frozen per request, refreshable ones (e.g. sso) stay valid on long listings
+        credentials = self.client._get_credentials().get_frozen_credentials()
+        S3SigV4Auth(credentials, "s3", self.region_name).add_auth(request)
+
+        response = self.http_session.send(request.prepare())
+        parser = ListingParser()
+        try:
+            for chunk in response.raw.stream(READ_CHUNK_SIZE):
+                parser.feed(chunk)
+            parser.close()
+        except expat.ExpatError:
+            response.raw.close()
+            if response.status_code == 200:
+                raise
+            # Error responses without an xml body (e.g. from a proxy)
+            return response.status_code, ListingParser()
+        except Exception:
+            response.raw.close()
+            raise
+        response.raw.release_conn()
+        return response.status_code, parser
@@ -0,0 +1,251 @@
+import argparse
+import json
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+
+from s3_specs.docs.tools.visibility import lag_summary
+
+DEFAULT_PREFIX = "replication-lag/"
+DEFAULT_CSV_PATH = "./output/replication_lag.csv"
+LAG_WORKERS = 32
+# Upper bounds in seconds of the lag histograms, the same buckets are used by the exporter
+LAG_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+CSV_HEADER = "timestamp,bucket,key,source,target,lag_seconds\n"
+
+### Functions
+
+
+def side_client(profile_name=None, endpoint_url=None, workers=LAG_WORKERS):
+    """
+    boto3 s3 client of one side of the measure, a profile and optionally another endpoint of it
+    """
+    session = boto3.Session(profile_name=profile_name)
+    return session.client("s3", endpoint_url=endpoint_url, config=Config(max_pool_connections=workers))
+
+
+def lag_histogram(lags, buckets=LAG_BUCKETS):
+    """
+    Cumulative histogram of lags, as prometheus histograms count them
+    :param lags: list float: lags in seconds
+    :return: dict: count of lags less than or equal to each bound, "+Inf" counting all of them
+    """
+    histogram = {str(bound): sum(1 for lag in lags if lag <= bound) for bound in buckets}
+    histogram["+Inf"] = len(lags)
+    return histogram
+
+
+class ReplicationLagMeter:
+    """
+    Measures how long an object written through one endpoint takes to be seen through others, e.g.
+    another region, or another endpoint url of the same region. Objects are written one by one through
+    the source while every side, the source included, is polled with HEAD for the objects it hasn't
+    seen yet. The first visibility of each object on each side is streamed to a csv, one row per
+    object and side, read by the exporter into the replication lag histograms.
+    """
+
+    def __init__(self, bucket_name, source, targets, prefix=DEFAULT_PREFIX, workers=LAG_WORKERS,
+                 csv_path=DEFAULT_CSV_PATH):
+        """
+        :param source: tuple: (name, boto3 s3 client) of the side the objects are written through
+        :param targets: dict: boto3 s3 client of each other side by name
+        :param workers: int: concurrent HEADs, the clients need as many pooled connections, the source one more
+            for the writer
+        :param csv_path: str: csv the measures are appended to, None to keep them in memory only
+        """
+        self.bucket_name = bucket_name
+        self.source_name, self.source = source
+        self.sides = {self.source_name: self.source, **targets}
+        self.prefix = prefix
+        self.workers = workers
+        self.csv_path = csv_path
+        self.keys = []
+        self.acked_at = array("d")
+        self.acked_epoch = array("d")
+        self.visible_at = {side: array("d") for side in self.sides}
+        self.errors = {side: 0 for side in self.sides}
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.csv = None
+
+    def now(self):
+        return time.monotonic() - self.started
+
+    def stream(self, position, side, lag):
+        """
+        Appends the measure of an object on a side to the csv, -1 when it wasn't seen before the timeout
+        """
+        if self.csv is None:
+            return
+        with self.lock:
+            self.csv.write(
+                f"{self.acked_epoch[position]:.3f},{self.bucket_name},{self.keys[position]},"
+                f"{self.source_name},{side},{lag:.4f}\n"
+            )
+            self.csv.flush()
+
+    def write(self):
+        """
+        Writes a new object through the source and starts polling it on every side
+        """
+        key = f"{self.prefix}obj_{uuid.uuid4().hex}.txt"
+        self.source.put_object(Bucket=self.bucket_name, Key=key, Body=f"replication lag {time.time()}".encode())
+        acked_at, acked_epoch = self.now(), time.time()
+        with self.lock:
+            position = len(self.keys)
+            self.keys.append(key)
+            self.acked_at.append(acked_at)
+            self.acked_epoch.append(acked_epoch)
+            for side in self.sides:
+                self.visible_at[side].append(math.nan)
+                self.pending.add((position, side))
+
+    def head(self, item):
+        position, side = item
+        # Timeouts and dropped connections are counted as errors too, a side down must not stop the measure
+        try:
+            self.sides[side].head_object(Bucket=self.bucket_name, Key=self.keys[position])
+        except (ClientError, BotoCoreError, OSError) as e:
+            if isinstance(e, ClientError) and e.response["ResponseMetadata"]["HTTPStatusCode"] == 404:
+                return
+            with self.lock:
+                self.errors[side] += 1
+                first_error = self.errors[side] == 1
+            if first_error:
+                logging.warning(f"HEAD of {self.keys[position]} through {side} errored, counting further errors: {e}")
+            return
+        visible_at = self.now()
+        with self.lock:
+            self.visible_at[side][position] = visible_at
+            self.pending.discard(item)
+        self.stream(position, side, max(0.0, visible_at - self.acked_at[position]))
+
+    def expire(self, timeout):
+        """
+        Gives up on the objects not seen by a side timeout seconds after their ack
+        """
+        now = self.now()
+        with self.lock:
+            expired = [(position, side) for position, side in self.pending if now - self.acked_at[position] > timeout]
+            self.pending.difference_update(expired)
+        for position, side in expired:
+            self.stream(position, side, -1)
+
+    def run(self, objects=100, write_interval=0.1, poll_interval=0.05, timeout=300):
+        """
+        Writes the objects spaced by write_interval while polling every side until each object was seen
+        everywhere or timed out
+        :return: dict: see summary
+        """
+        if self.csv_path:
+            new_file = not os.path.exists(self.csv_path)
+            os.makedirs(os.path.dirname(self.csv_path) or ".", exist_ok=True)
+            self.csv = open(self.csv_path, "a")
+            if new_file:
+                self.csv.write(CSV_HEADER)
+
+        def write_objects():
+            for _ in range(objects):
+                self.write()
+                time.sleep(write_interval)
+
+        try:
+            # The writer has its own thread, the HEADs get all the workers
+            with ThreadPoolExecutor(max_workers=1) as writer_executor, \
+                    ThreadPoolExecutor(max_workers=self.workers) as executor:
+                writer = writer_executor.submit(write_objects)
+                while True:
+                    with self.lock:
+                        pending = sorted(self.pending)
+                    list(executor.map(self.head, pending))
+                    self.expire(timeout)
+                    if writer.done() and not self.pending:
+                        writer.result()
+                        break
+                    if writer.done() and writer.exception():
+                        raise writer.exception()
+                    time.sleep(poll_interval)
+        finally:
+            if self.csv is not None:
+                self.csv.close()
+                self.csv = None
+        summary = self.summary()
+        logging.info(f"Replication lag from {self.source_name}: {json.dumps(summary)}")
+        return summary
+
+    def summary(self):
+        """
+        :return: dict: by side, visible and missing objects, p50/p99/max lag, HEAD errors and the lag histogram
+        """
+        summary = {}
+        for side, visible_at in self.visible_at.items():
+            lags = [
+                max(0.0, visible - acked) for acked, visible in zip(self.acked_at, visible_at) if not math.isnan(visible)
+            ]
+            summary[side] = {
+                **lag_summary(self.acked_at, visible_at), "errors": self.errors[side], "histogram": lag_histogram(lags)
+            }
+        return summary
+
+    def cleanup(self):
+        """
+        Deletes the objects written, through the source
+        """
+        for start in range(0, len(self.keys), 1000):
+            objects = [{"Key": key} for key in self.keys[start:start + 1000]]
+            self.source.delete_objects(Bucket=self.bucket_name, Delete={"Objects": objects, "Quiet": True})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede o atraso de replicação entre endpoints/regiões")
+    parser.add_argument("--bucket", required=True, help="Bucket acessível por todos os endpoints")
+    parser.add_argument("--profile", required=True, help="AWS profile por onde os objetos são escritos")
+    parser.add_argument("--target-profile", action="append", default=[],
+                        help="AWS profile por onde os objetos são lidos, ex. de outra região. Repetível")
+    parser.add_argument("--target-endpoint", action="append", default=[],
+                        help="Outro endpoint url, lido com as credenciais de --profile. Repetível")
+    parser.add_argument("--objects", type=int, default=100, help="Número de objetos escritos")
+    parser.add_argument("--write-interval", type=float, default=0.1, help="Segundos entre as escritas")
+    parser.add_argument("--poll-interval", type=float, default=0.05, help="Segundos entre as rodadas de HEAD")
+    parser.add_argument("--timeout", type=float, default=300, help="Segundos até desistir de um objeto")
+    parser.add_argument("--prefix", default=DEFAULT_PREFIX, help="Prefixo dos objetos")
+    parser.add_argument("--workers", type=int, default=LAG_WORKERS, help="HEADs simultâneos")
+    parser.add_argument("--csv-path", default=DEFAULT_CSV_PATH, help="Arquivo CSV lido pelo exporter")
+    parser.add_argument("--keep-objects", action="store_true", help="Não apaga os objetos no final")
+    args = parser.parse_args()
+
+    targets = {profile: side_client(profile, workers=args.workers) for profile in args.target_profile}
+    targets.update({
+        endpoint_url: side_client(args.profile, endpoint_url, args.workers) for endpoint_url in args.target_endpoint
+    })
+    if not targets:
+        parser.error("informe ao menos um --target-profile ou --target-endpoint")
+
+    meter = ReplicationLagMeter(
+        args.bucket,
+        (args.profile, side_client(args.profile, workers=args.workers + 1)),
+        targets,
+        prefix=args.prefix,
+        workers=args.workers,
+        csv_path=args.csv_path,
+    )
+    try:
+        summary = meter.run(args.objects, args.write_interval, args.poll_interval, args.timeout)
+        print(json.dumps(summary, indent=2))
+    finally:
+        if not args.keep_objects:
+            meter.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+import glob
+import json
+import math
+import os
+import re
+
+from s3_specs.docs.tools.http_timing import TIMING_METRICS, merge_operation_timings, new_operation_timings
+
+# Volatile tokens (bucket names suffixes, request ids, versions) that would split equal failures apart
+VOLATILE_TOKENS = re.compile(r"[0-9a-fA-F]{8,}(?:-[0-9a-fA-F]{4,})*")
+MAX_SIGNATURE_LENGTH = 200
+MAX_TESTS_PER_SIGNATURE = 5
+PHASES = ["setup", "call", "teardown"]
+
+### Functions
+
+
+def sidecar_path(report_file):
+    """
+    Path of the stats sidecar of a pytest-json-report file
+    :param report_file: str: path of the json report or live stream, e.g. reports_html/full_br-se1_report.json
+    :return: str: path of the sidecar, e.g. reports_html/full_br-se1_stats.json
+    """
+    base, _ = os.path.splitext(str(report_file))
+    for suffix in ("_report", "_live"):
+        if base.endswith(suffix):
+            base = base[: -len(suffix)]
+            break
+    return f"{base}_stats.json"
+
+
+def percentile(sorted_values, pct):
+    """
+    Nearest-rank percentile of an already sorted list
+    :param sorted_values: list: sorted values
+    :param pct: float: percentile between 0 and 100
+    :return: float: the percentile value, 0.0 for an empty list
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def failure_signature(test):
+    """
+    Short message identifying why a test failed, equal failures share the same signature
+    :param test: dict: test entry of a pytest-json-report
+    :return: str: signature or None if the test did not fail
+    """
+    for phase in PHASES:
+        stage = test.get(phase, {})
+        if stage.get("outcome") == "passed" or not (stage.get("crash") or stage.get("longrepr")):
+            continue
+        message = stage.get("crash", {}).get("message") or stage.get("longrepr", "")
+        lines = [line.strip() for line in message.splitlines() if line.strip()]
+        first_line = lines[0] if lines else "Erro não especificado"
+        return VOLATILE_TOKENS.sub("<id>", first_line)[:MAX_SIGNATURE_LENGTH]
+    return None
+
+
+def http_summary(timings):
+    """
+    Rounds the http timings of an operation and adds the mean of each timing metric
+    :param timings: dict: timings aggregated by merge_operation_timings
+    :return: dict: timings to be saved in the sidecar
+    """
+    summary = {key: round(value, 4) if isinstance(value, float) else value for key, value in timings.items()}
+    for metric in TIMING_METRICS:
+        summary[f"{metric}_mean_seconds"] = round(timings[f"{metric}_seconds"] / timings["count"], 4) if timings["count"] else 0.0
+    return summary
+
+
+def propagation_summary(waits):
+    """
+    Summarizes how long the waited resources took to appear or disappear
+    :param waits: dict: count, timeouts, polls and the list of waited seconds of a waiter
+    :return: dict: counts and percentiles of the waited seconds
+    """
+    seconds = sorted(waits["seconds"])
+    return {
+        "count": waits["count"],
+        "timeouts": waits["timeouts"],
+        "polls": waits["polls"],
+        "mean_seconds": round(sum(seconds) / len(seconds), 4) if seconds else 0.0,
+        "p50_seconds": round(percentile(seconds, 50), 4),
+        "p95_seconds": round(percentile(seconds, 95), 4),
+        "max_seconds": round(seconds[-1], 4) if seconds else 0.0,
+    }
+
+
+class ReportStatsAccumulator:
+    """
+    Builds the stats of a run one test at a time, used both for finished json reports
+    and for the live stream while the run is still going
+    """
+
+    def __init__(self):
+        self.durations = []
+        self.signatures = {}
+        self.counts = {"passed": 0, "failed": 0, "skipped": 0, "error": 0}
+        self.http = {}
+        self.propagation = {}
+
+    def add(self, test):
+        """
+        Accounts a test entry shaped as a pytest-json-report test
+        :param test: dict: test with nodeid, outcome and setup/call/teardown stages
+        """
+        outcome = test.get("outcome", "N/A")
+        self.counts[outcome] = self.counts.get(outcome, 0) + 1
+        self.durations.append(sum(test.get(phase, {}).get("duration", 0.0) for phase in PHASES))
+        for operation, timings in test.get("metadata", {}).get("http_timings", {}).items():
+            merge_operation_timings(self.http.setdefault(operation, new_operation_timings()), timings)
+        for waiter_name, waits in test.get("metadata", {}).get("propagation_timings", {}).items():
+            waiter = self.propagation.setdefault(waiter_name, {"count": 0, "timeouts": 0, "polls": 0, "seconds": []})
+            for key in ("count", "timeouts", "polls"):
+                waiter[key] += waits.get(key, 0)
+            waiter["seconds"].extend(waits.get("seconds", []))
+
+        if outcome not in ("failed", "error"):
+            return
+        signature = failure_signature(test) or "Erro não especificado"
+        entry = self.signatures.setdefault(signature, {"signature": signature, "count": 0, "tests": []})
+        entry["count"] += 1
+        if len(entry["tests"]) < MAX_TESTS_PER_SIGNATURE:
+            entry["tests"].append(test.get("nodeid", "N/A"))
+
+    def stats(self, name=None, created=None, exitcode=None, duration=0.0, summary=None):
+        """
+        :param summary: dict: outcome counts to be used instead of the accounted ones
+        :return: dict: stats to be saved as sidecar
+        """
+        durations = sorted(self.durations)
+        counts = dict(summary) if summary else dict(self.counts)
+        counts.setdefault("total", sum(self.counts.values()))
+
+        return {
+            "name": name,
+            "created": created,
+            "exitcode": exitcode,
+            "duration": duration,
+            "counts": {
+                "passed": counts.get("passed", 0),
+                "failed": counts.get("failed", 0),
+                "skipped": counts.get("skipped", 0),
+                "error": counts.get("error", 0),
+                "total": counts.get("total", 0),
+            },
+            "test_durations": {
+                "total": round(sum(durations), 3),
+                "mean": round(sum(durations) / len(durations), 3) if durations else 0.0,
+                "p50": round(percentile(durations, 50), 3),
+                "p95": round(percentile(durations, 95), 3),
+                "max": round(durations[-1], 3) if durations else 0.0,
+            },
+            "failures": sorted(self.signatures.values(), key=lambda entry: entry["count"], reverse=True),
+            "http": {operation: http_summary(timings) for operation, timings in sorted(self.http.items())},
+            "propagation": {waiter_name: propagation_summary(waits) for waiter_name, waits in sorted(self.propagation.items())},
+        }
+
+
+def build_report_stats(json_report, name=None):
+    """
+    Summarizes a pytest-json-report into a small stats dict: counts, durations and failure signatures
+    :param json_report: dict: loaded pytest-json-report
+    :param name: str: name of the run (category, mark and profile)
+    :return: dict: stats to be saved as sidecar
+    """
+    accumulator = ReportStatsAccumulator()
+    for test in json_report.get("tests", []):
+        accumulator.add(test)
+
+    return accumulator.stats(
+        name=name,
+        created=json_report.get("created"),
+        exitcode=json_report.get("exitcode"),
+        duration=json_report.get("duration", 0.0),
+        summary=json_report.get("summary"),
+    )
+
+
+def save_stats(stats, stats_file):
+    """
+    Atomically writes a stats dict, readers never see a half written sidecar
+    :param stats: dict: stats built by ReportStatsAccumulator
+    :param stats_file: str: path of the sidecar
+    """
+    os.makedirs(os.path.dirname(stats_file) or ".", exist_ok=True)
+    tmp_file = f"{stats_file}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(stats, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, stats_file)
+
+
+def sidecar_name(stats_file):
+    """
+    Name of the run a sidecar belongs to, e.g. full_br-se1 for reports_html/full_br-se1_stats.json
+    """
+    return os.path.basename(stats_file)[: -len("_stats.json")]
+
+
+def write_stats_sidecar(json_report, report_file):
+    """
+    Writes the stats sidecar next to the json report
+    :param json_report: dict: loaded pytest-json-report
+    :param report_file: str: path of the json report
+    :return: str: path of the written sidecar
+    """
+    stats_file = sidecar_path(report_file)
+    save_stats(build_report_stats(json_report, name=sidecar_name(stats_file)), stats_file)
+
+    return stats_file
+
+
+def read_stats_sidecar(stats_file):
+    """
+    Reads a stats sidecar
+    :param stats_file: str: path of the sidecar
+    :return: dict: stats or None if the sidecar is missing or broken
+    """
+    try:
+        with open(stats_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def list_stats_sidecars(directory):
+    """
+    Lists the stats sidecars of a reports directory
+    :param directory: str: directory containing the json reports
+    :return: list str: paths of the sidecars
+    """
+    return sorted(glob.glob(os.path.join(str(directory), "*_stats.json")))
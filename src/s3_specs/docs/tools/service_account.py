@@ -8,12 +8,12 @@ import time
 from botocore.exceptions import ClientError
 
 @pytest.fixture
-def profile_name_sa(test_params, profile_name):
-    profiles = [profile['profile_name'] for profile in test_params['profiles']]
+def profile_name_sa(specs_config, profile_name):
+    sa_profile = specs_config.profile("sa")
     
-    logging.info(profiles)
+    logging.info(sa_profile)
 
-    if f"{profile_name}-sa" not in profiles:
+    if sa_profile is None:
         pytest.skip("Service Account not provided")
     
     return f"{profile_name}-sa"
@@ -30,13 +30,8 @@ def active_mgc_workspace_sa(profile_name_sa, mgc_path):
     return profile_name_sa
 
 @pytest.fixture
-def get_sa_infos(test_params):# Extrai a lista de perfis
-    profiles = test_params['profiles']
-    sa_info = None
-
-    for profile in profiles:
-        if "-sa" in profile['profile_name']:
-            sa_info = profile
+def get_sa_infos(specs_config):
+    sa_info = specs_config.profile("sa")
 
     logging.info(f"Service Account: {sa_info}")
     if not sa_info:
@@ -0,0 +1,246 @@
+import itertools
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from boto3.s3.transfer import TransferConfig
+
+from s3_specs.docs.tools.multipart import SyntheticPayload, upload_multipart, upload_single
+from s3_specs.docs.tools.ranged_download import download_ranged, download_single
+
+MB = 1024 * 1024
+GB = 1024 * MB
+
+# Object size classes tuned apart, the best parts for 20 MB are not the best ones for 10 GB
+SIZE_CLASSES = [
+    ("small", 0, 64 * MB),
+    ("medium", 64 * MB, 1 * GB),
+    ("large", 1 * GB, math.inf),
+]
+# What the big object tests used for every size before being tuned
+DEFAULT_TUNING = {"multipart_threshold": 40 * MB, "multipart_chunksize": 8 * MB, "max_concurrency": 10}
+
+CHUNK_SIZES = [8 * MB, 16 * MB, 32 * MB, 64 * MB]
+CONCURRENCIES = [4, 8, 16, 32]
+# Objects up to the threshold go in a single request, "single" sweeps it above the object size
+THRESHOLDS = ["chunk", "single"]
+TUNING_FILE = os.getenv("S3_SPECS_TUNING_FILE", os.path.expanduser("~/.cache/s3-specs/transfer_tuning.json"))
+
+_tuning_lock = threading.Lock()
+
+### Functions
+
+
+def size_class(size):
+    """
+    :param size: int: object size in bytes
+    :return: str: name of the size class of the object
+    """
+    for name, lower, upper in SIZE_CLASSES:
+        if lower <= size < upper:
+            return name
+    return SIZE_CLASSES[-1][0]
+
+
+def load_tuning(tuning_file=TUNING_FILE):
+    """
+    :return: dict: tuned configurations by endpoint and size class, empty if nothing was tuned yet
+    """
+    try:
+        with open(tuning_file, "r") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def save_tuning(endpoint_url, name, tuning, tuning_file=TUNING_FILE):
+    """
+    Stores the best configuration of a size class of an endpoint, keeping the others
+    """
+    with _tuning_lock:
+        tunings = load_tuning(tuning_file)
+        tunings.setdefault(endpoint_url, {})[name] = tuning
+        os.makedirs(os.path.dirname(tuning_file) or ".", exist_ok=True)
+        tmp_file = f"{tuning_file}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(tunings, f, indent=2)
+        os.replace(tmp_file, tuning_file)
+
+
+def tuned_settings(s3_client, size, tuning_file=TUNING_FILE):
+    """
+    Transfer settings for an object of a size sent to the endpoint of a client
+    :return: dict: multipart_threshold, multipart_chunksize and max_concurrency, tuned or the defaults
+    """
+    tuning = load_tuning(tuning_file).get(s3_client.meta.endpoint_url, {}).get(size_class(size))
+    if not tuning:
+        return dict(DEFAULT_TUNING)
+    return {key: tuning[key] for key in DEFAULT_TUNING}
+
+
+def load_transfer_config(s3_client, size, tuning_file=TUNING_FILE):
+    """
+    TransferConfig for an object of a size, from the tuning benchmark of the endpoint when there is one
+    :param s3_client: boto3 s3 client
+    :param size: int: object size in bytes
+    :return: TransferConfig
+    """
+    settings = tuned_settings(s3_client, size, tuning_file)
+    logging.info(f"Transfer settings for {size} bytes on {s3_client.meta.endpoint_url}: {settings}")
+    return TransferConfig(use_threads=True, **settings)
+
+
+def solve(matrix, vector):
+    """
+    Solves a small linear system by gaussian elimination with partial pivoting
+    :return: list float: solution, None if the system is singular
+    """
+    size = len(vector)
+    rows = [list(row) + [value] for row, value in zip(matrix, vector)]
+    for column in range(size):
+        pivot = max(range(column, size), key=lambda row: abs(rows[row][column]))
+        if abs(rows[pivot][column]) < 1e-12:
+            return None
+        rows[column], rows[pivot] = rows[pivot], rows[column]
+        for row in range(size):
+            if row != column:
+                factor = rows[row][column] / rows[column][column]
+                rows[row] = [a - factor * b for a, b in zip(rows[row], rows[column])]
+    return [rows[row][size] / rows[row][row] for row in range(size)]
+
+
+def surface_terms(chunk_size, concurrency):
+    x, y = math.log2(chunk_size / MB), math.log2(concurrency)
+    return [1.0, x, y, x * x, y * y, x * y]
+
+
+def fit_surface(samples):
+    """
+    Least squares fit of a quadratic surface of the throughput over log2(chunk size) and log2(concurrency),
+    which smooths the noise of single measurements before picking the best point
+    :param samples: list dict: measured chunk_size, concurrency and mb_per_second
+    :return: callable: estimated MB/s of a (chunk size, concurrency), None if there are too few samples
+    """
+    terms = [surface_terms(sample["chunk_size"], sample["concurrency"]) for sample in samples]
+    width = len(surface_terms(MB, 1))
+    if len(terms) < width:
+        return None
+    normal = [[sum(row[i] * row[j] for row in terms) for j in range(width)] for i in range(width)]
+    target = [sum(row[i] * sample["mb_per_second"] for row, sample in zip(terms, samples)) for i in range(width)]
+    coefficients = solve(normal, target)
+    if coefficients is None:
+        return None
+    return lambda chunk_size, concurrency: sum(c * t for c, t in zip(coefficients, surface_terms(chunk_size, concurrency)))
+
+
+def measure_transfer(s3_client, bucket_name, size, chunk_size, concurrency, download_dir):
+    """
+    Uploads and downloads a synthetic object with one configuration
+    :param chunk_size: int: bytes per part and range, None for a single PutObject and GetObject
+    :return: float: MB/s of the upload and the download together
+    """
+    object_key = f"tuning-{size}-{chunk_size or 'single'}-{concurrency}"
+    download_path = os.path.join(download_dir, object_key)
+    started = time.perf_counter()
+    try:
+        if chunk_size is None:
+            upload_single(s3_client, bucket_name, object_key, SyntheticPayload(size))
+            download_single(s3_client, bucket_name, object_key, download_path)
+        else:
+            upload_multipart(
+                s3_client,
+                bucket_name,
+                object_key,
+                SyntheticPayload(size, chunk_size),
+                part_size=chunk_size,
+                max_workers=concurrency,
+                checksum=None,
+            )
+            download_ranged(
+                s3_client, bucket_name, object_key, download_path, range_size=chunk_size, max_workers=concurrency, resume=False
+            )
+    finally:
+        if os.path.exists(download_path):
+            os.remove(download_path)
+        s3_client.delete_object(Bucket=bucket_name, Key=object_key)
+    return 2 * size / MB / (time.perf_counter() - started)
+
+
+def tune_transfer_config(
+    s3_client,
+    bucket_name,
+    size,
+    chunk_sizes=CHUNK_SIZES,
+    concurrencies=CONCURRENCIES,
+    thresholds=THRESHOLDS,
+    tuning_file=TUNING_FILE,
+):
+    """
+    Sweeps chunk size x concurrency x threshold for the size class of an object size, fits the throughput
+    surface and stores the best configuration for the endpoint of the client, where load_transfer_config
+    finds it. A "single" threshold sends the object in one PutObject and reads it in one GetObject, so chunk
+    size and concurrency don't apply; when it wins, the threshold stored keeps the whole size class in one request.
+
+    :param s3_client: boto3 s3 client of the profile being tuned
+    :param bucket_name: str: bucket receiving the synthetic objects, deleted after each measure
+    :param size: int: object size representing its size class
+    :return: dict: best configuration, its estimated and measured throughput and the samples
+    """
+    candidates = [
+        (chunk_size, concurrency) for chunk_size, concurrency in itertools.product(chunk_sizes, concurrencies)
+        if chunk_size < size
+    ] if "chunk" in thresholds else []
+    if not candidates and "single" not in thresholds:
+        raise ValueError(f"Nothing to measure for {size} bytes: no chunk size under it and no single threshold")
+
+    samples = []
+    with tempfile.TemporaryDirectory() as download_dir:
+        if "single" in thresholds:
+            mb_per_second = measure_transfer(s3_client, bucket_name, size, None, 1, download_dir)
+            samples.append({"threshold": "single", "chunk_size": size, "concurrency": 1, "mb_per_second": mb_per_second})
+        for chunk_size, concurrency in candidates:
+            mb_per_second = measure_transfer(s3_client, bucket_name, size, chunk_size, concurrency, download_dir)
+            samples.append(
+                {"threshold": "chunk", "chunk_size": chunk_size, "concurrency": concurrency, "mb_per_second": mb_per_second}
+            )
+            logging.info(f"Tuning {size} bytes: {chunk_size} bytes x {concurrency} -> {mb_per_second:.1f} MB/s")
+
+    multipart = [sample for sample in samples if sample["threshold"] == "chunk"]
+    surface = fit_surface(multipart)
+    for sample in multipart:
+        sample["estimated_mb_per_second"] = surface(sample["chunk_size"], sample["concurrency"]) if surface else sample["mb_per_second"]
+    best = max(multipart, key=lambda sample: sample["estimated_mb_per_second"], default=None)
+    single = next((sample for sample in samples if sample["threshold"] == "single"), None)
+
+    if best is None or (single and single["mb_per_second"] >= best["mb_per_second"]):
+        # Splitting the object doesn't pay off, everything up to the class upper bound goes in one request
+        upper = next(upper for name, lower, upper in SIZE_CLASSES if name == size_class(size))
+        settings = {
+            "multipart_threshold": int(min(upper, 5 * GB)),
+            "multipart_chunksize": DEFAULT_TUNING["multipart_chunksize"],
+            "max_concurrency": DEFAULT_TUNING["max_concurrency"],
+        }
+        measured = single["mb_per_second"]
+    else:
+        settings = {
+            "multipart_threshold": best["chunk_size"],
+            "multipart_chunksize": best["chunk_size"],
+            "max_concurrency": best["concurrency"],
+        }
+        measured = best["mb_per_second"]
+
+    tuning = {
+        **settings,
+        "object_size": size,
+        "mb_per_second": round(measured, 3),
+        "tuned_at": datetime.now().isoformat(timespec="seconds"),
+        "samples": [{key: round(value, 3) if isinstance(value, float) else value for key, value in sample.items()} for sample in samples],
+    }
+    save_tuning(s3_client.meta.endpoint_url, size_class(size), tuning, tuning_file)
+    logging.info(f"Best transfer settings for {size_class(size)} objects on {s3_client.meta.endpoint_url}: {settings}")
+    return tuning
@@ -3,8 +3,9 @@ import os
 import pytest
 import subprocess
 from shlex import quote
-import boto3
 import logging
+from s3_specs.docs.tools.http_timing import instrument_client
+from s3_specs.docs.tools.params import profile_session
 
 # Function is responsible to check and format bucket names into valid ones
 
@@ -15,15 +16,8 @@ def get_clients(session_test_params):
     sessions = []
     
     for client in clients:
-        if "profile_name" in client:
-            session = boto3.Session(profile_name=client["profile_name"])
-        else:
-            session = boto3.Session(
-                region_name=client["region_name"],
-                aws_access_key_id=client["aws_access_key_id"],
-                aws_secret_access_key=client["aws_secret_access_key"],
-            )
-        sessions.append(session.client("s3", endpoint_url=client.get("endpoint_url")))
+        session = profile_session(client)
+        sessions.append(instrument_client(session.client("s3", endpoint_url=client.get("endpoint_url"))))
         
     return sessions
 
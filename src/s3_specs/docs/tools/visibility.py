@@ -0,0 +1,289 @@
+import heapq
+import logging
+import math
+import os
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from s3_specs.docs.tools.listing import iter_keys
+from s3_specs.docs.tools.report_stats import percentile
+
+VISIBILITY_WORKERS = 64
+# Seconds between the HEADs of a key not visible yet, its visibility is stamped at this granularity
+PROBE_INTERVAL = 0.1
+NOT_YET = math.nan
+
+### Functions
+
+
+def profile_client(profile_name, workers=VISIBILITY_WORKERS):
+    """
+    boto3 s3 client of a profile with a connection per worker of the uploads and of the probes, plus one
+    for the listings, all running together (see VisibilityTracker.track), the default pool of 10 would
+    serialize them
+    """
+    return boto3.Session(profile_name=profile_name).client("s3", config=Config(max_pool_connections=2 * workers + 1))
+
+
+def lag_summary(acked_at, visible_at):
+    """
+    Distribution of the time between the ack of each write and when it was first seen
+    :param acked_at: array: ack time of each key, nan if not acked
+    :param visible_at: array: visibility time of each key, nan if never seen
+    :return: dict: visible and missing keys, p50/p99/max lag in seconds
+    """
+    lags = sorted(
+        max(0.0, visible - acked) for acked, visible in zip(acked_at, visible_at)
+        if not math.isnan(acked) and not math.isnan(visible)
+    )
+    return {
+        "visible": len(lags),
+        "missing": sum(1 for acked in acked_at if not math.isnan(acked)) - len(lags),
+        "p50_seconds": round(percentile(lags, 50), 4),
+        "p99_seconds": round(percentile(lags, 99), 4),
+        "max_seconds": round(lags[-1], 4) if lags else 0.0,
+    }
+
+
+class VisibilityTracker:
+    """
+    Measures how long every key of a bulk upload takes to become visible, instead of probing a single
+    key. The ack of each put is recorded and, while the upload goes on, every acked key is probed on its
+    own schedule and fully paginated listings of the prefix are snapshotted. The state of each key is
+    kept in flat arrays indexed by the position of the key (ack time, HEAD and listing visibility,
+    success streak, attempts), so tens of thousands of keys cost a few hundred KB.
+
+    A key is probed with a HEAD right after its ack, again interval seconds after each 404 and right
+    away after each success until its streak is complete, the keys due the longest first. Its visibility
+    is so stamped within an interval of when it happened, instead of waiting for a round over all keys.
+
+    A key is visible by HEAD once it answers required_successes times in a row, counted from the first
+    answer of the streak; a 404 resets the streak. A key is visible by listing from the first snapshot
+    listing it, keys that disappear from a later snapshot are counted as regressions.
+    """
+
+    def __init__(self, s3_client, bucket_name, keys, prefix="", workers=VISIBILITY_WORKERS, required_successes=1):
+        """
+        :param s3_client: boto3 s3 client, with max_pool_connections of at least 2 * workers + 1 (see profile_client)
+        :param keys: list str: keys tracked, all starting with prefix
+        :param prefix: str: prefix listed in the snapshots
+        :param workers: int: concurrent uploads and HEADs
+        """
+        self.client = s3_client
+        self.bucket_name = bucket_name
+        self.keys = list(keys)
+        self.index = {key: position for position, key in enumerate(self.keys)}
+        self.prefix = prefix
+        self.workers = workers
+        self.required_successes = required_successes
+        size = len(self.keys)
+        self.acked_at = array("d", [NOT_YET]) * size
+        self.head_visible_at = array("d", [NOT_YET]) * size
+        self.listed_at = array("d", [NOT_YET]) * size
+        self.streak_started_at = array("d", [NOT_YET]) * size
+        self.streaks = bytearray(size)
+        self.attempts = array("I", [0]) * size
+        self.head_visible = bytearray(size)
+        self.listed = bytearray(size)
+        self.snapshots = []
+        self.regressions = 0
+        self.lock = threading.Lock()
+        # (due time, position) of the keys acked and not visible by HEAD yet
+        self.due = []
+        self.scheduled = threading.Condition()
+        self.started = time.monotonic()
+
+    def now(self):
+        return time.monotonic() - self.started
+
+    def ack(self, key):
+        """
+        Records the ack of a key written by someone else
+        """
+        position = self.index[key]
+        self.acked_at[position] = self.now()
+        self.schedule(position, self.acked_at[position])
+
+    def schedule(self, position, due):
+        with self.scheduled:
+            heapq.heappush(self.due, (due, position))
+            self.scheduled.notify()
+
+    def next_due(self, stop):
+        """
+        Waits for the key due the longest
+        :return: int: its position, None once stopped
+        """
+        with self.scheduled:
+            while not stop.is_set():
+                wait = self.due[0][0] - self.now() if self.due else PROBE_INTERVAL
+                if wait <= 0:
+                    return heapq.heappop(self.due)[1]
+                self.scheduled.wait(wait)
+        return None
+
+    def upload(self, body):
+        """
+        Puts every key concurrently, recording when each put is acked
+        :param body: bytes or callable: body of every object, or a function of the key returning it
+        """
+
+        def put(position):
+            key = self.keys[position]
+            self.client.put_object(Bucket=self.bucket_name, Key=key, Body=body(key) if callable(body) else body)
+            self.acked_at[position] = self.now()
+            self.schedule(position, self.acked_at[position])
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            list(executor.map(put, range(len(self.keys))))
+        logging.info(f"Uploaded {len(self.keys)} keys to {self.bucket_name} in {time.perf_counter() - started:.3f}s")
+
+    def head(self, position):
+        """
+        :return: bool: whether the key answered
+        """
+        self.attempts[position] += 1
+        try:
+            self.client.head_object(Bucket=self.bucket_name, Key=self.keys[position])
+        except ClientError as e:
+            if e.response["ResponseMetadata"]["HTTPStatusCode"] != 404:
+                logging.warning(f"HEAD of {self.keys[position]} errored: {e}")
+            self.streaks[position] = 0
+            return False
+        answered_at = self.now()
+        if self.streaks[position] == 0:
+            self.streak_started_at[position] = answered_at
+        self.streaks[position] = min(self.streaks[position] + 1, 255)
+        if self.streaks[position] >= self.required_successes:
+            self.head_visible[position] = 1
+            self.head_visible_at[position] = self.streak_started_at[position]
+        return True
+
+    def follow(self, stop, interval):
+        """
+        Probes the keys as they come due, rescheduling each one until it's visible
+        """
+        while True:
+            position = self.next_due(stop)
+            if position is None:
+                return
+            answered = self.head(position)
+            if not self.head_visible[position]:
+                # A streak is confirmed right away, a missing key is probed again after the interval
+                self.schedule(position, self.now() if answered else self.now() + interval)
+
+    def snapshot(self):
+        """
+        Lists the whole prefix, page by page, and records the keys seen for the first time
+        :return: int: tracked keys in the listing
+        """
+        seen = bytearray(len(self.keys))
+        for key in iter_keys(self.client, self.bucket_name, self.prefix, raw=True):
+            position = self.index.get(key)
+            if position is not None:
+                seen[position] = 1
+        listed_at = self.now()
+        with self.lock:
+            for position, listed in enumerate(seen):
+                if listed and not self.listed[position]:
+                    self.listed[position] = 1
+                    self.listed_at[position] = listed_at
+                elif self.listed[position] and not listed:
+                    self.regressions += 1
+            count = sum(seen)
+            self.snapshots.append({"seconds": round(listed_at, 4), "listed": count, "expected": len(self.keys)})
+        return count
+
+    def probe(self, timeout=60, interval=PROBE_INTERVAL, upload=None):
+        """
+        Follows the acked keys until every key is visible by HEAD and by listing, or the timeout
+        :param timeout: float: seconds since the tracker was created
+        :param interval: float: seconds between the HEADs of a missing key, and between the listing snapshots
+        :param upload: Future: upload running meanwhile, keys are followed as they are acked
+        :return: bool: whether the whole population became visible
+        """
+        stop = threading.Event()
+
+        def snapshot_until_listed():
+            while not stop.is_set() and not all(self.listed):
+                self.snapshot()
+                stop.wait(interval)
+
+        with ThreadPoolExecutor(max_workers=self.workers + 1) as executor:
+            listing = executor.submit(snapshot_until_listed)
+            followers = [executor.submit(self.follow, stop, interval) for _ in range(self.workers)]
+            try:
+                progress = None
+                while True:
+                    uploading = upload is not None and not upload.done()
+                    if upload is not None and upload.done() and upload.exception():
+                        return False
+                    for future in [listing, *followers]:
+                        if future.done():
+                            # Raises the listing and HEAD errors
+                            future.result()
+                    visible, listed = sum(self.head_visible), sum(self.listed)
+                    if (visible, listed) != progress and (visible, listed) != (0, 0):
+                        progress = (visible, listed)
+                        logging.info(
+                            f"{visible}/{len(self.keys)} visible by HEAD, {listed}/{len(self.keys)} listed "
+                            f"after {self.now():.2f}s"
+                        )
+                    if not uploading and visible == len(self.keys) and listed == len(self.keys):
+                        return True
+                    if self.now() + interval > timeout:
+                        return False
+                    time.sleep(interval)
+            finally:
+                stop.set()
+                with self.scheduled:
+                    self.scheduled.notify_all()
+
+    def track(self, body, timeout=60, interval=PROBE_INTERVAL):
+        """
+        Uploads every key and probes them meanwhile, see upload and probe
+        :return: bool: whether the whole population became visible, upload errors are raised
+        """
+        with ThreadPoolExecutor(max_workers=1) as uploader:
+            upload = uploader.submit(self.upload, body)
+            visible = self.probe(timeout, interval, upload)
+            upload.result()
+        return visible
+
+    def summary(self):
+        """
+        :return: dict: lag distribution by HEAD and by listing, most HEADs sent to a key, listing regressions
+            and snapshots
+        """
+        return {
+            "keys": len(self.keys),
+            "attempts": max(self.attempts, default=0),
+            "head": lag_summary(self.acked_at, self.head_visible_at),
+            "list": lag_summary(self.acked_at, self.listed_at),
+            "listing_regressions": self.regressions,
+            "snapshots": self.snapshots,
+        }
+
+
+def write_visibility_lag(summary, csv_path, quantity, workers, profile_name, bucket_id):
+    """
+    Appends the lag distribution of each probe to a csv, one row per bucket and probe
+    """
+    new_file = not os.path.exists(csv_path)
+    os.makedirs(os.path.dirname(csv_path) or ".", exist_ok=True)
+    with open(csv_path, "a") as f:
+        if new_file:
+            f.write("quantity,workers,profile,bucket,probe,visible,missing,p50_seconds,p99_seconds,max_seconds\n")
+        for probe in ("head", "list"):
+            lags = summary[probe]
+            f.write(
+                f"{quantity},{workers},{profile_name},{bucket_id},{probe},{lags['visible']},{lags['missing']},"
+                f"{lags['p50_seconds']},{lags['p99_seconds']},{lags['max_seconds']}\n"
+            )
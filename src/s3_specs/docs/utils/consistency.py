@@ -3,7 +3,10 @@ import pytest
 import os
 import time
 import logging
+import threading
+import boto3
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from s3_specs.docs.tools.listing import count_objects as count_listed_objects
 
 bucket_type_map = {
     "auto-standard": "1",
@@ -321,10 +324,21 @@ def available_buckets(
 
     return buckets
 
+# Clientes boto3 por perfil, reaproveitados entre as verificações (sessions não são thread-safe, clientes são)
+_profile_clients = {}
+_profile_clients_lock = threading.Lock()
+
+def get_profile_client(profile_name):
+    with _profile_clients_lock:
+        if profile_name not in _profile_clients:
+            _profile_clients[profile_name] = boto3.Session(profile_name=profile_name).client("s3")
+        return _profile_clients[profile_name]
+
 # Função para contar objetos com um prefixo
 def count_objects(profile_name, bucket_name, prefix):
     """
     Conta o número de objetos em um bucket S3 com um prefixo específico.
+    A listagem é paginada e as chaves não são mantidas em memória, então não há limite de 1000 objetos.
     :param profile_name: Nome do perfil AWS a ser usado.
     :param bucket_name: Nome do bucket S3.
     :param prefix: Prefixo dos objetos a serem contados.
@@ -333,17 +347,12 @@ def count_objects(profile_name, bucket_name, prefix):
     logging.info(
         f"Counting objects in bucket '{bucket_name}' with prefix '{prefix}' using profile '{profile_name}'"
     )
-    result = subprocess.run(
-        ['aws', '--profile', profile_name, 's3api', 'list-objects-v2',
-        '--bucket', bucket_name, '--prefix', prefix,
-        '--query', 'length(Contents || `[]`)'],
-        capture_output=True, text=True
-    )
     try:
-        logging.warning(f"parsed {result.stdout.strip()}")
-        return int(result.stdout.strip())
-    except ValueError:
-        logging.warning(f"Failed to parse count result: {result.stdout}")
+        count, _ = count_listed_objects(get_profile_client(profile_name), bucket_name, prefix, parallel=True)
+        logging.info(f"counted {count}")
+        return count
+    except Exception as e:
+        logging.warning(f"Failed to count objects: {e}")
         return 0
 
 # Função para verificar se o número de objetos com um prefixo é igual ao esperado
@@ -354,83 +363,3 @@ def check_count_objects(profile_name, bucket_name, prefix, expected_count):
     actual = count_objects(profile_name, bucket_name, prefix)
     logging.info(f"[count-objects] actual={actual}, expected={expected_count}")
     return actual == expected_count
-
-# Função para sobrescrever e validar leituras consistentes
-def overwrite_and_validate_reads(bucket_name, object_key, quantity, profile_name, bucket_type, read_repeats=3, delay=1):
-    """
-    Realiza sobrescritas e valida leituras consistentes após cada uma.
-    :param bucket_name: Nome do bucket.
-    :param object_key: Chave do objeto.
-    :param quantity: Número de sobrescritas a realizar.
-    :param profile_name: Perfil AWS.
-    :param bucket_type: Tipo de bucket (para logs/CSV).
-    :param read_repeats: Número de leituras consistentes por sobrescrita.
-    :param delay: Tempo de espera entre leitura após escrita.
-    """
-    temp_filename = "/tmp/overwrite_temp.txt"
-    temp_download = "/tmp/overwrite_download.txt"
-    os.makedirs("output", exist_ok=True)
-
-    total_success = True  # Assume que todas sobrescritas serão consistentes
-
-    for i in range(1, quantity + 1):
-        content = f"conteudo_sobrescrito_{i}"
-        logging.info(f"[{bucket_type}] Iteração {i}: Iniciando sobrescrita com conteúdo: '{content}'")
-
-        with open(temp_filename, "w") as f:
-            f.write(content)
-
-        start = time.time()
-
-        # Escrita no bucket
-        subprocess.run([
-            'aws', '--profile', profile_name, 's3', 'cp', temp_filename,
-            f"s3://{bucket_name}/{object_key}"
-        ], check=True)
-        logging.info(f"[{bucket_type}] Iteração {i}: Escrita concluída em s3://{bucket_name}/{object_key}")
-
-        time.sleep(delay)
-
-        success_reads = 0
-        for attempt in range(1, read_repeats + 1):
-            logging.info(f"[{bucket_type}] Iteração {i}, leitura {attempt}: Iniciando leitura")
-            subprocess.run([
-                'aws', '--profile', profile_name, 's3', 'cp',
-                f"s3://{bucket_name}/{object_key}", temp_download
-            ], check=True)
-
-            with open(temp_download, "r") as f:
-                actual_content = f.read()
-
-            if actual_content == content:
-                logging.info(f"[{bucket_type}] Iteração {i}, leitura {attempt}: ✅ Conteúdo consistente.")
-                success_reads += 1
-            else:
-                logging.warning(
-                    f"[{bucket_type}] Iteração {i}, leitura {attempt}: ❌ Inconsistência detectada.\n"
-                    f"  → Esperado: '{content}'\n"
-                    f"  → Encontrado: '{actual_content}'"
-                )
-
-            time.sleep(delay)
-
-        if success_reads != read_repeats:
-            logging.error(
-                f"[{bucket_type}] Iteração {i}: Apenas {success_reads}/{read_repeats} leituras foram consistentes."
-            )
-            total_success = False
-        else:
-            logging.info(f"[{bucket_type}] Iteração {i}: Todas as {read_repeats} leituras foram consistentes.")
-
-    elapsed = time.time() - start
-
-    if total_success:
-        logging.info(f"[{bucket_type}] Todas as {quantity} sobrescritas foram validadas com sucesso.")
-        with open("output/report_inconsistencies.csv", "a") as f:
-            f.write(f"{quantity},1,overwrite_{quantity}_times,{profile_name},{bucket_type},{elapsed:.2f},{read_repeats}\n")
-            bucket_id = bucket_type_map.get(bucket_type, bucket_type)
-            operation_id = operation_map["overwrite"]
-            f.write(f"{quantity},1,{operation_id}_{quantity},{profile_name},{bucket_id},{elapsed:.2f},{read_repeats}\n")
-    else:
-        logging.error(f"[{bucket_type}] Falha de consistência em uma ou mais sobrescritas.")
-        pytest.fail(f"[{bucket_type}] Nem todas as sobrescritas foram consistentes após {read_repeats} leituras.")